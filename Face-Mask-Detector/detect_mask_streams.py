@@ -0,0 +1,318 @@
+# import the necessary packages
+from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+from tensorflow.keras.models import load_model
+from threading import Thread
+from queue import Queue, Empty, Full
+import numpy as np
+import argparse
+import imutils
+import json
+import time
+import cv2
+import os
+
+class StreamReader:
+	def __init__(self, index, src):
+		# initialize the video capture for this source (integer sources
+		# are webcams), and the small queue of frames waiting to be
+		# processed
+		self.index = index
+		self.src = src
+		self.stream = cv2.VideoCapture(int(src) if src.isdigit() else src)
+		self.frames = Queue(maxsize=2)
+		self.stopped = False
+		self.ended = False
+		self.grabbed = 0
+		self.dropped = 0
+
+		# webcams and network streams (rtsp://, http://) keep producing
+		# frames whether or not we keep up, so only their newest frame
+		# is kept; video files are read without skipping any frames
+		self.live = src.isdigit() or "://" in src
+
+	def start(self):
+		# start the thread that reads frames from the video stream
+		Thread(target=self.update, daemon=True).start()
+		return self
+
+	def update(self):
+		# keep looping until the stream ends or the reader is stopped
+		while not self.stopped:
+			(grabbed, frame) = self.stream.read()
+			if not grabbed:
+				self.ended = True
+				break
+			self.grabbed += 1
+			item = (self.grabbed, frame)
+
+			if self.live:
+				# replace the waiting frame if the server has not taken
+				# it yet
+				try:
+					self.frames.put_nowait(item)
+				except Full:
+					try:
+						self.frames.get_nowait()
+						self.dropped += 1
+					except Empty:
+						pass
+					self.frames.put_nowait(item)
+			else:
+				# wait for room in the queue, so a file is processed
+				# frame by frame
+				while not self.stopped:
+					try:
+						self.frames.put(item, timeout=0.1)
+						break
+					except Full:
+						continue
+
+		self.stream.release()
+
+	def read(self):
+		# return the next (frame number, frame) pair, or None if no new
+		# frame is waiting
+		try:
+			return self.frames.get_nowait()
+		except Empty:
+			return None
+
+	def finished(self):
+		return self.ended and self.frames.empty()
+
+	def stop(self):
+		self.stopped = True
+
+def detect_faces_batch(frames, faceNet, minConfidence):
+	# construct a single blob from the frames of *every* stream and pass
+	# it through the network once, instead of once per frame
+	blob = cv2.dnn.blobFromImages(frames, 1.0, (224, 224),
+		(104.0, 177.0, 123.0))
+	faceNet.setInput(blob)
+	detections = faceNet.forward()
+
+	# each detection row is [image id, class id, confidence, startX,
+	# startY, endX, endY]; the image id tells us which frame of the
+	# batch the face belongs to
+	detections = detections.reshape(-1, 7)
+	detections = detections[detections[:, 2] > minConfidence]
+
+	# initialize the list of face crops, the frame each one came from,
+	# and their bounding boxes
+	faces = []
+	owners = []
+	locs = []
+
+	for detection in detections:
+		i = int(detection[0])
+		if i < 0:
+			continue
+
+		# compute the (x, y)-coordinates of the bounding box and make
+		# sure it falls within the dimensions of the frame
+		(h, w) = frames[i].shape[:2]
+		box = detection[3:7] * np.array([w, h, w, h])
+		(startX, startY, endX, endY) = box.astype("int")
+		(startX, startY) = (max(0, startX), max(0, startY))
+		(endX, endY) = (min(w - 1, endX), min(h - 1, endY))
+		if endX <= startX or endY <= startY:
+			continue
+
+		# extract the face ROI, convert it from BGR to RGB channel
+		# ordering and resize it to 224x224
+		face = frames[i][startY:endY, startX:endX]
+		face = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+		face = cv2.resize(face, (224, 224))
+
+		faces.append(face)
+		owners.append(i)
+		locs.append((int(startX), int(startY), int(endX), int(endY)))
+
+	return (faces, owners, locs)
+
+def predict_masks_batch(faces, maskNet, batchSize):
+	# classify the face crops of every stream together, in chunks of at
+	# most batchSize faces; predict_on_batch skips the per-call setup of
+	# predict(), which dominates when there are only a few faces
+	if len(faces) == 0:
+		return np.zeros((0, 2), dtype="float32")
+	faces = preprocess_input(np.array(faces, dtype="float32"))
+	preds = [np.asarray(maskNet.predict_on_batch(faces[i:i + batchSize]))
+		for i in range(0, len(faces), batchSize)]
+	return np.concatenate(preds)
+
+def draw_predictions(frame, locs, preds):
+	# loop over the detected face locations and their corresponding
+	# predictions, as in detect_mask_video.py
+	for (box, pred) in zip(locs, preds):
+		(startX, startY, endX, endY) = box
+		(mask, withoutMask) = pred
+
+		# determine the class label and color we'll use to draw the
+		# bounding box and text
+		label = "Mask" if mask > withoutMask else "No Mask"
+		color = (0, 255, 0) if label == "Mask" else (0, 0, 255)
+		label = "{}: {:.2f}%".format(label, max(mask, withoutMask) * 100)
+
+		cv2.putText(frame, label, (startX, startY - 10),
+			cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 2)
+		cv2.rectangle(frame, (startX, startY), (endX, endY), color, 2)
+
+# construct the argument parser and parse the arguments
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--source", action="append", required=True,
+	help="video source: file path, stream URL or webcam index (repeat for each stream)")
+ap.add_argument("-f", "--face", type=str, default="face-detector",
+	help="path to face detector model directory")
+ap.add_argument("-m", "--model", type=str, default="mask_detector.model",
+	help="path to trained face mask detector model")
+ap.add_argument("-c", "--confidence", type=float, default=0.5,
+	help="minimum probability to filter weak face detections")
+ap.add_argument("-w", "--width", type=int, default=400,
+	help="width frames are resized to before detection")
+ap.add_argument("-b", "--max-batch", type=int, default=0,
+	help="most frames per face detection batch (0 = one from every stream)")
+ap.add_argument("--mask-batch", type=int, default=64,
+	help="most face crops per mask classifier call")
+ap.add_argument("-o", "--output", type=str, default="",
+	help="directory for per-stream results (stream<N>.jsonl)")
+ap.add_argument("-d", "--display", action="store_true",
+	help="show every stream in its own window")
+ap.add_argument("-r", "--report", type=float, default=5.0,
+	help="seconds between throughput reports")
+args = vars(ap.parse_args())
+
+# load our serialized face detector model from disk
+print("[INFO] loading face detector model...")
+prototxtPath = os.path.sep.join([args["face"], "deploy.prototxt"])
+weightsPath = os.path.sep.join([args["face"],
+	"res10_300x300_ssd_iter_140000.caffemodel"])
+faceNet = cv2.dnn.readNet(prototxtPath, weightsPath)
+
+# load the face mask detector model from disk
+print("[INFO] loading face mask detector model...")
+maskNet = load_model(args["model"])
+
+# start one reader thread per video source
+print("[INFO] starting {} video streams...".format(len(args["source"])))
+readers = [StreamReader(i, src).start()
+	for (i, src) in enumerate(args["source"])]
+maxBatch = args["max_batch"] or len(readers)
+
+# open one results file per stream
+outputs = []
+if args["output"]:
+	os.makedirs(args["output"], exist_ok=True)
+	outputs = [open(os.path.sep.join([args["output"],
+		"stream{}.jsonl".format(r.index)]), "w") for r in readers]
+
+# initialize the throughput counters
+processed = [0] * len(readers)
+totals = {"batches": 0, "frames": 0, "faces": 0, "detect": 0.0,
+	"classify": 0.0}
+window = dict(totals)
+start = time.time()
+lastReport = start
+nextReader = 0
+
+# loop over batches of frames from all of the streams
+try:
+	while True:
+		# take the newest waiting frame of each stream, starting after
+		# the last stream served so every stream gets its turn when
+		# --max-batch is smaller than the number of streams
+		batch = []
+		for k in range(len(readers)):
+			reader = readers[(nextReader + k) % len(readers)]
+			item = reader.read()
+			if item is not None:
+				batch.append((reader, item[0], item[1]))
+				if len(batch) == maxBatch:
+					nextReader = (reader.index + 1) % len(readers)
+					break
+
+		if len(batch) == 0:
+			# stop once every stream has ended, otherwise wait briefly
+			# for new frames
+			if all(r.finished() for r in readers):
+				break
+			time.sleep(0.002)
+			continue
+
+		# resize the frames, then detect faces in all of them at once
+		frames = [imutils.resize(frame, width=args["width"])
+			for (_, _, frame) in batch]
+		t0 = time.time()
+		(faces, owners, locs) = detect_faces_batch(frames, faceNet,
+			args["confidence"])
+
+		# classify every face from every stream in one go
+		t1 = time.time()
+		preds = predict_masks_batch(faces, maskNet, args["mask_batch"])
+		t2 = time.time()
+
+		# send the results back out per stream
+		for (i, (reader, number, _)) in enumerate(batch):
+			mine = [j for j in range(len(owners)) if owners[j] == i]
+			streamLocs = [locs[j] for j in mine]
+			streamPreds = [preds[j] for j in mine]
+			processed[reader.index] += 1
+
+			if outputs:
+				record = {"stream": reader.index, "source": reader.src,
+					"frame": number, "time": t2,
+					"faces": [{"box": list(box),
+						"label": "Mask" if pred[0] > pred[1] else "No Mask",
+						"confidence": float(max(pred))}
+						for (box, pred) in zip(streamLocs, streamPreds)]}
+				outputs[reader.index].write(json.dumps(record) + "\n")
+
+			if args["display"]:
+				draw_predictions(frames[i], streamLocs, streamPreds)
+				cv2.imshow("Stream {}".format(reader.index), frames[i])
+
+		# update the throughput counters
+		for counters in (totals, window):
+			counters["batches"] += 1
+			counters["frames"] += len(batch)
+			counters["faces"] += len(faces)
+			counters["detect"] += t1 - t0
+			counters["classify"] += t2 - t1
+
+		# if the `q` key was pressed, break from the loop
+		if args["display"] and cv2.waitKey(1) & 0xFF == ord("q"):
+			break
+
+		# print the aggregate frame rate every few seconds
+		now = time.time()
+		if now - lastReport >= args["report"]:
+			batches = max(window["batches"], 1)
+			print("[INFO] {:.1f} FPS over {} streams ({:.1f} per stream), "
+				"{:.1f} frames and {:.1f} faces per batch, detect {:.1f} ms, "
+				"classify {:.1f} ms per batch".format(
+				window["frames"] / (now - lastReport), len(readers),
+				window["frames"] / (now - lastReport) / len(readers),
+				window["frames"] / batches, window["faces"] / batches,
+				window["detect"] / batches * 1000,
+				window["classify"] / batches * 1000))
+			window = dict.fromkeys(window, 0)
+			lastReport = now
+except KeyboardInterrupt:
+	pass
+
+# do a bit of cleanup
+for reader in readers:
+	reader.stop()
+for output in outputs:
+	output.close()
+if args["display"]:
+	cv2.destroyAllWindows()
+
+# display the overall throughput and per-stream frame counts
+elapsed = max(time.time() - start, 1e-9)
+print("[INFO] {} frames from {} streams in {:.1f}s: {:.1f} FPS total, "
+	"{:.1f} frames per batch".format(totals["frames"], len(readers), elapsed,
+	totals["frames"] / elapsed, totals["frames"] / max(totals["batches"], 1)))
+for reader in readers:
+	print("[INFO] stream {} ({}): {} frames processed, {} dropped".format(
+		reader.index, reader.src, processed[reader.index], reader.dropped))
@@ -0,0 +1,236 @@
+import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Delivery latencies kept for the summary (the most recent ones)
+LATENCY_WINDOW = 10000
+
+# One queued alert; key identifies "the same alert" for de-duplication (e.g. patient + vital)
+Alert = namedtuple('Alert', ['to_number', 'body', 'key', 'created_at'])
+
+# Define token bucket limiting how many messages per second go out (with bursts up to `burst`)
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Define transport sending SMS through Twilio
+# One client for the whole dispatcher, so its HTTP session keeps connections open between messages.
+class TwilioTransport:
+    def __init__(self, account_sid, auth_token, from_number):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    async def send(self, to_number, body):
+        # The Twilio client is blocking; run it on a thread so the event loop keeps going
+        message = await asyncio.to_thread(self.client.messages.create, to=to_number, from_=self.from_number, body=body)
+        return message.sid
+
+# Define local stand-in for Twilio, for tests and benchmarks
+class MockTransport:
+    def __init__(self, latency_s=0.05, failure_rate=0.0, seed=None):
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.sent = []
+
+    async def send(self, to_number, body):
+        await asyncio.sleep(self.latency_s)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("mock transport failure")
+        self.sent.append((to_number, body))
+        return f"MOCK{len(self.sent):06d}"
+
+# Define asynchronous alert dispatcher
+# submit() never blocks the caller: alerts go onto a bounded queue served by an asyncio loop on a
+# background thread, with a concurrency limit, token-bucket rate limit, retries with exponential
+# backoff, and de-duplication of repeat alerts per key within dedup_window_s. Repeats are suppressed
+# while an alert is queued or sent; if it is dropped or fails for good, the next repeat goes out.
+class AlertDispatcher:
+    def __init__(self, transport, max_queue=1000, concurrency=4, rate=10.0, burst=10, retries=3,
+                 backoff_s=0.5, dedup_window_s=300.0, verbose=True):
+        self.transport = transport
+        self.max_queue = max_queue
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.dedup_window_s = dedup_window_s
+        self.verbose = verbose
+        self.stats = {'submitted': 0, 'sent': 0, 'failed': 0, 'retried': 0, 'deduplicated': 0, 'dropped': 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # seconds from submit() to delivery, per sent alert
+        self._last_accepted = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="AlertDispatcher", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._bucket = TokenBucket(self.rate, self.burst)
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.concurrency)]
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, to_number, body, key=None):
+        # Returns False if the alert was suppressed as a repeat
+        now = time.monotonic()
+        with self._lock:
+            self.stats['submitted'] += 1
+            if key is not None:
+                last = self._last_accepted.get(key)
+                if last is not None and now - last < self.dedup_window_s:
+                    self.stats['deduplicated'] += 1
+                    return False
+                self._last_accepted[key] = now
+        self._loop.call_soon_threadsafe(self._enqueue, Alert(to_number, body, key, now))
+        return True
+
+    def _count(self, name):
+        # stats are read from other threads (summary()), so the loop thread updates them under the lock too
+        with self._lock:
+            self.stats[name] += 1
+
+    def _forget(self, alert):
+        # Lets the next repeat of an alert that never went out through de-duplication
+        if alert.key is None:
+            return
+        with self._lock:
+            if self._last_accepted.get(alert.key) == alert.created_at:
+                del self._last_accepted[alert.key]
+
+    def _enqueue(self, alert):
+        try:
+            self._queue.put_nowait(alert)
+        except asyncio.QueueFull:
+            self._count('dropped')  # shed load rather than stall monitoring
+            self._forget(alert)
+
+    async def _worker(self):
+        while True:
+            alert = await self._queue.get()
+            try:
+                await self._deliver(alert)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, alert):
+        for attempt in range(self.retries + 1):
+            await self._bucket.acquire()
+            try:
+                sid = await self.transport.send(alert.to_number, alert.body)
+            except Exception as e:
+                if attempt == self.retries:
+                    self._count('failed')
+                    self._forget(alert)
+                    print(f"Failed to send SMS to {alert.to_number}: {str(e)}")
+                    return
+                self._count('retried')
+                await asyncio.sleep(self.backoff_s * 2 ** attempt * (0.5 + random.random()))
+            else:
+                with self._lock:
+                    self.stats['sent'] += 1
+                    self.latencies.append(time.monotonic() - alert.created_at)
+                if self.verbose:
+                    print(f"Sent SMS to {alert.to_number} with Message SID: {sid}")
+                return
+
+    async def _shutdown(self, timeout):
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self._loop.shutdown_default_executor()
+
+    def close(self, timeout=10.0):
+        # Waits up to timeout for queued alerts to go out, then stops the loop thread
+        asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def forward_from(self, mp_queue):
+        # Feeds (to_number, body, key) items from a multiprocessing queue into submit(); None stops it
+        def pump():
+            while True:
+                item = mp_queue.get()
+                if item is None:
+                    return
+                self.submit(*item)
+        thread = threading.Thread(target=pump, name="AlertForwarder", daemon=True)
+        thread.start()
+        return thread
+
+    def summary(self):
+        with self._lock:
+            s = dict(self.stats)
+            latencies = list(self.latencies)
+        text = (f"{s['sent']} sent, {s['failed']} failed, {s['retried']} retries, "
+                f"{s['deduplicated']} duplicates suppressed, {s['dropped']} dropped")
+        if latencies:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            text += f", delivery p50 {p50 * 1000:.0f} ms / p99 {p99 * 1000:.0f} ms"
+        return text
+
+# Benchmark: a burst of alerts through the mock transport
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the alert dispatcher with a mock SMS transport.")
+    parser.add_argument("--alerts", type=int, default=500, help="Alerts to submit in one burst.")
+    parser.add_argument("--patients", type=int, default=200, help="Distinct patients the alerts are spread over.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock send latency in seconds.")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="Mock send failure probability.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Sends in flight at once.")
+    parser.add_argument("--rate", type=float, default=200.0, help="Messages per second.")
+    parser.add_argument("--dedup-window", type=float, default=300.0, help="Seconds to suppress repeats per patient.")
+    args = parser.parse_args()
+
+    transport = MockTransport(args.latency, args.failure_rate, seed=1)
+    dispatcher = AlertDispatcher(transport, max_queue=args.alerts, concurrency=args.concurrency, rate=args.rate,
+                                 burst=args.concurrency, backoff_s=0.05, dedup_window_s=args.dedup_window,
+                                 verbose=False).start()
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for i in range(args.alerts):
+        patient = rng.randrange(args.patients)
+        dispatcher.submit("+910000000000", f"Warning: patient {patient}", key=(patient, 'heart_rate'))
+    submit_s = time.perf_counter() - start
+    dispatcher.close(timeout=600)
+    elapsed = time.perf_counter() - start
+
+    sent = dispatcher.stats['sent'] + dispatcher.stats['failed']
+    print(f"Submitted {args.alerts} alerts in {submit_s * 1000:.1f} ms (caller never blocked)")
+    print(f"Delivered in {elapsed:.2f}s: {dispatcher.summary()}")
+    print(f"Blocking inline sends would have taken ~{sent * args.latency:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from vitals import NORMAL_HEART_RATE_RANGE, NORMAL_GLUCOSE_RANGE, VitalsSimulator
+
+# Samples of history kept per patient and vital (30 s at 1 Hz)
+DEFAULT_WINDOW = 30
+
+# "Sustained" = at least K of the last N samples out of range
+DEFAULT_SUSTAINED_K = 3
+DEFAULT_SUSTAINED_N = 5
+
+# "Unusual" = more than this many standard deviations from the patient's own recent mean,
+# once at least MIN_SAMPLES samples are in the window
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_MIN_SAMPLES = 10
+
+DEFAULT_EWMA_ALPHA = 0.1
+
+# Which readings raise an alert (SMS)
+ALERT_RULES = ('threshold', 'sustained', 'zscore', 'sustained_or_zscore')
+
+# Define class keeping streaming statistics per patient and vital, updated a batch of patients at a time
+# All state lives in preallocated arrays (optionally in one shared buffer, so VM worker processes can
+# update the patients of whichever cluster they are given). Each update is O(1) per patient:
+# ring buffer of recent samples, running sum and sum of squares (exact, integers), EWMA, and a
+# running count of out-of-range samples among the last N.
+class VitalsMonitor:
+    def __init__(self, n_patients, ranges=(NORMAL_HEART_RATE_RANGE, NORMAL_GLUCOSE_RANGE), window=DEFAULT_WINDOW,
+                 sustained_k=DEFAULT_SUSTAINED_K, sustained_n=DEFAULT_SUSTAINED_N, z_threshold=DEFAULT_Z_THRESHOLD,
+                 min_samples=DEFAULT_MIN_SAMPLES, alpha=DEFAULT_EWMA_ALPHA, buffer=None):
+        if not 1 <= sustained_k <= sustained_n <= window:
+            raise ValueError("Need 1 <= sustained_k <= sustained_n <= window")
+        self.params = {'ranges': tuple(ranges), 'window': window, 'sustained_k': sustained_k,
+                       'sustained_n': sustained_n, 'z_threshold': z_threshold, 'min_samples': min_samples,
+                       'alpha': alpha}
+        self.n_patients = n_patients
+        self.window = window
+        self.sustained_k = sustained_k
+        self.sustained_n = sustained_n
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.lows = np.array([r[0] for r in ranges], dtype=np.int64)
+        self.highs = np.array([r[1] for r in ranges], dtype=np.int64)
+        self.channels = np.arange(len(ranges))
+
+        layout = self.layout(n_patients, len(ranges), window)
+        self.buffer = bytearray(self.state_size(n_patients, ranges=ranges, window=window)) if buffer is None else buffer
+        offset = 0
+        for name, dtype, shape in layout:
+            array = np.frombuffer(self.buffer, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    @staticmethod
+    def layout(n_patients, n_channels, window):
+        # (name, dtype, shape) of every state array, 8-byte types first to keep them aligned
+        return [
+            ('total', np.int64, (n_patients, n_channels)),
+            ('total_sq', np.int64, (n_patients, n_channels)),
+            ('count', np.int64, (n_patients,)),
+            ('ewma', np.float32, (n_patients, n_channels)),
+            ('ring', np.int16, (n_patients, n_channels, window)),
+            ('recent_abnormal', np.int16, (n_patients, n_channels)),
+        ]
+
+    @classmethod
+    def state_size(cls, n_patients, **params):
+        # Bytes of state for n_patients, e.g. to allocate a shared buffer to pass as buffer=
+        ranges = params.get('ranges', (NORMAL_HEART_RATE_RANGE, NORMAL_GLUCOSE_RANGE))
+        layout = cls.layout(n_patients, len(ranges), params.get('window', DEFAULT_WINDOW))
+        return sum(np.dtype(d).itemsize * int(np.prod(s)) for _, d, s in layout)
+
+    @classmethod
+    def shared(cls, n_patients, **params):
+        # Monitor whose state is in shared memory; give worker processes monitor.buffer and monitor.params
+        return cls(n_patients, buffer=multiprocessing.RawArray('b', cls.state_size(n_patients, **params)), **params)
+
+    def update(self, positions, values):
+        # Adds one sample per patient; positions (m,) must be distinct, values is (m, channels)
+        # Returns a dict of (m, channels) arrays: abnormal, sustained, zscore, unusual, mean, ewma
+        positions = np.asarray(positions)
+        x = np.asarray(values, dtype=np.int64).reshape(len(positions), len(self.channels))
+        c = self.count[positions]
+        rows = positions[:, None]
+        cols = self.channels[None, :]
+
+        # Baseline from the samples already in the window (before this one)
+        n_prev = np.minimum(c, self.window)[:, None]
+        total = self.total[positions]
+        total_sq = self.total_sq[positions]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n_prev
+            var = total_sq / n_prev - mean * mean
+            z = (x - mean) / np.sqrt(var)
+        z[(n_prev < self.min_samples).repeat(len(self.channels), axis=1) | ~(var > 1e-9)] = 0.0
+
+        # Sample leaving the ring, and sample leaving the last-N window
+        slot = (c % self.window)[:, None]
+        leaving = np.where((c >= self.window)[:, None], self.ring[rows, cols, slot], 0).astype(np.int64)
+        old_n = self.ring[rows, cols, ((c - self.sustained_n) % self.window)[:, None]].astype(np.int64)
+        old_n_abnormal = (c >= self.sustained_n)[:, None] & ((old_n < self.lows) | (old_n > self.highs))
+
+        abnormal = (x < self.lows) | (x > self.highs)
+        self.total[positions] = total + x - leaving
+        self.total_sq[positions] = total_sq + x * x - leaving * leaving
+        self.ring[rows, cols, slot] = x
+        recent = self.recent_abnormal[positions] + abnormal.astype(np.int16) - old_n_abnormal.astype(np.int16)
+        self.recent_abnormal[positions] = recent
+        first = (c == 0)[:, None]
+        ewma = np.where(first, x, self.alpha * x + (1 - self.alpha) * self.ewma[positions]).astype(np.float32)
+        self.ewma[positions] = ewma
+        self.count[positions] = c + 1
+
+        return {
+            'abnormal': abnormal,
+            'sustained': recent >= self.sustained_k,
+            'zscore': z,
+            'unusual': np.abs(z) >= self.z_threshold,
+            'mean': np.where(n_prev > 0, mean, x),
+            'ewma': ewma,
+        }
+
+# Define function turning a rule name into the alert mask for one update
+def alert_mask(flags, rule):
+    if rule == 'threshold':
+        return flags['abnormal']
+    if rule == 'sustained':
+        return flags['sustained']
+    if rule == 'zscore':
+        return flags['unusual']
+    if rule == 'sustained_or_zscore':
+        return flags['sustained'] | flags['unusual']
+    raise ValueError(f"Unknown alert rule: {rule}")
+
+# Benchmark: update every patient once per tick, as at a 1 Hz sample rate
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming anomaly detector.")
+    parser.add_argument("--patients", type=int, default=1_000_000, help="Patients updated per tick.")
+    parser.add_argument("--ticks", type=int, default=20, help="Number of ticks.")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Samples kept per patient and vital.")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="Update in batches of this many patients (e.g. 6 for one cluster); 0 = all at once.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = parser.parse_args()
+
+    monitor = VitalsMonitor(args.patients, window=args.window)
+    simulator = VitalsSimulator(args.seed)
+    positions = np.arange(args.patients)
+    batch = args.batch or args.patients
+    alerts = {rule: 0 for rule in ALERT_RULES}
+    update_s = 0.0
+    for _ in range(args.ticks):
+        readings = simulator.tick(args.patients)
+        values = np.stack([readings['heart_rate'], readings['glucose']], axis=1)
+        start = time.perf_counter()
+        for i in range(0, args.patients, batch):
+            flags = monitor.update(positions[i:i + batch], values[i:i + batch])
+            for rule in ALERT_RULES:
+                alerts[rule] += int(alert_mask(flags, rule).any(axis=1).sum())
+        update_s += time.perf_counter() - start
+
+    total = args.patients * args.ticks
+    rate = total / update_s
+    print(f"{total:,} patient updates in {update_s:.2f}s: {rate:,.0f} patients/sec on one core")
+    print(f"At a 1 Hz sample rate one core keeps up with ~{rate:,.0f} patients "
+          f"({len(monitor.buffer) / args.patients:.0f} bytes of state per patient)")
+    print("Alerts per rule: " + ", ".join(f"{rule} {count}" for rule, count in alerts.items()))
+
+if __name__ == "__main__":
+    main()
@@ -1,174 +1,462 @@
-import random
-import openpyxl
+import os
+import signal
 import time
-from twilio.rest import Client
-import pandas as pd
-
-# Define normal heart rate range
-NORMAL_HEART_RATE_RANGE = (60, 100)
-
-# Define normal blood glucose range
-NORMAL_GLUCOSE_RANGE = (70, 120)
+import queue
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from vitals import NORMAL, LOW, STATUS_LABELS, VitalsSimulator, abnormal_positions
+from resultbus import DEFAULT_WINDOW_ROWS, ResultWindow
+from roster import load_roster
+from anomaly import (ALERT_RULES, DEFAULT_WINDOW, DEFAULT_SUSTAINED_K, DEFAULT_SUSTAINED_N, DEFAULT_Z_THRESHOLD,
+                     VitalsMonitor, alert_mask)
+from scheduler import POLICIES, Scheduler, adaptive_cluster_size, print_policy_report
+from alerts import AlertDispatcher, TwilioTransport, MockTransport
+from healthlog import HealthLogWriter, health_record
+from fognet import DEFAULT_CONNECTIONS, DEFAULT_MAX_INFLIGHT, DEFAULT_HEARTBEAT, FogCoordinator
 
 # Twilio configuration
 ACCOUNT_SID = 'SSID'
 AUTH_TOKEN = 'Token'
 TWILIO_PHONE_NUMBER = 'YOUR_TWILIO PHONE NUMBER'
-TWILIO_CLIENT = Client(ACCOUNT_SID, AUTH_TOKEN)
-
-# Read patient data from Excel file
-def read_patient_data_from_excel(file_path):
-    wb = openpyxl.load_workbook(filename=file_path)
-    sheet = wb.active
-    data = []
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        name, age, mobile = row[:3]
-        data.append({'Name': name, 'Age': age, 'Mobile Number': '+91' + str(mobile)})
-    return data
-
-# Define function to simulate heart rate
-def simulate_heart_rate():
-    if random.randint(1, 500) == 1:
-        return random.choice([random.randint(40, 59), random.randint(101, 120)])
-    return random.randint(NORMAL_HEART_RATE_RANGE[0], NORMAL_HEART_RATE_RANGE[1])
-
-# Define function to simulate blood glucose level
-def simulate_blood_glucose():
-    if random.randint(1, 1000) == 1:
-        return random.choice([random.randint(40, 69), random.randint(121, 150)])
-    return random.randint(NORMAL_GLUCOSE_RANGE[0], NORMAL_GLUCOSE_RANGE[1])
+
+# Alerts raised in the VM workers go onto this queue; the AlertDispatcher in the main process sends them
+# (with --transport tcp, a worker sends them to the edge over its connection, which puts them on the queue)
+ALERT_QUEUE_SIZE = 10000
+ALERT_SINK = None
+
+# Structured health log of the VM worker (a HealthLogWriter), set in vm_worker (fognet.run_worker with --transport tcp)
+HEALTH_LOG = None
+
+# Work stealing: an idle VM takes the oldest cluster of the peer with the most waiting, if at least
+# STEAL_MIN_BACKLOG are waiting there; idle VMs look again every STEAL_POLL_S seconds
+STEAL_MIN_BACKLOG = 2
+STEAL_POLL_S = 0.01
+
+# Smallest cluster (patients), and the VM time per cluster that adaptive sizing aims for
+MIN_CLUSTER_SIZE = 6
+DEFAULT_CLUSTER_TARGET_MS = 2.0
 
 # Define function to check heart rate and generate warnings
-def check_heart_rate_cluster(cluster_name, cluster):
-    rows = []
-    for patient in cluster:
-        name = patient['Name']
-        age = int(patient['Age'])
-        mobile = patient['Mobile Number']
-        heart_rate = simulate_heart_rate()
-        glucose_level = simulate_blood_glucose()
-        heart_status = 'Normal'  # default heart rate status
-        glucose_status = 'Normal'  # default blood glucose status
-
-        if heart_rate < NORMAL_HEART_RATE_RANGE[0]:
-            message = f"Warning: {name}, your heart rate is low ({heart_rate})"
-            send_sms(mobile, message)
-            heart_status = 'Low'
-            log_data(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status)
-        elif heart_rate > NORMAL_HEART_RATE_RANGE[1]:
-            message = f"Warning: {name}, your heart rate is high ({heart_rate})"
-            send_sms(mobile, message)
-            heart_status = 'High'
-            log_data(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status)
-
-        if glucose_level < NORMAL_GLUCOSE_RANGE[0]:
-            message = f"Warning: {name}, your blood glucose level is low ({glucose_level})"
-            send_sms(mobile, message)
-            glucose_status = 'Low'
-            log_data(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status)
-        elif glucose_level > NORMAL_GLUCOSE_RANGE[1]:
-            message = f"Warning: {name}, your blood glucose level is high ({glucose_level})"
-            send_sms(mobile, message)
-            glucose_status = 'High'
-            log_data(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status)
-
-        rows.append([cluster_name, name, age, mobile, heart_rate, heart_status, glucose_level, glucose_status])
-    return rows
+# members are positions in the patient store; the whole cluster is simulated in one batch.
+def check_heart_rate_cluster(cluster_name, patients, members, simulator, monitor, alert_rule):
+    readings = simulator.tick(len(members))
+    process_readings(cluster_name, patients, members, readings, monitor, alert_rule)
+    return readings
+
+# Define function to raise warnings for one cluster's readings
+# Each reading is added to the patients' history in the monitor; alert_rule decides which readings raise an SMS.
+def process_readings(cluster_name, patients, members, readings, monitor, alert_rule):
+    flags = monitor.update(members, np.stack([readings['heart_rate'], readings['glucose']], axis=1))
+    alerts = alert_mask(flags, alert_rule)
+    # Only the (rare) abnormal or alerting readings need any per-patient work
+    for j in np.flatnonzero(flags['abnormal'].any(axis=1) | alerts.any(axis=1)):
+        p = members[j]
+        patient_id = int(patients.patients['id'][p])
+        name = patients.names[p]
+        age = int(patients.patients['age'][p])
+        mobile = patients.mobile(p)
+        heart_rate = int(readings['heart_rate'][j])
+        glucose_level = int(readings['glucose'][j])
+        heart_code = readings['heart_status'][j]
+        glucose_code = readings['glucose_status'][j]
+
+        if alerts[j, 0]:
+            level = alert_level(heart_code, flags['zscore'][j, 0])
+            message = f"Warning: {name}, your heart rate is {level} ({heart_rate})"
+            send_sms(mobile, message, key=(patient_id, 'heart_rate'))
+
+        if alerts[j, 1]:
+            level = alert_level(glucose_code, flags['zscore'][j, 1])
+            message = f"Warning: {name}, your blood glucose level is {level} ({glucose_level})"
+            send_sms(mobile, message, key=(patient_id, 'glucose'))
+
+        # One log record per out-of-range reading, with both statuses
+        if heart_code != NORMAL or glucose_code != NORMAL:
+            log_data(cluster_name, name, age, mobile, heart_rate, glucose_level,
+                     STATUS_LABELS[heart_code], STATUS_LABELS[glucose_code])
+
+# Define function to describe an alerting reading: out of range, or in range but unusual for the patient
+def alert_level(code, z):
+    if code != NORMAL:
+        return 'low' if code == LOW else 'high'
+    return 'unusually low' if z < 0 else 'unusually high'
 
 # Define function to send SMS
-def send_sms(to_number, message):
+# Hands the alert to the dispatcher without waiting on the network; key de-duplicates repeat alerts
+def send_sms(to_number, message, key=None):
     try:
-        message = TWILIO_CLIENT.messages.create(to=to_number, from_=TWILIO_PHONE_NUMBER, body=message)
-        print(f"Sent SMS to {to_number} with Message SID: {message.sid}")
-    except Exception as e:
-        print(f"Failed to send SMS to {to_number}: {str(e)}")
+        ALERT_SINK.put_nowait((to_number, message, key))
+    except queue.Full:
+        print(f"Alert queue full, dropped SMS to {to_number}")
 
-# Define function to log data to a text file
+# Define function to log data to the structured health log (buffered, written in the background)
 def log_data(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status):
-    with open("health_logs.txt", "a") as file:
-        file.write(f"Cluster: {cluster_name}\n")
-        file.write(f"Name: {name}\n")
-        file.write(f"Age: {age}\n")
-        file.write(f"Mobile Number: {mobile}\n")
-        file.write(f"Heart Rate: {heart_rate} ({heart_status})\n")
-        file.write(f"Blood Glucose: {glucose_level} ({glucose_status})\n")
-        file.write("-----------------------------------\n")
+    HEALTH_LOG.write(health_record(cluster_name, name, age, mobile, heart_rate, glucose_level,
+                                   heart_status, glucose_status))
+
+# Define function naming a VM's health log: health_logs.jsonl -> health_logs.vm1.jsonl
+# Each worker process writes (and rotates) its own file; read them together with healthlog.read_health_logs
+def vm_log_path(base, vm_id):
+    root, ext = os.path.splitext(base)
+    return f"{root}.vm{vm_id}{ext}"
+
+# Define function taking one item from a VM's inbox, keeping its backlog count in step
+# (Queue.qsize() is not implemented on macOS, so each VM counts its queued clusters in a shared Value)
+def take(inbox, backlog, block=True, timeout=None):
+    item = inbox.get(block, timeout)
+    if item is not None:
+        with backlog.get_lock():
+            backlog.value -= 1
+    return item
+
+# Define function taking a VM's next work item, stealing from the busiest peer while its own inbox is empty
+# peers are the other VMs' (inbox, backlog) pairs (None disables stealing). A stolen stop sentinel (None) is put back.
+def next_item(inbox, backlog, peers):
+    if not peers:
+        return take(inbox, backlog)
+    while True:
+        try:
+            return take(inbox, backlog, block=False)
+        except queue.Empty:
+            pass
+        waiting, victim = max((peer_backlog.value, i) for i, (_, peer_backlog) in enumerate(peers))
+        if waiting >= STEAL_MIN_BACKLOG:
+            try:
+                item = take(*peers[victim], block=False)
+                if item is not None:
+                    return item
+                peers[victim][0].put(None)
+            except queue.Empty:
+                pass
+        try:
+            return take(inbox, backlog, timeout=STEAL_POLL_S)
+        except queue.Empty:
+            pass
+
+# Define function run by each VM worker process
+# Work items are (cluster_name, cluster, submitted_at, placed_on); None stops the worker.
+# Every processed cluster is reported on the shared reports queue with its timing and typed readings.
+# slowdown > 1 stretches each service time, to emulate a weaker VM.
+# detector is (monitor buffer, monitor params, alert rule); the monitor state is shared by all VMs, and a
+# patient is only ever in one cluster, processed by one VM at a time.
+# backlog counts the clusters waiting in inbox; peers are the other VMs' (inbox, backlog) pairs to steal from
+# when this VM runs out of work (None = no stealing).
+def vm_worker(vm_id, patients, inbox, backlog, reports, alerts, health_log, detector, slowdown=1.0, peers=None):
+    global ALERT_SINK, HEALTH_LOG
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the main process stops workers on CTRL + C
+    ALERT_SINK = alerts
+    HEALTH_LOG = HealthLogWriter(vm_log_path(health_log, vm_id))
+    buffer, params, alert_rule = detector
+    monitor = VitalsMonitor(len(patients), buffer=buffer, **params)
+    simulator = VitalsSimulator()
+    while True:
+        item = next_item(inbox, backlog, peers)
+        if item is None:
+            HEALTH_LOG.close()
+            break
+        cluster_name, cluster, submitted_at, placed_on = item
+        started_at = time.monotonic()
+        readings = check_heart_rate_cluster(cluster_name, patients, cluster, simulator, monitor, alert_rule)
+        if slowdown > 1.0:
+            time.sleep((time.monotonic() - started_at) * (slowdown - 1.0))
+        finished_at = time.monotonic()
+        reports.put({
+            'vm_id': vm_id,
+            'cluster': cluster_name,
+            'patients': len(cluster),
+            'abnormal': len(abnormal_positions(readings)),
+            'queued_s': started_at - submitted_at,
+            'service_s': finished_at - started_at,
+            'submitted_at': submitted_at,
+            'finished_at': finished_at,
+            'placed_on': placed_on,
+            'stolen': placed_on != vm_id,
+            'members': cluster,
+            'readings': readings,
+        })
 
 # Define class for virtual machines
+# Each VM is a worker process with its own input queue, and a shared count of the clusters waiting in it
 class VM:
-    def __init__(self, vm_id):
+    def __init__(self, vm_id, patients, reports, alerts, health_log, detector, slowdown=1.0):
         self.vm_id = vm_id
+        self.inbox = multiprocessing.Queue()
+        self.backlog = multiprocessing.Value('i', 0)
+        self.args = (vm_id, patients, self.inbox, self.backlog, reports, alerts, health_log, detector, slowdown)
+        self.process = None
+
+    def start(self, peers=None):
+        # peers: the other VMs, whose queued clusters this VM may steal
+        inboxes = [(peer.inbox, peer.backlog) for peer in peers] if peers else None
+        self.process = multiprocessing.Process(target=vm_worker, args=self.args + (inboxes,),
+                                               name=f"VM{self.vm_id}", daemon=True)
+        self.process.start()
 
     def process_cluster(self, cluster_name, cluster):
-        results = check_heart_rate_cluster(cluster_name, cluster)
-        self.write_results_to_vm(results)
-
-    def write_results_to_vm(self, results):
-        with open(f"vm{self.vm_id}_results.txt", "w") as file:
-            for row in results:
-                file.write("\t".join(str(val) for val in row) + "\n")
-
-# Define function for cluster benchmarking
-def benchmark_clusters(clusters):
-    benchmark_results = []
-    for i, cluster in enumerate(clusters):
-        cluster_name = f"Cluster {i + 1}"
-        cluster_performance = perform_benchmark(cluster)
-        benchmark_results.append((cluster_name, cluster_performance))
-    benchmark_results.sort(key=lambda x: x[1], reverse=True)  # Sort clusters based on performance (higher is better)
-    return benchmark_results
-
-# Define function to perform benchmarking for a single cluster
-def perform_benchmark(cluster):
-    # Perform benchmark tests and measure cluster performance
-    # You can implement your specific benchmarking logic here
-    # This function should return a performance score or metric for the cluster
-    return random.uniform(0, 1)
+        # Queue the cluster; the worker (or a peer that steals it) reports back when it is done
+        with self.backlog.get_lock():
+            self.backlog.value += 1
+        self.inbox.put((cluster_name, cluster, time.monotonic(), self.vm_id))
+
+    def stop(self):
+        self.inbox.put(None)
+        self.process.join()
+
+# Define function to stop all VMs, draining reports meanwhile
+# A worker only exits once its queued reports are read, which matters when stopped in the middle of a round.
+def stop_vms(vms, reports):
+    for vm in vms:
+        vm.inbox.put(None)
+    while any(vm.process.is_alive() for vm in vms):
+        try:
+            reports.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    for vm in vms:
+        vm.process.join()
+
+# Define function to run one round: place every cluster with the scheduler, then wait for all reports
+# Results go into the window (if given) as each report arrives.
+def run_round(vms, scheduler, clusters, cluster_names, reports, window=None):
+    vm_by_id = {vm.vm_id: vm for vm in vms}
+    for cluster_name, cluster in zip(cluster_names, clusters):
+        vm_by_id[scheduler.place(len(cluster))].process_cluster(cluster_name, cluster)
+    round_reports = []
+    for _ in range(len(clusters)):
+        report = reports.get()
+        latency = time.monotonic() - report['submitted_at']  # end-to-end, including the hand-back
+        scheduler.observe(report['vm_id'], report['patients'], report['service_s'], latency, report['placed_on'])
+        report['latency_s'] = latency
+        if window is not None:
+            report['ingest_s'] = window.append(report)
+        round_reports.append(report)
+    return round_reports
+
+# Define function to compare placement policies on the running VMs (p50/p99 end-to-end latency)
+# round_fn(scheduler) runs one round over whichever transport is in use
+def compare_policies(vm_ids, round_fn, rounds):
+    results = []
+    for policy in POLICIES:
+        scheduler = Scheduler(vm_ids, policy=policy)
+        for _ in range(rounds):
+            round_fn(scheduler)
+        results.append((policy, scheduler.latency_summary()))
+        print(f"{policy}: " + "; ".join(scheduler.describe()))
+    print()
+    print_policy_report(results)
+
+# Define function to divide the shuffled patients into clusters of `size`
+def make_clusters(order, size):
+    clusters = [order[i:i + size] for i in range(0, len(order), size)]
+    return clusters, [f"Cluster {i + 1}" for i in range(len(clusters))]
+
+# Define function measuring how evenly one round's work was spread over the VMs
+# imbalance is the busiest VM's service time over the mean (1.0 = perfectly even); cv is the coefficient of variation
+def load_balance(reports, vm_ids):
+    busy = np.array([sum(r['service_s'] for r in reports if r['vm_id'] == vm_id) for vm_id in vm_ids])
+    mean = busy.mean()
+    return {
+        'imbalance': float(busy.max() / mean) if mean > 0 else 1.0,
+        'cv': float(busy.std() / mean) if mean > 0 else 0.0,
+        'stolen': sum(1 for r in reports if r.get('stolen')),
+    }
+
+# Define function to print the load balance over all rounds
+def print_balance_summary(balances):
+    imbalance = np.asarray([b['imbalance'] for b in balances])
+    print(f"Load balance over {len(balances)} rounds: busiest VM / mean p50 {np.percentile(imbalance, 50):.2f}, "
+          f"worst {imbalance.max():.2f}; mean CV {np.mean([b['cv'] for b in balances]):.2f}; "
+          f"{sum(b['stolen'] for b in balances)} clusters stolen")
+
+# Define function to print how each VM did in one round of cluster processing
+def print_round_report(round_no, reports, wall_s, vms, balance=None):
+    latencies = np.asarray([r['latency_s'] for r in reports])
+    print(f"Round {round_no}: {len(reports)} clusters in {wall_s * 1000:.1f} ms "
+          f"({sum(r['patients'] for r in reports) / wall_s:,.0f} patients/sec), "
+          f"latency p50 {np.percentile(latencies, 50) * 1000:.1f} ms / p99 {np.percentile(latencies, 99) * 1000:.1f} ms")
+    if all('ingest_s' in r for r in reports):
+        ingest = np.asarray([r['ingest_s'] for r in reports])
+        print(f"  Results visible {np.percentile(ingest, 50) * 1000:.2f} ms (p50) / "
+              f"{np.percentile(ingest, 99) * 1000:.2f} ms (p99) after a VM finishes")
+    if balance is not None:
+        print(f"  Balance: busiest VM {balance['imbalance']:.2f}x the mean, CV {balance['cv']:.2f}, "
+              f"{balance['stolen']} clusters stolen")
+    for vm in vms:
+        mine = [r for r in reports if r['vm_id'] == vm.vm_id]
+        if not mine:
+            continue
+        busy = sum(r['service_s'] for r in mine)
+        wait = max(r['queued_s'] for r in mine)
+        stolen = sum(1 for r in mine if r.get('stolen'))
+        print(f"  VM{vm.vm_id}: {len(mine)} clusters ({stolen} stolen), busy {busy * 1000:.1f} ms, "
+              f"mean service {busy / len(mine) * 1000:.2f} ms, max queue wait {wait * 1000:.1f} ms")
+
+# Define function to print the newest rows of the result window
+def print_results(window, rows):
+    if rows:
+        print(window.to_frame(rows))
+        print()
 
 # Main function
 def main():
-    # Read patient data from Excel file
-    patient_data = read_patient_data_from_excel("heartdata.xlsx")
+    parser = argparse.ArgumentParser(description="Fog load-balancing healthcare monitor.")
+    parser.add_argument("--input", default="heartdata.xlsx", help="Patient roster (.xlsx, .csv or .parquet).")
+    parser.add_argument("--vms", type=int, default=3, help="Number of VM worker processes.")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between monitoring rounds.")
+    parser.add_argument("--policy", choices=list(POLICIES), default="least_loaded",
+                        help="Cluster placement policy, driven by measured VM service times.")
+    parser.add_argument("--vm-slowdown", default="",
+                        help="Comma list of per-VM slowdown factors to emulate uneven VMs, e.g. 1,1,3.")
+    parser.add_argument("--compare-policies", action="store_true",
+                        help="Run every policy for --rounds rounds, print p50/p99 latency per policy and exit.")
+    parser.add_argument("--rounds", type=int, default=20, help="Rounds per policy for --compare-policies.")
+    parser.add_argument("--window-rows", type=int, default=DEFAULT_WINDOW_ROWS,
+                        help="Most recent result rows kept in memory for the dashboard.")
+    parser.add_argument("--health-log", default="health_logs.jsonl",
+                        help="Structured health log; each VM writes <name>.vm<N>.jsonl, rotated by size.")
+    parser.add_argument("--sms", choices=["twilio", "mock"], default="twilio",
+                        help="SMS transport; mock sends nowhere (for testing and benchmarks).")
+    parser.add_argument("--sms-rate", type=float, default=1.0, help="Maximum SMS per second.")
+    parser.add_argument("--sms-concurrency", type=int, default=4, help="SMS requests in flight at once.")
+    parser.add_argument("--alert-window", type=float, default=300.0,
+                        help="Seconds during which repeat alerts for the same patient and vital are suppressed.")
+    parser.add_argument("--alert-rule", choices=ALERT_RULES, default="sustained",
+                        help="Which readings send an SMS: threshold (every out-of-range reading), sustained "
+                             "(K of the last N out of range), zscore (far from the patient's recent mean), or both.")
+    parser.add_argument("--sustained", default=f"{DEFAULT_SUSTAINED_K}/{DEFAULT_SUSTAINED_N}", help="K/N for the sustained rule.")
+    parser.add_argument("--z-threshold", type=float, default=DEFAULT_Z_THRESHOLD, help="Standard deviations for the zscore rule.")
+    parser.add_argument("--history", type=int, default=DEFAULT_WINDOW, help="Readings kept per patient and vital.")
+    parser.add_argument("--cluster-size", default="auto",
+                        help=f"Patients per cluster; auto starts at {MIN_CLUSTER_SIZE} and adapts to the measured "
+                             "cost per patient between rounds.")
+    parser.add_argument("--cluster-target-ms", type=float, default=DEFAULT_CLUSTER_TARGET_MS,
+                        help="VM time per cluster that --cluster-size auto aims for.")
+    parser.add_argument("--no-steal", action="store_true",
+                        help="Disable work stealing between VMs (to compare the load balance with and without it).")
+    parser.add_argument("--transport", choices=["queue", "tcp"], default="queue",
+                        help="queue: VM workers are forked processes fed by multiprocessing queues; tcp: VM workers "
+                             "are separate processes on localhost sockets (fognet.py), with heartbeats and failover. "
+                             "Either way the VMs update the patient history, raise alerts and write the health log.")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help="TCP connections kept open to each VM (--transport tcp).")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Clusters in flight per VM before the edge waits for results (--transport tcp).")
+    parser.add_argument("--heartbeat", type=float, default=DEFAULT_HEARTBEAT,
+                        help="Seconds between VM heartbeats; a VM missing 3 is failed over (--transport tcp).")
+    args = parser.parse_args()
+    slowdowns = [float(x) for x in args.vm_slowdown.split(",") if x.strip()]
 
-    # Shuffle the patient data
-    random.shuffle(patient_data)
+    # Read patient data from the roster
+    patients = load_roster(args.input)
 
-    # Divide patients into clusters with at least 6 values in each cluster
-    num_clusters = (len(patient_data) + 5) // 6
-    clusters = [patient_data[i * 6: (i + 1) * 6] for i in range(num_clusters)]
+    # Shuffle the patients
+    order = np.random.permutation(len(patients)).astype(np.int32)
 
-    # Benchmark clusters and allocate tasks based on performance
-    benchmark_results = benchmark_clusters(clusters)
-    print("Benchmark Results:")
-    for i, (cluster_name, _) in enumerate(benchmark_results):
-        print(f"Cluster {i + 1}: {cluster_name}")
+    # Divide patients into clusters (each cluster is an array of positions in the patient store)
+    # With --cluster-size auto they start at 6 patients and are re-cut between rounds from the measured cost
+    adaptive = args.cluster_size == "auto"
+    cluster_size = MIN_CLUSTER_SIZE if adaptive else int(args.cluster_size)
+    clusters, cluster_names = make_clusters(order, cluster_size)
+    print(f"{len(clusters)} clusters of up to {cluster_size} patients")
     print()
 
-    # Create VMs
-    num_vms = 3  # Number of VMs
-    vms = [VM(vm_id) for vm_id in range(1, num_vms + 1)]
+    # Start the alert dispatcher; VM workers feed it through a shared queue
+    if args.sms == "mock":
+        transport = MockTransport()
+    else:
+        transport = TwilioTransport(ACCOUNT_SID, AUTH_TOKEN, TWILIO_PHONE_NUMBER)
+    dispatcher = AlertDispatcher(transport, concurrency=args.sms_concurrency, rate=args.sms_rate,
+                                 dedup_window_s=args.alert_window).start()
+    tcp = args.transport == "tcp"
+    alert_queue = queue.Queue(ALERT_QUEUE_SIZE) if tcp else multiprocessing.Queue(ALERT_QUEUE_SIZE)
+    forwarder = dispatcher.forward_from(alert_queue)
 
-    # Assign clusters to VMs
-    for i, (cluster_name, _) in enumerate(benchmark_results):
-        vm = vms[i % num_vms]
-        vm.process_cluster(cluster_name, clusters[i])
+    # Create VMs (one worker process each)
+    num_vms = args.vms  # Number of VMs
+    reports = multiprocessing.Queue()
+    # Per-patient reading history, in shared memory so every VM can update any cluster
+    # (with --transport tcp, a named segment the separately started worker processes attach to)
+    sustained_k, sustained_n = (int(x) for x in args.sustained.split("/"))
+    params = {'window': args.history, 'sustained_k': sustained_k, 'sustained_n': sustained_n,
+              'z_threshold': args.z_threshold}
 
-    # Continuously monitor and update output
-    while True:
-        time.sleep(5)  # Sleep for 5 seconds
-        output_data = []
+    if tcp:
+        VitalsMonitor(len(patients), **params)  # check the params here rather than in every worker
+        state = shared_memory.SharedMemory(create=True, size=VitalsMonitor.state_size(len(patients), **params))
+        config = {'input': os.path.abspath(args.input), 'monitor': state.name, 'params': params,
+                  'alert_rule': args.alert_rule, 'health_log': os.path.abspath(args.health_log)}
+        coordinator = FogCoordinator(range(1, num_vms + 1), config, alert_queue, slowdowns, args.connections,
+                                     args.max_inflight, args.heartbeat)
+        vms = list(coordinator.nodes.values())
+    else:
+        monitor = VitalsMonitor.shared(len(patients), **params)
+        detector = (monitor.buffer, monitor.params, args.alert_rule)
+        coordinator = None
+        vms = [VM(vm_id, patients, reports, alert_queue, args.health_log, detector,
+                  slowdowns[vm_id - 1] if vm_id <= len(slowdowns) else 1.0)
+               for vm_id in range(1, num_vms + 1)]
+        # Every VM may steal queued clusters from the others (the TCP edge instead keeps unsent clusters
+        # itself and only hands them out as the VMs' windows free up)
         for vm in vms:
-            with open(f"vm{vm.vm_id}_results.txt", "r") as file:
-                lines = file.readlines()
-                for line in lines:
-                    data = line.strip().split("\t")
-                    output_data.append(data)
-            with open(f"vm{vm.vm_id}_results.txt", "w") as file:
-                pass  # Clear the contents of the file
-        if output_data:
-            df = pd.DataFrame(output_data, columns=['Cluster', 'Name', 'Age', 'Mobile Number', 'Heart Rate', 'Heart Status', 'Blood Glucose', 'Glucose Status'])
-            print(df)
-            print()
+            vm.start(None if args.no_steal else [peer for peer in vms if peer is not vm])
+
+    # Continuously process clusters on the VMs and monitor the output
+    scheduler = Scheduler([vm.vm_id for vm in vms], policy=args.policy)
+    window = ResultWindow(patients, args.window_rows)
+
+    def on_result(report):
+        report['ingest_s'] = window.append(report)
+
+    def round_fn(scheduler, window=None):
+        if tcp:
+            return coordinator.run_round(scheduler, clusters, cluster_names, on_result)
+        return run_round(vms, scheduler, clusters, cluster_names, reports, window)
+
+    round_no = 0
+    balances = []
+    try:
+        if args.compare_policies:
+            compare_policies([vm.vm_id for vm in vms if not tcp or vm.alive], round_fn, args.rounds)
+            return
+        while True:
+            round_no += 1
+            round_start = time.monotonic()
+
+            # Place clusters on VMs by measured load; all VMs work on their clusters at the same time
+            round_reports = round_fn(scheduler, window)
+            balances.append(load_balance(round_reports, list(scheduler.loads)))
+            print_round_report(round_no, round_reports, time.monotonic() - round_start, vms, balances[-1])
+            for line in scheduler.describe():
+                print(f"  Scheduler {line}")
+
+            # Re-cut the clusters when the measured cost calls for a size at least 25% different
+            if adaptive:
+                size = adaptive_cluster_size(scheduler, len(patients), args.cluster_target_ms / 1000, MIN_CLUSTER_SIZE)
+                if abs(size - cluster_size) >= 0.25 * cluster_size:
+                    clusters, cluster_names = make_clusters(order, size)
+                    print(f"  Cluster size {cluster_size} -> {size} patients ({len(clusters)} clusters, "
+                          f"{scheduler.mean_cost() * 1e6:.1f} us/patient measured)")
+                    cluster_size = size
+
+            print_results(window, sum(r['patients'] for r in round_reports))
+            time.sleep(max(0.0, args.interval - (time.monotonic() - round_start)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if balances:
+            print_balance_summary(balances)
+        if tcp:
+            coordinator.close()
+            state.close()
+            state.unlink()
+        else:
+            stop_vms(vms, reports)
+        alert_queue.put(None)
+        forwarder.join()
+        dispatcher.close()
+        print(f"Alerts: {dispatcher.summary()}")
 
 if __name__ == "__main__":
     main()
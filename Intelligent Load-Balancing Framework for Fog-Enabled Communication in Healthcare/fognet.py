@@ -0,0 +1,543 @@
+import os
+import sys
+import json
+import time
+import queue
+import struct
+import signal
+import socket
+import argparse
+import itertools
+import selectors
+import threading
+import subprocess
+import tempfile
+from collections import deque
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from vitals import READING_DTYPE, VitalsSimulator, abnormal_positions
+from scheduler import POLICIES, Scheduler
+from roster import load_roster, write_synthetic_roster
+from anomaly import ALERT_RULES, VitalsMonitor
+from healthlog import HealthLogWriter
+
+# Wire format: every frame is a 5-byte header (payload length, frame type) followed by the payload.
+#   HELLO      worker -> edge   vm id (uint16)
+#   WORK       edge -> worker   sequence number (uint32), name length (uint16), the cluster name (UTF-8),
+#                               then the cluster's patient positions (int32 each)
+#   RESULT     worker -> edge   sequence number (uint32), service seconds (float64), then one reading per patient
+#   ALERT      worker -> edge   JSON [to_number, message, key]; sent to the edge's alert dispatcher
+#   HEARTBEAT  worker -> edge   empty; sent every heartbeat interval on every connection
+#   STOP       edge -> worker   empty; the worker exits
+# Integers in headers are big-endian; arrays are little-endian numpy data, so a 6-patient cluster
+# named "Cluster 123" is 46 bytes out and 53 bytes back.
+HEADER = struct.Struct('!IB')
+HELLO, WORK, RESULT, HEARTBEAT, STOP, ALERT = range(1, 7)
+HELLO_BODY = struct.Struct('!H')
+WORK_HEAD = struct.Struct('!IH')
+RESULT_HEAD = struct.Struct('!Id')
+MEMBER_DTYPE = np.dtype('<i4')
+WIRE_READING_DTYPE = READING_DTYPE.newbyteorder('<')
+
+# Seconds between heartbeats; a worker silent for HEARTBEAT_MISSES intervals is declared failed
+DEFAULT_HEARTBEAT = 0.2
+HEARTBEAT_MISSES = 3
+
+# Connections kept open to each worker, and clusters in flight per worker before the edge stops sending
+DEFAULT_CONNECTIONS = 2
+DEFAULT_MAX_INFLIGHT = 32
+
+RECV_BYTES = 1 << 16
+
+# Seconds the edge spends at most sending STOP to the workers when it shuts down
+STOP_TIMEOUT = 2.0
+
+# Define function building one frame
+def encode_frame(kind, payload=b''):
+    return HEADER.pack(len(payload), kind) + payload
+
+# Define function reading exactly n bytes from a blocking socket (None if the peer closed it)
+def recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+# Define function reading one frame from a blocking socket: (type, payload), or (None, b'') at end of stream
+def read_frame(sock):
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None, b''
+    length, kind = HEADER.unpack(header)
+    payload = recv_exact(sock, length) if length else b''
+    if payload is None:
+        return None, b''
+    return kind, payload
+
+# Define class splitting a non-blocking byte stream into frames
+class FrameReader:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        # Returns the frames completed by data; a partial frame stays buffered
+        self.buffer += data
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.buffer, offset)
+            end = offset + HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append((kind, bytes(self.buffer[offset + HEADER.size:end])))
+            offset = end
+        del self.buffer[:offset]
+        return frames
+
+# Worker side (VM tier)
+
+# Define class passing alerts raised in a worker back to the edge, on the connection of the cluster that raised them
+# It stands in for the alert queue of cloudgen.py (ALERT_SINK), so send_sms() works unchanged.
+class SocketAlertSink:
+    def __init__(self):
+        self.local = threading.local()   # .send of the connection served by the current thread
+
+    def put_nowait(self, item):
+        to_number, message, key = item
+        self.local.send(ALERT, json.dumps([to_number, message, key]).encode())
+
+# Define function serving one connection from the edge: process each cluster sent, send its readings back
+# process(cluster_name, members, simulator) does the VM's work and returns the readings; alerts it raises
+# go out through sink on this connection. A second thread sends heartbeats on the same connection;
+# a lock keeps their frames from interleaving. Returns True if the edge asked the worker to stop.
+def serve_connection(conn, vm_id, slowdown, heartbeat_s, process, sink):
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def send(kind, payload=b''):
+        with lock:
+            conn.sendall(encode_frame(kind, payload))
+
+    def beat():
+        while not done.wait(heartbeat_s):
+            try:
+                send(HEARTBEAT)
+            except OSError:
+                return
+
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sink.local.send = send
+    simulator = VitalsSimulator()
+    kind = None
+    try:
+        send(HELLO, HELLO_BODY.pack(vm_id))
+        threading.Thread(target=beat, daemon=True).start()
+        while True:
+            kind, payload = read_frame(conn)
+            if kind is None or kind == STOP:
+                break
+            if kind != WORK:
+                continue
+            seq, name_len = WORK_HEAD.unpack_from(payload)
+            cluster_name = payload[WORK_HEAD.size:WORK_HEAD.size + name_len].decode()
+            members = np.frombuffer(payload, dtype=MEMBER_DTYPE, offset=WORK_HEAD.size + name_len)
+            started_at = time.perf_counter()
+            readings = process(cluster_name, members, simulator)
+            if slowdown > 1.0:
+                time.sleep((time.perf_counter() - started_at) * (slowdown - 1.0))
+            service_s = time.perf_counter() - started_at
+            send(RESULT, RESULT_HEAD.pack(seq, service_s) + readings.astype(WIRE_READING_DTYPE).tobytes())
+    except OSError:
+        pass
+    finally:
+        done.set()
+        conn.close()
+    return kind == STOP
+
+# Define function running a VM worker: listen on localhost, serve every connection from the edge in its own thread
+# Each cluster gets the same fog processing as a queue-transport VM (cloudgen.process_readings): the patients'
+# history is updated, alerts are raised and out-of-range readings go to this VM's health log.
+# config (from the edge) names the roster, the shared-memory monitor state and its params, the alert rule and
+# the health log base name. The port actually bound is printed as "PORT <n>" so the edge can start workers on
+# free ports.
+def run_worker(vm_id, config, port=0, slowdown=1.0, heartbeat_s=DEFAULT_HEARTBEAT):
+    import cloudgen  # not at the top: cloudgen imports this module
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the edge stops workers on CTRL + C
+    patients = load_roster(config['input'])
+    state = shared_memory.SharedMemory(name=config['monitor'])
+    resource_tracker.unregister(state._name, 'shared_memory')  # the edge owns (and unlinks) the segment
+    monitor = VitalsMonitor(len(patients), buffer=state.buf, **config['params'])
+    sink = SocketAlertSink()
+    cloudgen.ALERT_SINK = sink
+    cloudgen.HEALTH_LOG = HealthLogWriter(cloudgen.vm_log_path(config['health_log'], vm_id))
+
+    def process(cluster_name, members, simulator):
+        return cloudgen.check_heart_rate_cluster(cluster_name, patients, members, simulator, monitor,
+                                                 config['alert_rule'])
+
+    stop = threading.Event()
+    server = socket.create_server(('127.0.0.1', port))
+    server.settimeout(0.5)
+    print(f"PORT {server.getsockname()[1]}", flush=True)
+
+    def serve(conn):
+        if serve_connection(conn, vm_id, slowdown, heartbeat_s, process, sink):
+            stop.set()
+
+    threads = []
+    while not stop.is_set():
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            continue
+        conn.settimeout(None)
+        thread = threading.Thread(target=serve, args=(conn,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    server.close()
+    # The edge sends STOP on every connection and then closes them, so every thread ends; wait for
+    # them so none is still writing results, alerts or log records when the log is closed
+    for thread in threads:
+        thread.join()
+    cloudgen.HEALTH_LOG.close()
+    monitor = None  # drop the views on the segment so it can be closed
+    state.close()
+
+# Edge side (cluster coordinator)
+
+# Define class for one VM worker process as seen from the edge
+class FogNode:
+    def __init__(self, vm_id, process, port):
+        self.vm_id = vm_id
+        self.process = process
+        self.port = port
+        self.conns = []
+        self.readers = {}    # connection -> FrameReader
+        self.outbox = {}     # connection -> bytes not yet accepted by the socket
+        self.next_conn = 0
+        self.inflight = {}   # sequence number -> (cluster index, cluster name, members, submitted_at)
+        self.alive = True
+        self.last_seen = time.monotonic()
+
+# Define class coordinating VM worker processes over localhost TCP
+# Each worker is started as its own Python process (run_worker, given worker_config) and reached through a
+# small pool of persistent connections. Alerts the workers raise are put on the alerts queue as
+# (to_number, message, key), for the edge's AlertDispatcher. Sockets stay non-blocking: frames the socket does
+# not take at once wait in a per-connection outbox and go out as the socket becomes writable, so a worker
+# that stops reading never blocks the edge's heartbeat checks. At most max_inflight clusters are outstanding
+# per worker (backpressure: when every live worker's window is full the edge waits for results instead of
+# queueing more). A worker whose connection drops, or that misses HEARTBEAT_MISSES heartbeats, is declared
+# failed: it is removed from the scheduler and its in-flight clusters are placed again on the remaining
+# workers (a cluster the failed worker had already partly processed is processed again, so those patients
+# may get one extra sample in their history).
+class FogCoordinator:
+    def __init__(self, vm_ids, worker_config, alerts, slowdowns=(), connections=DEFAULT_CONNECTIONS,
+                 max_inflight=DEFAULT_MAX_INFLIGHT, heartbeat_s=DEFAULT_HEARTBEAT, verbose=True):
+        self.alerts = alerts
+        self.connections = connections
+        self.max_inflight = max_inflight
+        self.heartbeat_s = heartbeat_s
+        self.timeout_s = heartbeat_s * HEARTBEAT_MISSES
+        self.verbose = verbose
+        self.selector = selectors.DefaultSelector()
+        self.seq = itertools.count()
+        self.nodes = {}
+        self.failures = []   # one dict per failed worker
+        self.stats = {'sent': 0, 'received': 0, 'reassigned': 0, 'alerts': 0, 'alerts_dropped': 0,
+                      'bytes_out': 0, 'bytes_in': 0}
+        script = os.path.abspath(__file__)
+        for i, vm_id in enumerate(vm_ids):
+            slowdown = slowdowns[i] if i < len(slowdowns) else 1.0
+            process = subprocess.Popen([sys.executable, script, "worker", "--vm-id", str(vm_id),
+                                        "--slowdown", str(slowdown), "--heartbeat", str(heartbeat_s),
+                                        "--config", json.dumps(worker_config)],
+                                       stdout=subprocess.PIPE, text=True)
+            line = process.stdout.readline().split()
+            if len(line) != 2 or line[0] != "PORT":
+                process.kill()
+                raise RuntimeError(f"VM{vm_id} worker did not start")
+            self.nodes[vm_id] = FogNode(vm_id, process, int(line[1]))
+        for node in self.nodes.values():
+            for _ in range(connections):
+                sock = socket.create_connection(('127.0.0.1', node.port))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setblocking(False)
+                node.conns.append(sock)
+                node.readers[sock] = FrameReader()
+                node.outbox[sock] = bytearray()
+                self.selector.register(sock, selectors.EVENT_READ, node)
+            node.last_seen = time.monotonic()   # the heartbeats start with the connections
+
+    def live_nodes(self):
+        return [node for node in self.nodes.values() if node.alive]
+
+    def send_work(self, node, index, cluster_name, members):
+        seq = next(self.seq) & 0xFFFFFFFF
+        name = cluster_name.encode()
+        frame = encode_frame(WORK, WORK_HEAD.pack(seq, len(name)) + name
+                             + np.asarray(members, dtype=MEMBER_DTYPE).tobytes())
+        sock = node.conns[node.next_conn % len(node.conns)]
+        node.next_conn += 1
+        node.inflight[seq] = (index, cluster_name, members, time.monotonic())
+        node.outbox[sock] += frame
+        self.stats['sent'] += 1
+        self.stats['bytes_out'] += len(frame)
+        return self.flush(node, sock)
+
+    def flush(self, node, sock):
+        # Sends as much of the connection's outbox as the socket takes without blocking, and watches
+        # the socket for writability while anything is left; returns False if the connection failed
+        outbox = node.outbox[sock]
+        try:
+            while outbox:
+                sent = sock.send(outbox)
+                del outbox[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if outbox else 0)
+        if self.selector.get_key(sock).events != events:
+            self.selector.modify(sock, events, node)
+        return True
+
+    def fail(self, node, reason, scheduler, pending):
+        # Declares node failed and puts its in-flight clusters back at the front of pending
+        node.alive = False
+        for sock in node.conns:
+            self.selector.unregister(sock)
+            sock.close()
+        node.conns = []
+        node.readers = {}
+        node.outbox = {}
+        if node.vm_id in scheduler.loads:
+            scheduler.remove(node.vm_id)
+        lost = sorted(node.inflight.values(), key=lambda job: job[3])
+        node.inflight = {}
+        pending.extendleft(reversed([job[0] for job in lost]))
+        self.stats['reassigned'] += len(lost)
+        if node.process.poll() is None:
+            node.process.kill()
+        node.process.wait()
+        now = time.monotonic()
+        self.failures.append({'vm_id': node.vm_id, 'reason': reason, 'detected_at': now,
+                              'silent_s': now - node.last_seen, 'reassigned': len(lost)})
+        if self.verbose:
+            print(f"  VM{node.vm_id} failed ({reason}, silent {(now - node.last_seen) * 1000:.0f} ms); "
+                  f"{len(lost)} clusters reassigned to {len(self.live_nodes())} live VMs")
+
+    def complete(self, node, payload, scheduler):
+        # Turns a RESULT frame into a report dict like the ones vm_worker in cloudgen.py produces
+        seq, service_s = RESULT_HEAD.unpack_from(payload)
+        job = node.inflight.pop(seq, None)
+        if job is None:
+            return None
+        index, cluster_name, members, submitted_at = job
+        readings = np.frombuffer(payload, dtype=WIRE_READING_DTYPE, offset=RESULT_HEAD.size).astype(READING_DTYPE)
+        finished_at = time.monotonic()
+        latency = finished_at - submitted_at
+        scheduler.observe(node.vm_id, len(members), service_s, latency)
+        return {
+            'vm_id': node.vm_id,
+            'cluster': cluster_name,
+            'patients': len(members),
+            'abnormal': len(abnormal_positions(readings)),
+            'queued_s': latency - service_s,   # waiting plus both trips over the wire
+            'service_s': service_s,
+            'submitted_at': submitted_at,
+            'finished_at': finished_at,
+            'latency_s': latency,
+            'members': members,
+            'readings': readings,
+        }
+
+    def receive(self, node, sock, scheduler, pending, reports, on_result):
+        # Reads whatever is waiting on one connection; returns True if anything was
+        if not node.alive:
+            return False
+        try:
+            data = sock.recv(RECV_BYTES)
+        except BlockingIOError:
+            return False
+        except OSError:
+            data = b''
+        if not data:
+            self.fail(node, "connection closed", scheduler, pending)
+            return False
+        node.last_seen = time.monotonic()
+        self.stats['bytes_in'] += len(data)
+        for kind, payload in node.readers[sock].feed(data):
+            if kind == ALERT:
+                to_number, message, key = json.loads(payload)
+                try:
+                    self.alerts.put_nowait((to_number, message, tuple(key) if key is not None else None))
+                    self.stats['alerts'] += 1
+                except queue.Full:
+                    self.stats['alerts_dropped'] += 1
+                continue
+            if kind != RESULT:
+                continue
+            report = self.complete(node, payload, scheduler)
+            if report is None:
+                continue
+            self.stats['received'] += 1
+            if on_result is not None:
+                on_result(report)
+            reports.append(report)
+        return True
+
+    def run_round(self, scheduler, clusters, cluster_names, on_result=None):
+        # Places every cluster on the live workers and waits for all of them; on_result(report) is
+        # called as each result arrives. Clusters of a worker that fails mid-round are placed again.
+        pending = deque(range(len(clusters)))
+        reports = []
+        while len(reports) < len(clusters):
+            if not self.live_nodes():
+                raise RuntimeError("All VM workers have failed")
+            while pending:
+                allowed = {node.vm_id for node in self.live_nodes() if len(node.inflight) < self.max_inflight}
+                if not allowed:
+                    break   # every window is full: wait for results
+                index = pending.popleft()
+                node = self.nodes[scheduler.place(len(clusters[index]), allowed)]
+                if not self.send_work(node, index, cluster_names[index], clusters[index]):
+                    self.fail(node, "send failed", scheduler, pending)
+
+            for key, events in self.selector.select(timeout=self.heartbeat_s):
+                node = key.data
+                if events & selectors.EVENT_WRITE and node.alive and not self.flush(node, key.fileobj):
+                    self.fail(node, "send failed", scheduler, pending)
+                if events & selectors.EVENT_READ:
+                    self.receive(node, key.fileobj, scheduler, pending, reports, on_result)
+
+            now = time.monotonic()
+            for node in self.live_nodes():
+                if now - node.last_seen > self.timeout_s:
+                    # The edge may only have been too busy to read: look for frames already waiting first
+                    received = [self.receive(node, sock, scheduler, pending, reports, on_result)
+                                for sock in list(node.conns)]
+                    if node.alive and not any(received):
+                        self.fail(node, "missed heartbeats", scheduler, pending)
+        return reports
+
+    def close(self):
+        # STOP goes out on every connection (after anything still queued), so every connection thread
+        # of a worker ends; a worker that has not exited soon after is killed below
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for node in self.live_nodes():
+            for sock in node.conns:
+                try:
+                    sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                    sock.sendall(bytes(node.outbox[sock]) + encode_frame(STOP))
+                except OSError:
+                    pass
+        for node in self.nodes.values():
+            for sock in node.conns:
+                self.selector.unregister(sock)
+                sock.close()
+            node.conns = []
+            try:
+                node.process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                node.process.kill()
+                node.process.wait()
+        self.selector.close()
+
+# Benchmark: throughput over real process boundaries, and failover when a worker is killed or hangs
+def bench(args):
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(args.patients).astype(np.int32)
+    clusters = [order[i:i + 6] for i in range(0, args.patients, 6)]
+    cluster_names = [f"Cluster {i + 1}" for i in range(len(clusters))]
+    slowdowns = [float(x) for x in args.vm_slowdown.split(",") if x.strip()]
+    fail_vm, fail_round = (int(x) for x in args.fail.split("@")) if args.fail else (None, None)
+
+    # The workers run the full fog pipeline, so they need a roster, the shared monitor state and a health log
+    workdir = tempfile.TemporaryDirectory()
+    roster_path = args.input or os.path.join(workdir.name, "roster.csv")
+    if not args.input:
+        write_synthetic_roster(roster_path, args.patients, args.seed)
+    n_patients = len(load_roster(roster_path))
+    if n_patients < args.patients:
+        raise SystemExit(f"{roster_path} has {n_patients} patients, fewer than --patients {args.patients}")
+    state = shared_memory.SharedMemory(create=True, size=VitalsMonitor.state_size(n_patients))
+    config = {'input': os.path.abspath(roster_path), 'monitor': state.name, 'params': {},
+              'alert_rule': args.alert_rule, 'health_log': os.path.join(workdir.name, "health_logs.jsonl")}
+    alerts = queue.Queue()
+
+    coordinator = FogCoordinator(range(1, args.vms + 1), config, alerts, slowdowns, args.connections,
+                                 args.max_inflight, args.heartbeat)
+    scheduler = Scheduler(list(coordinator.nodes), policy=args.policy)
+    injected_at = None
+    try:
+        for round_no in range(1, args.rounds + 1):
+            failures_before = len(coordinator.failures)
+            start = time.monotonic()
+            if round_no == fail_round:
+                # Fail the worker once its first few clusters of the round are in flight
+                node = coordinator.nodes[fail_vm]
+                sig = signal.SIGKILL if args.fail_mode == "kill" else signal.SIGSTOP
+                timer = threading.Timer(0.005, lambda: os.kill(node.process.pid, sig))
+                timer.start()
+                injected_at = time.monotonic() + 0.005
+            reports = coordinator.run_round(scheduler, clusters, cluster_names)
+            wall = time.monotonic() - start
+            latencies = np.asarray([r['latency_s'] for r in reports])
+            print(f"Round {round_no}: {len(reports)} clusters in {wall * 1000:.1f} ms "
+                  f"({args.patients / wall:,.0f} patients/sec), latency p50 {np.percentile(latencies, 50) * 1000:.2f} ms"
+                  f" / p99 {np.percentile(latencies, 99) * 1000:.2f} ms, {len(coordinator.live_nodes())} live VMs")
+            for failure in coordinator.failures[failures_before:]:
+                if injected_at is not None:
+                    print(f"  Detected {(failure['detected_at'] - injected_at) * 1000:.0f} ms after the "
+                          f"{args.fail_mode} ({failure['reason']}); {failure['reassigned']} clusters reassigned")
+    finally:
+        coordinator.close()
+        state.close()
+        state.unlink()
+        workdir.cleanup()
+    stats = coordinator.stats
+    print(f"Frames: {stats['sent']} out ({stats['bytes_out'] / max(stats['sent'], 1):.0f} bytes each), "
+          f"{stats['received']} results, {stats['reassigned']} reassigned, "
+          f"{stats['bytes_in'] / 2**20:.1f} MB in (results, alerts + heartbeats)")
+    print(f"Alerts raised by the workers: {stats['alerts']} ({args.alert_rule} rule)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Localhost TCP transport between the edge and VM worker processes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Run one VM worker (started by the edge; prints the port it listens on).")
+    worker.add_argument("--vm-id", type=int, required=True)
+    worker.add_argument("--port", type=int, default=0, help="Port to listen on; 0 picks a free one.")
+    worker.add_argument("--slowdown", type=float, default=1.0, help="Stretch each service time, to emulate a weaker VM.")
+    worker.add_argument("--heartbeat", type=float, default=DEFAULT_HEARTBEAT, help="Seconds between heartbeats.")
+    worker.add_argument("--config", required=True,
+                        help="JSON from the edge: roster, shared monitor state, alert rule and health log.")
+    bench_parser = sub.add_parser("bench", help="Measure throughput and failover with local worker processes.")
+    bench_parser.add_argument("--patients", type=int, default=60000, help="Patients per round (clusters of 6).")
+    bench_parser.add_argument("--input", default="",
+                              help="Patient roster for the workers; by default a synthetic one of --patients.")
+    bench_parser.add_argument("--alert-rule", choices=ALERT_RULES, default="sustained",
+                              help="Which readings the workers raise alerts for.")
+    bench_parser.add_argument("--vms", type=int, default=3, help="Number of VM worker processes.")
+    bench_parser.add_argument("--rounds", type=int, default=6, help="Rounds to run.")
+    bench_parser.add_argument("--policy", choices=list(POLICIES), default="least_loaded", help="Placement policy.")
+    bench_parser.add_argument("--vm-slowdown", default="", help="Comma list of per-VM slowdown factors.")
+    bench_parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help="Connections per worker.")
+    bench_parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                              help="Clusters in flight per worker before the edge waits.")
+    bench_parser.add_argument("--heartbeat", type=float, default=DEFAULT_HEARTBEAT, help="Seconds between heartbeats.")
+    bench_parser.add_argument("--fail", default="", help="VM@ROUND: fail this worker during this round, e.g. 2@3.")
+    bench_parser.add_argument("--fail-mode", choices=["kill", "hang"], default="kill",
+                              help="kill: SIGKILL (connection drops); hang: SIGSTOP (only heartbeats notice).")
+    bench_parser.add_argument("--seed", type=int, default=1, help="Random seed for the cluster layout.")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.vm_id, json.loads(args.config), args.port, args.slowdown, args.heartbeat)
+    else:
+        bench(args)
+
+if __name__ == "__main__":
+    main()
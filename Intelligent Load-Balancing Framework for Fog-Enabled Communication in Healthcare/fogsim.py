@@ -0,0 +1,211 @@
+import json
+import time
+import heapq
+import argparse
+import itertools
+from collections import deque
+import numpy as np
+import pandas as pd
+from scheduler import POLICIES, Scheduler, print_policy_report
+
+# Patients per cluster, as in cloudgen.py
+CLUSTER_SIZE = 6
+
+ARRIVALS = ('periodic', 'poisson', 'bursty')
+
+# Bursty arrivals: all of a cycle's clusters arrive in the first BURST_DUTY of each BURST_CYCLE intervals
+BURST_DUTY = 0.25
+BURST_CYCLE = 1.0
+
+# Define function generating the simulated workload: one row per cluster job
+# Every policy is run on the same jobs, so differences come from placement alone.
+def make_jobs(patients, cluster_size, interval, rounds, arrivals, anomaly_rate, jitter, rng):
+    sizes_per_round = np.full(patients // cluster_size, cluster_size)
+    if patients % cluster_size:
+        sizes_per_round = np.append(sizes_per_round, patients % cluster_size)
+    n = len(sizes_per_round) * rounds
+    duration = interval * rounds
+    if arrivals == 'periodic':
+        # Every cluster at the start of each round, like the cloudgen.py monitoring loop
+        times = np.repeat(np.arange(rounds) * interval, len(sizes_per_round)).astype(np.float64)
+    elif arrivals == 'poisson':
+        times = np.cumsum(rng.exponential(duration / n, size=n))
+    elif arrivals == 'bursty':
+        on = BURST_DUTY * BURST_CYCLE * interval
+        virtual = np.cumsum(rng.exponential(rounds * on / n, size=n))
+        times = (virtual // on) * BURST_CYCLE * interval + virtual % on
+    else:
+        raise ValueError(f"Unknown arrival process: {arrivals}")
+    sizes = np.tile(sizes_per_round, rounds)
+    return {
+        'arrival': times,
+        'size': sizes,
+        'anomalies': rng.binomial(sizes, anomaly_rate),
+        'jitter': rng.lognormal(0.0, jitter, size=n) if jitter > 0 else np.ones(n),
+    }
+
+# Define function giving VM speeds (1.0 = average): explicit list, or lognormal spread around 1
+def make_speeds(vms, speeds, heterogeneity, rng):
+    if speeds and len(speeds) == vms:
+        return np.asarray(speeds, dtype=np.float64)
+    spread = rng.lognormal(0.0, heterogeneity, size=vms) if heterogeneity > 0 else np.ones(vms)
+    return spread / spread.mean()
+
+# Define function simulating one policy on a workload
+# Each VM serves its clusters in order (one at a time); the scheduler places each cluster on arrival and
+# observes each completion, exactly as in run_round() in cloudgen.py, but in simulated time.
+def simulate(policy, jobs, speeds, cost_per_patient, alert_cost, seed):
+    scheduler = Scheduler(list(range(1, len(speeds) + 1)), policy=policy, seed=seed)
+    queues = {vm_id: deque() for vm_id in scheduler.loads}
+    busy_until = {vm_id: None for vm_id in scheduler.loads}
+    busy_s = {vm_id: 0.0 for vm_id in scheduler.loads}
+    queue_area = 0.0   # integral of waiting clusters over time
+    waiting = 0
+    queue_max = 0
+    last_t = 0.0
+    completions = []   # (time, seq, vm_id, job index, service_s)
+    latencies = np.empty(len(jobs['arrival']))
+    seq = itertools.count()
+
+    arrival, size, anomalies, jitter = jobs['arrival'], jobs['size'], jobs['anomalies'], jobs['jitter']
+    service = (size + anomalies * alert_cost) * cost_per_patient * jitter
+
+    def start(vm_id, now):
+        nonlocal waiting
+        i = queues[vm_id].popleft()
+        waiting -= 1
+        service_s = service[i] / speeds[vm_id - 1]
+        busy_until[vm_id] = now + service_s
+        heapq.heappush(completions, (now + service_s, next(seq), vm_id, i, service_s))
+
+    i = 0
+    n = len(arrival)
+    while i < n or completions:
+        if i < n and (not completions or arrival[i] <= completions[0][0]):
+            now = arrival[i]
+            queue_area += waiting * (now - last_t)
+            last_t = now
+            vm_id = scheduler.place(int(size[i]))
+            queues[vm_id].append(i)
+            waiting += 1
+            queue_max = max(queue_max, waiting)
+            if busy_until[vm_id] is None:
+                start(vm_id, now)
+            i += 1
+        else:
+            now, _, vm_id, j, service_s = heapq.heappop(completions)
+            queue_area += waiting * (now - last_t)
+            last_t = now
+            latencies[j] = now - arrival[j]
+            scheduler.observe(vm_id, int(size[j]), service_s)
+            busy_s[vm_id] += service_s
+            busy_until[vm_id] = None
+            if queues[vm_id]:
+                start(vm_id, now)
+
+    end = last_t
+    alert_latencies = np.repeat(latencies, anomalies)
+    utilization = np.array([busy_s[vm_id] / end for vm_id in scheduler.loads]) if end > 0 else np.zeros(len(speeds))
+    p50, p99 = np.percentile(latencies, [50, 99])
+    alert_p50, alert_p99 = np.percentile(alert_latencies, [50, 99]) if alert_latencies.size else (0.0, 0.0)
+    return {
+        'policy': policy,
+        'clusters': n,
+        'simulated_s': end,
+        'throughput_pps': float(size.sum() / end) if end > 0 else 0.0,
+        'latency_p50_ms': float(p50) * 1000,
+        'latency_p99_ms': float(p99) * 1000,
+        'latency_mean_ms': float(latencies.mean()) * 1000,
+        'alerts': int(alert_latencies.size),
+        'alert_latency_p50_ms': float(alert_p50) * 1000,
+        'alert_latency_p99_ms': float(alert_p99) * 1000,
+        'queue_mean': queue_area / end if end > 0 else 0.0,
+        'queue_max': queue_max,
+        'utilization_min': float(utilization.min()),
+        'utilization_max': float(utilization.max()),
+    }
+
+# Define function running every policy for every combination of the swept parameters
+def sweep(patients_list, vms_list, anomaly_rates, policies, arrivals, interval, rounds, load, cluster_size,
+          speeds, heterogeneity, jitter, alert_cost, seed):
+    results = []
+    for patients, vms, anomaly_rate in itertools.product(patients_list, vms_list, anomaly_rates):
+        rng = np.random.default_rng(seed)
+        jobs = make_jobs(patients, cluster_size, interval, rounds, arrivals, anomaly_rate, jitter, rng)
+        vm_speeds = make_speeds(vms, speeds, heterogeneity, rng)
+        # Cost per patient chosen so the offered work is `load` times the VMs' total capacity
+        work_per_round = (patients + patients * anomaly_rate * alert_cost)
+        cost_per_patient = load * interval * vm_speeds.sum() / work_per_round
+        for policy in policies:
+            start = time.perf_counter()
+            result = simulate(policy, jobs, vm_speeds, cost_per_patient, alert_cost, seed)
+            result.update({
+                'patients': patients, 'vms': vms, 'anomaly_rate': anomaly_rate, 'arrivals': arrivals,
+                'load': load, 'interval_s': interval, 'rounds': rounds, 'seed': seed,
+                'vm_speeds': [round(float(s), 3) for s in vm_speeds],
+                'wall_s': time.perf_counter() - start,
+            })
+            results.append(result)
+    return results
+
+# Define function printing one table per parameter combination
+def print_results(results):
+    df = pd.DataFrame(results)
+    for (patients, vms, anomaly_rate), group in df.groupby(['patients', 'vms', 'anomaly_rate'], sort=False):
+        print(f"{patients} patients, {vms} VMs (speeds {group['vm_speeds'].iloc[0]}), anomaly rate {anomaly_rate}:")
+        print_policy_report([(row.policy, {'count': row.clusters, 'p50': row.latency_p50_ms / 1000,
+                                           'p99': row.latency_p99_ms / 1000, 'mean': row.latency_mean_ms / 1000})
+                             for row in group.itertuples()])
+        print(group[['policy', 'throughput_pps', 'alert_latency_p99_ms', 'queue_mean', 'queue_max',
+                     'utilization_min', 'utilization_max', 'wall_s']].to_string(index=False, float_format="%.2f"))
+        print()
+
+def parse_list(text, kind):
+    return [kind(x) for x in text.split(",") if x.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded discrete-event simulation of the fog cluster placement policies.")
+    parser.add_argument("--patients", default="100000", help="Comma list of patient counts to sweep.")
+    parser.add_argument("--vms", default="3", help="Comma list of VM counts to sweep.")
+    parser.add_argument("--anomaly-rate", default="0.003", help="Comma list of per-reading anomaly probabilities.")
+    parser.add_argument("--policies", default=",".join(POLICIES), help="Comma list of policies to compare.")
+    parser.add_argument("--arrivals", choices=ARRIVALS, default="periodic",
+                        help="periodic: every cluster each round; poisson: random arrivals at the same mean rate; "
+                             "bursty: the same clusters packed into short bursts.")
+    parser.add_argument("--interval", type=float, default=5.0, help="Simulated seconds per monitoring round.")
+    parser.add_argument("--rounds", type=int, default=10, help="Monitoring rounds to simulate.")
+    parser.add_argument("--load", type=float, default=0.8, help="Offered work as a fraction of total VM capacity.")
+    parser.add_argument("--cluster-size", type=int, default=CLUSTER_SIZE, help="Patients per cluster.")
+    parser.add_argument("--vm-speeds", default="", help="Comma list of relative VM speeds, e.g. 1,1,0.25.")
+    parser.add_argument("--heterogeneity", type=float, default=0.5,
+                        help="Lognormal spread of VM speeds when --vm-speeds is not given (0 = identical VMs).")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Lognormal spread of each cluster's service time.")
+    parser.add_argument("--alert-cost", type=float, default=20.0,
+                        help="Extra work per abnormal reading, in units of one patient's work.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed gives the same results.")
+    parser.add_argument("--out", help="Write results to this .json or .csv file.")
+    args = parser.parse_args()
+
+    policies = parse_list(args.policies, str)
+    for policy in policies:
+        if policy not in POLICIES:
+            raise SystemExit(f"Unknown policy: {policy} (choose from {', '.join(POLICIES)})")
+    vm_counts = parse_list(args.vms, int)
+    vm_speeds = parse_list(args.vm_speeds, float)
+    if vm_speeds and any(vms != len(vm_speeds) for vms in vm_counts):
+        raise SystemExit(f"--vm-speeds gives {len(vm_speeds)} speeds, but --vms sweeps {args.vms} VMs "
+                         "(give one speed per VM, with a single VM count)")
+    results = sweep(parse_list(args.patients, int), vm_counts, parse_list(args.anomaly_rate, float),
+                    policies, args.arrivals, args.interval, args.rounds, args.load, args.cluster_size,
+                    vm_speeds, args.heterogeneity, args.jitter, args.alert_cost, args.seed)
+    print_results(results)
+    if args.out:
+        if args.out.endswith(".csv"):
+            pd.DataFrame(results).to_csv(args.out, index=False)
+        else:
+            with open(args.out, "w") as file:
+                json.dump(results, file, indent=2)
+        print(f"Wrote {len(results)} results to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import random
-import openpyxl
 import time
-from twilio.rest import Client
+import argparse
+import numpy as np
 from tabulate import tabulate
+from alerts import AlertDispatcher, TwilioTransport, MockTransport
+from roster import load_roster
+from ticker import TickScheduler
+from anomaly import ALERT_RULES, VitalsMonitor, alert_mask
 
 # Define normal heart rate range
 NORMAL_HEART_RATE_RANGE = (60, 100)
@@ -11,17 +15,9 @@ NORMAL_HEART_RATE_RANGE = (60, 100)
 ACCOUNT_SID = 'SSID'
 AUTH_TOKEN = 'YOUR_TOKEN'
 TWILIO_PHONE_NUMBER = 'YOUR_PHONE_NUMBER'
-TWILIO_CLIENT = Client(ACCOUNT_SID, AUTH_TOKEN)
-
-# Read patient data from Excel file
-def read_patient_data_from_excel(file_path):
-    wb = openpyxl.load_workbook(filename=file_path)
-    sheet = wb.active
-    data = []
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        name, age, mobile = row[:3]
-        data.append({'Name': name, 'Age': age, 'Mobile Number': '+91' + str(mobile)})
-    return data
+
+# Alert dispatcher, started in main(); SMS go out in the background so monitoring never waits on them
+ALERTS = None
 
 # Define function to simulate heart rate
 def simulate_heart_rate(heart_rate):
@@ -31,49 +27,91 @@ def simulate_heart_rate(heart_rate):
     return heart_rate
 
 # Define function to check heart rate and generate warnings
-def check_heart_rate_cluster(cluster_name, cluster):
+# cluster is a list of positions in the patient store; readings go into the patients' history in the
+# monitor, and alert_rule decides which of them send an SMS
+def check_heart_rate_cluster(cluster_name, patients, cluster, monitor, alert_rule):
+    heart_rates = [simulate_heart_rate(random.randint(NORMAL_HEART_RATE_RANGE[0], NORMAL_HEART_RATE_RANGE[1]))
+                   for _ in cluster]
+    flags = monitor.update(np.asarray(cluster), np.asarray(heart_rates)[:, None])
+    alerts = alert_mask(flags, alert_rule)[:, 0]
     rows = []
-    for value in cluster:
-        name = value['Name']
-        age = int(value['Age'])
-        mobile = value['Mobile Number']
-        heart_rate = simulate_heart_rate(random.randint(NORMAL_HEART_RATE_RANGE[0], NORMAL_HEART_RATE_RANGE[1]))
+    for j, p in enumerate(cluster):
+        patient_id = int(patients.patients['id'][p])
+        name = patients.names[p]
+        age = int(patients.patients['age'][p])
+        mobile = patients.mobile(p)
+        heart_rate = heart_rates[j]
         status = 'Normal'  # default status
         if heart_rate < NORMAL_HEART_RATE_RANGE[0]:
-            message = f"Warning: {name}, your heart rate is low ({heart_rate})"
-            send_sms(mobile, message)
             status = 'Low'
         elif heart_rate > NORMAL_HEART_RATE_RANGE[1]:
-            message = f"Warning: {name}, your heart rate is high ({heart_rate})"
-            send_sms(mobile, message)
             status = 'High'
+        if alerts[j]:
+            if status != 'Normal':
+                level = status.lower()
+            else:
+                level = 'unusually low' if flags['zscore'][j, 0] < 0 else 'unusually high'
+            message = f"Warning: {name}, your heart rate is {level} ({heart_rate})"
+            send_sms(mobile, message, key=(patient_id, 'heart_rate'))
         rows.append([cluster_name, name, age, mobile, heart_rate, status])
     return rows
 
+# Define function to pick the rows to display: abnormal rows, and rows whose status changed since last shown
+# shown maps patient position -> status for patients currently displayed as abnormal
+def changed_rows(cluster, rows, shown):
+    changes = []
+    for p, row in zip(cluster, rows):
+        status = row[5]
+        if status != 'Normal':
+            shown[p] = status
+            changes.append(row)
+        elif p in shown:
+            del shown[p]  # back to normal: show it once more
+            changes.append(row)
+    return changes
+
 # Define function to send SMS
-def send_sms(to_number, message):
-    try:
-        message = TWILIO_CLIENT.messages.create(to=to_number, from_=TWILIO_PHONE_NUMBER, body=message)
-        print(f"Sent SMS to {to_number} with Message SID: {message.sid}")
-    except Exception as e:
-        print(f"Failed to send SMS to {to_number}: {str(e)}")
+# Queues the alert with the dispatcher; key de-duplicates repeat alerts for the same patient
+def send_sms(to_number, message, key=None):
+    ALERTS.submit(to_number, message, key)
 
 # Main function
 def main():
-    # Read patient data from Excel file
-    patient_data = read_patient_data_from_excel("heartdata.xlsx")
-
-    # Shuffle the patient data
-    random.shuffle(patient_data)
+    parser = argparse.ArgumentParser(description="Heart-rate monitoring prototype.")
+    parser.add_argument("--input", default="heartdata.xlsx", help="Patient roster (.xlsx, .csv or .parquet).")
+    parser.add_argument("--period", type=float, default=1.0, help="Seconds per monitoring tick.")
+    parser.add_argument("--budget", type=float, default=0.7,
+                        help="Fraction of each tick spent checking clusters; the rest carry over to the next tick.")
+    parser.add_argument("--full", action="store_true", help="Print every patient each tick, not just changes.")
+    parser.add_argument("--metrics-out", help="Write tick metrics as JSON to this file after every tick.")
+    parser.add_argument("--sms", choices=["twilio", "mock"], default="twilio",
+                        help="SMS transport; mock sends nowhere (for testing).")
+    parser.add_argument("--alert-rule", choices=ALERT_RULES, default="sustained",
+                        help="Which readings send an SMS (see anomaly.py); threshold is the old per-reading check.")
+    args = parser.parse_args()
+
+    global ALERTS
+    if args.sms == "mock":
+        transport = MockTransport()
+    else:
+        transport = TwilioTransport(ACCOUNT_SID, AUTH_TOKEN, TWILIO_PHONE_NUMBER)
+    ALERTS = AlertDispatcher(transport, rate=1.0).start()
+
+    # Read patient data from the roster
+    patients = load_roster(args.input)
+
+    # Shuffle the patients
+    order = list(range(len(patients)))
+    random.shuffle(order)
 
     # Divide patients into clusters with at least 6 patients in each cluster
-    num_clusters = len(patient_data) // 6
-    remaining_patients = len(patient_data) % 6
+    num_clusters = len(order) // 6
+    remaining_patients = len(order) % 6
 
-    clusters = [patient_data[i * 6: (i + 1) * 6] for i in range(num_clusters)]
+    clusters = [order[i * 6: (i + 1) * 6] for i in range(num_clusters)]
 
     if remaining_patients > 0:
-        last_cluster = patient_data[num_clusters * 6:]
+        last_cluster = order[num_clusters * 6:]
         random.shuffle(last_cluster)
         clusters.append(last_cluster[:remaining_patients])
 
@@ -81,23 +119,42 @@ def main():
     values = [i + 1 for i in range(len(clusters))]
     random.shuffle(values)
 
-    # Display patient name, age, mobile number, and heart rate every second for patients in each cluster
-    while True:
-        all_results = []
-        for i, cluster in enumerate(clusters):
-            cluster_name = f"Cluster {values[i]}"
-            cluster_results = check_heart_rate_cluster(cluster_name, cluster)
-            all_results.extend(cluster_results)
-
-        # Prepare data for table display
-        headers = ["Cluster", "Name", "Age", "Mobile Number", "Heart Rate", "Status"]
-        data = [[row[0], row[1], row[2], row[3], row[4], row[5]] for row in all_results]
-
-        # Print patient data in a table
-        print(tabulate(data, headers=headers, tablefmt="grid"))
-
-        # Wait for 1 second before displaying data for the next set of patients
-        time.sleep(1)
+    # Check clusters every tick at a fixed rate. Clusters are taken in turn from where the last tick stopped;
+    # once the tick's budget is spent the rest wait for the next tick instead of delaying it.
+    headers = ["Cluster", "Name", "Age", "Mobile Number", "Heart Rate", "Status"]
+    ticker = TickScheduler(args.period)
+    monitor = VitalsMonitor(len(patients), ranges=(NORMAL_HEART_RATE_RANGE,))
+    shown = {}
+    cursor = 0
+    try:
+        while True:
+            deadline = ticker.begin()
+            stop_at = deadline - (1.0 - args.budget) * args.period
+            data = []
+            checked = 0
+            while checked < len(clusters) and (checked == 0 or time.monotonic() < stop_at):
+                cluster = clusters[cursor]
+                rows = check_heart_rate_cluster(f"Cluster {values[cursor]}", patients, cluster,
+                                                monitor, args.alert_rule)
+                data.extend(rows if args.full else changed_rows(cluster, rows, shown))
+                cursor = (cursor + 1) % len(clusters)
+                checked += 1
+
+            # Print only abnormal and changed rows (every row with --full)
+            if data:
+                print(tabulate(data, headers=headers, tablefmt="grid"))
+            print(f"Tick {ticker.ticks + 1}: {checked}/{len(clusters)} clusters checked, {len(data)} rows shown | "
+                  f"{ticker.summary()}")
+
+            ticker.end(shed=len(clusters) - checked)
+            if args.metrics_out:
+                ticker.write_metrics(args.metrics_out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Ticks: {ticker.summary()}")
+        ALERTS.close()
+        print(f"Alerts: {ALERTS.summary()}")
 
 
 if __name__ == '__main__':
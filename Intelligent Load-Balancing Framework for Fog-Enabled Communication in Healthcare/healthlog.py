@@ -0,0 +1,207 @@
+import io
+import os
+import re
+import glob
+import json
+import time
+import argparse
+import threading
+import pandas as pd
+
+# Flush a batch once this many records are pending, or after this many seconds, whichever comes first
+DEFAULT_FLUSH_RECORDS = 256
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Rotate the log once it would grow past this size, keeping this many old files (path.1 is the newest)
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+# One JSON object per line, one line per abnormal reading
+LOG_COLUMNS = ['ts', 'cluster', 'name', 'age', 'mobile', 'heart_rate', 'heart_status', 'glucose', 'glucose_status']
+LOG_DTYPES = {'cluster': str, 'name': str, 'age': 'int16', 'mobile': str, 'heart_rate': 'int16',
+              'heart_status': str, 'glucose': 'int16', 'glucose_status': str}
+
+# Define class writing health log records in batches from a background thread
+# write() only appends to an in-memory list; the thread turns each batch into a single write() call.
+class HealthLogWriter:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS,
+                 flush_records=DEFAULT_FLUSH_RECORDS, flush_interval_s=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_records = flush_records
+        self.flush_interval_s = flush_interval_s
+        self.records_written = 0
+        self.batches = 0
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._thread = threading.Thread(target=self._run, name="HealthLogWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        with self._cond:
+            self._pending.append(record)
+            if len(self._pending) >= self.flush_records:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.flush_records,
+                                    timeout=self.flush_interval_s)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            if batch:
+                self._write_batch(batch)
+            if closed:
+                return
+
+    def _write_batch(self, batch):
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in batch).encode("utf-8")
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.records_written += len(batch)
+        self.batches += 1
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self._file = open(self.path, "ab")
+        else:
+            self._file = open(self.path, "wb")
+        self._size = 0
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+
+# Define function building one log record
+def health_record(cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status, ts=None):
+    return {
+        'ts': round(time.time() if ts is None else ts, 3),
+        'cluster': cluster_name,
+        'name': name,
+        'age': age,
+        'mobile': mobile,
+        'heart_rate': heart_rate,
+        'heart_status': heart_status,
+        'glucose': glucose_level,
+        'glucose_status': glucose_status,
+    }
+
+# Define function listing a log file and its rotated backups, oldest first
+def log_files(path):
+    backups = [p for p in glob.glob(glob.escape(path) + ".*") if p[len(path) + 1:].isdigit()]
+    backups.sort(key=lambda p: int(p[len(path) + 1:]), reverse=True)
+    return backups + ([path] if os.path.exists(path) else [])
+
+# Define function reading health logs back into a DataFrame
+# Each pattern may be a file or a glob (e.g. "health_logs.vm*.jsonl"); rotated backups are included.
+def read_health_logs(*patterns):
+    paths = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            paths.extend(p for p in log_files(path) if p not in paths)
+    chunks = []
+    for path in paths:
+        with open(path, "rb") as file:
+            chunks.append(file.read())
+    data = b"".join(chunks)
+    if not data.strip():
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    df = pd.read_json(io.BytesIO(data), lines=True, dtype=LOG_DTYPES)
+    df['ts'] = pd.to_datetime(df['ts'], unit='s')
+    return df.sort_values('ts', kind='stable', ignore_index=True)[LOG_COLUMNS]
+
+# Define function converting the old seven-line text log to JSON lines (the old format has no timestamps)
+def convert_legacy_log(text_path, jsonl_path):
+    fields = re.compile(r"Cluster: (.*)\nName: (.*)\nAge: (.*)\nMobile Number: (.*)\n"
+                        r"Heart Rate: (\d+) \((\w+)\)\nBlood Glucose: (\d+) \((\w+)\)\n")
+    count = 0
+    with open(text_path, "r") as source, open(jsonl_path, "w") as target:
+        for m in fields.finditer(source.read()):
+            cluster, name, age, mobile, heart_rate, heart_status, glucose, glucose_status = m.groups()
+            record = health_record(cluster, name, int(age), mobile, int(heart_rate), int(glucose),
+                                   heart_status, glucose_status, ts=0)
+            target.write(json.dumps(record, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+# Benchmark: the old open/append-per-event logging against the batched writer
+def bench(records, out_dir):
+    rows = [("Cluster 1", f"p{i}", 30, "+910000000000", 110, 100, 'High', 'Normal') for i in range(records)]
+
+    old_path = os.path.join(out_dir, "bench_old_health_logs.txt")
+    start = time.perf_counter()
+    for cluster_name, name, age, mobile, heart_rate, glucose_level, heart_status, glucose_status in rows:
+        with open(old_path, "a") as file:
+            file.write(f"Cluster: {cluster_name}\n")
+            file.write(f"Name: {name}\n")
+            file.write(f"Age: {age}\n")
+            file.write(f"Mobile Number: {mobile}\n")
+            file.write(f"Heart Rate: {heart_rate} ({heart_status})\n")
+            file.write(f"Blood Glucose: {glucose_level} ({glucose_status})\n")
+            file.write("-----------------------------------\n")
+    old_s = time.perf_counter() - start
+
+    new_path = os.path.join(out_dir, "bench_health_logs.jsonl")
+    start = time.perf_counter()
+    writer = HealthLogWriter(new_path)
+    for row in rows:
+        writer.write(health_record(*row))
+    caller_s = time.perf_counter() - start
+    writer.close()
+    new_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = read_health_logs(new_path)
+    read_s = time.perf_counter() - start
+
+    print(f"open/append per event: {old_s:.3f}s ({records / old_s:,.0f} records/sec), "
+          f"{os.path.getsize(old_path):,} bytes")
+    print(f"batched writer:        {new_s:.3f}s ({records / new_s:,.0f} records/sec), "
+          f"{sum(os.path.getsize(p) for p in log_files(new_path)):,} bytes in {writer.batches} writes "
+          f"(caller blocked {caller_s:.3f}s)")
+    print(f"read back {len(df)} records into a DataFrame in {read_s:.3f}s")
+    for path in [old_path] + log_files(new_path):
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Read, convert and benchmark the structured health log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    read = sub.add_parser("read", help="Print health logs (files or globs, rotated backups included).")
+    read.add_argument("paths", nargs="+")
+    convert = sub.add_parser("convert", help="Convert an old text health log to JSON lines.")
+    convert.add_argument("text_path")
+    convert.add_argument("jsonl_path")
+    benchmark = sub.add_parser("bench", help="Compare per-event open/append against the batched writer.")
+    benchmark.add_argument("--records", type=int, default=100000)
+    benchmark.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    if args.command == "read":
+        df = read_health_logs(*args.paths)
+        print(df)
+        print()
+        print(f"{len(df)} records; abnormal heart rate: {int((df['heart_status'] != 'Normal').sum())}, "
+              f"abnormal glucose: {int((df['glucose_status'] != 'Normal').sum())}")
+    elif args.command == "convert":
+        print(f"Converted {convert_legacy_log(args.text_path, args.jsonl_path)} records to {args.jsonl_path}")
+    else:
+        bench(args.records, args.out_dir)
+
+if __name__ == "__main__":
+    main()
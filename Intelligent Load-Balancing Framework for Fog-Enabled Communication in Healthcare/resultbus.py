@@ -0,0 +1,76 @@
+import time
+import numpy as np
+import pandas as pd
+from vitals import STATUS_LABELS
+
+# Rows kept in the rolling window (older rows are overwritten)
+DEFAULT_WINDOW_ROWS = 100_000
+
+# One row per patient reading, as received from a VM; names, ages and mobiles are looked up in the PatientStore
+RESULT_DTYPE = np.dtype([
+    ('received_at', np.float64),  # wall-clock time the row reached the window
+    ('vm_id', np.int16),
+    ('cluster', np.int32),        # index into ResultWindow.cluster_names
+    ('patient', np.int32),        # position in the PatientStore
+    ('heart_rate', np.int16),
+    ('heart_status', np.int8),
+    ('glucose', np.int16),
+    ('glucose_status', np.int8),
+])
+
+# Define class keeping the most recent results as a rolling columnar window
+# VM workers publish each cluster's typed readings with their report; the main process appends them
+# here as they arrive, so nothing goes through the filesystem.
+class ResultWindow:
+    def __init__(self, patients, capacity=DEFAULT_WINDOW_ROWS):
+        self.patients = patients
+        self.capacity = capacity
+        self.rows = np.zeros(capacity, dtype=RESULT_DTYPE)
+        self.total = 0  # rows appended so far
+        self.cluster_names = []
+        self._cluster_codes = {}
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, report):
+        # Adds one cluster's readings; returns seconds from the worker finishing to the rows being visible
+        members, readings = report['members'], report['readings']
+        code = self._cluster_codes.get(report['cluster'])
+        if code is None:
+            code = self._cluster_codes[report['cluster']] = len(self.cluster_names)
+            self.cluster_names.append(report['cluster'])
+        batch = np.empty(len(members), dtype=RESULT_DTYPE)
+        batch['received_at'] = time.time()
+        batch['vm_id'] = report['vm_id']
+        batch['cluster'] = code
+        batch['patient'] = members
+        for field in ('heart_rate', 'heart_status', 'glucose', 'glucose_status'):
+            batch[field] = readings[field]
+        # A batch bigger than the window only leaves its last capacity rows, but every row counts in total
+        appended = len(batch)
+        batch = batch[-self.capacity:]
+        positions = np.arange(self.total + appended - len(batch), self.total + appended) % self.capacity
+        self.rows[positions] = batch
+        self.total += appended
+        return time.monotonic() - report['finished_at']
+
+    def last(self, n=None):
+        # The newest n rows (default: the whole window), oldest first
+        n = len(self) if n is None else min(n, len(self))
+        return self.rows[np.arange(self.total - n, self.total) % self.capacity]
+
+    def to_frame(self, n=None):
+        rows = self.last(n)
+        p = rows['patient']
+        return pd.DataFrame({
+            'Cluster': np.asarray(self.cluster_names, dtype=object)[rows['cluster']],
+            'Name': self.patients.names[p],
+            'Age': self.patients.patients['age'][p],
+            'Mobile Number': self.patients.mobile_numbers(p),
+            'Heart Rate': rows['heart_rate'],
+            'Heart Status': STATUS_LABELS[rows['heart_status']],
+            'Blood Glucose': rows['glucose'],
+            'Glucose Status': STATUS_LABELS[rows['glucose_status']],
+            'VM': rows['vm_id'],
+        })
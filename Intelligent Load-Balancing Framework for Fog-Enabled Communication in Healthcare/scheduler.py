@@ -0,0 +1,151 @@
+import random
+import numpy as np
+
+# Cost assumed for a VM before anything has been measured on any VM (seconds per patient)
+DEFAULT_COST_PER_PATIENT = 1e-4
+
+# Define class tracking the measured load of one VM
+class VMLoad:
+    def __init__(self, vm_id, alpha):
+        self.vm_id = vm_id
+        self.alpha = alpha
+        self.cost = None       # EWMA of service seconds per patient
+        self.outstanding = 0   # patients placed on this VM and not reported back yet
+        self.completed = 0     # clusters reported back
+        self.stolen = 0        # clusters this VM took from another VM's queue
+        self.busy_s = 0.0      # total measured service time
+
+    def observe(self, patients, service_s):
+        cost = service_s / max(patients, 1)
+        self.cost = cost if self.cost is None else self.alpha * cost + (1 - self.alpha) * self.cost
+        self.outstanding -= patients
+        self.completed += 1
+        self.busy_s += service_s
+
+# Placement policies: each picks a VMLoad for a cluster of `size` patients
+
+# Define round-robin placement (the original behaviour, ignores load)
+def round_robin(scheduler, size):
+    loads = scheduler.vm_loads()
+    load = loads[scheduler.rr % len(loads)]
+    scheduler.rr += 1
+    return load
+
+# Define least-loaded placement: lowest expected completion time for this cluster
+def least_loaded(scheduler, size):
+    return min(scheduler.vm_loads(), key=lambda load: scheduler.expected_finish(load, size))
+
+# Define power-of-two-choices placement: sample two VMs, take the less loaded one
+def power_of_two(scheduler, size):
+    loads = scheduler.vm_loads()
+    if len(loads) < 3:
+        return least_loaded(scheduler, size)
+    a, b = scheduler.rng.sample(loads, 2)
+    return a if scheduler.expected_finish(a, size) <= scheduler.expected_finish(b, size) else b
+
+# Define capacity-weighted placement: random VM, weighted by measured patients/sec
+def weighted(scheduler, size):
+    loads = scheduler.vm_loads()
+    weights = [1.0 / scheduler.cost_of(load) for load in loads]
+    return scheduler.rng.choices(loads, weights=weights)[0]
+
+POLICIES = {
+    'round_robin': round_robin,
+    'least_loaded': least_loaded,
+    'power_of_two': power_of_two,
+    'weighted': weighted,
+}
+
+# Define class placing clusters on VMs from measured service times and queue depth
+# The caller reports every finished cluster with observe(); times are passed in, so the
+# same scheduler works with real workers and with simulated time.
+class Scheduler:
+    def __init__(self, vm_ids, policy='least_loaded', alpha=0.2, seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.policy_name = policy
+        self.policy = POLICIES[policy]
+        self.loads = {vm_id: VMLoad(vm_id, alpha) for vm_id in vm_ids}
+        self.rng = random.Random(seed)
+        self.rr = 0
+        self.allowed = None   # VM ids the current place() call may choose from (None = all)
+        self.latencies = []  # end-to-end seconds per cluster
+
+    def vm_loads(self):
+        if self.allowed is None:
+            return list(self.loads.values())
+        return [load for vm_id, load in self.loads.items() if vm_id in self.allowed]
+
+    def cost_of(self, load):
+        # Unmeasured VMs are assumed to be average, so they get tried
+        if load.cost is not None:
+            return load.cost
+        known = [l.cost for l in self.loads.values() if l.cost is not None]
+        return sum(known) / len(known) if known else DEFAULT_COST_PER_PATIENT
+
+    def expected_finish(self, load, size):
+        return (load.outstanding + size) * self.cost_of(load)
+
+    def place(self, size, allowed=None):
+        # allowed restricts the choice, e.g. to VMs with room in their send window
+        self.allowed = allowed
+        try:
+            load = self.policy(self, size)
+        finally:
+            self.allowed = None
+        load.outstanding += size
+        return load.vm_id
+
+    def remove(self, vm_id):
+        # Forget a failed VM; its queued clusters must be placed again by the caller
+        del self.loads[vm_id]
+
+    def observe(self, vm_id, patients, service_s, latency_s=None, placed_on=None):
+        # placed_on is the VM the cluster was placed on, when another VM stole and processed it
+        if placed_on is not None and placed_on != vm_id:
+            if placed_on in self.loads:
+                self.loads[placed_on].outstanding -= patients
+            self.loads[vm_id].outstanding += patients
+            self.loads[vm_id].stolen += 1
+        self.loads[vm_id].observe(patients, service_s)
+        if latency_s is not None:
+            self.latencies.append(latency_s)
+
+    def latency_summary(self):
+        # p50 / p99 / mean end-to-end latency in seconds
+        if not self.latencies:
+            return {'count': 0, 'p50': 0.0, 'p99': 0.0, 'mean': 0.0}
+        values = np.asarray(self.latencies)
+        p50, p99 = np.percentile(values, [50, 99])
+        return {'count': len(values), 'p50': float(p50), 'p99': float(p99), 'mean': float(values.mean())}
+
+    def describe(self):
+        lines = []
+        for load in self.vm_loads():
+            cost = f"{load.cost * 1e6:.1f} us/patient" if load.cost is not None else "not measured"
+            stolen = f" ({load.stolen} stolen)" if load.stolen else ""
+            lines.append(f"VM{load.vm_id}: {cost}, {load.completed} clusters{stolen}, queued {load.outstanding} patients")
+        return lines
+
+    def mean_cost(self):
+        # Average measured seconds per patient over the VMs, or None before any measurement
+        costs = [load.cost for load in self.loads.values() if load.cost is not None]
+        return float(np.mean(costs)) if costs else None
+
+# Define function choosing the cluster size from the measured cost per patient
+# Clusters taking about target_s of VM time each amortize the fixed cost of handing a cluster to a VM;
+# the cap keeps at least clusters_per_vm clusters per VM each round, so there is still work to balance and steal.
+def adaptive_cluster_size(scheduler, patients, target_s, min_size, clusters_per_vm=8):
+    cost = scheduler.mean_cost()
+    if cost is None:
+        return min_size
+    cap = patients // (len(scheduler.loads) * clusters_per_vm)
+    return max(min_size, min(int(target_s / cost), cap))
+
+# Define function printing a p50/p99 comparison of policies
+# results is a list of (policy_name, latency_summary)
+def print_policy_report(results):
+    print(f"{'Policy':<14} {'Clusters':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for name, summary in results:
+        print(f"{name:<14} {summary['count']:>9} {summary['p50'] * 1000:>9.2f} "
+              f"{summary['p99'] * 1000:>9.2f} {summary['mean'] * 1000:>9.2f}")
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+from collections import deque
+import numpy as np
+
+# Ticks kept for the overrun / work-time percentiles
+METRICS_WINDOW = 1000
+
+# Define class running a loop at a fixed rate on monotonic deadlines
+# Deadlines are start + k * period, so the rate does not drift with processing time. A tick that runs
+# past its deadline is recorded as an overrun; ticks missed entirely are skipped (coalesced into the
+# next one) instead of being run back to back to catch up.
+class TickScheduler:
+    def __init__(self, period_s, clock=time.monotonic, sleep=time.sleep):
+        self.period_s = period_s
+        self.clock = clock
+        self.sleep = sleep
+        self.started_at = None
+        self.deadline = None
+        self.tick_started = None
+        self.ended_at = None
+        self.ticks = 0
+        self.late = 0      # ticks that finished after their deadline
+        self.skipped = 0   # ticks dropped because an earlier tick ran over
+        self.shed = 0      # units of work the caller deferred because the tick was out of time
+        self.overruns = deque(maxlen=METRICS_WINDOW)
+        self.work_s = deque(maxlen=METRICS_WINDOW)
+
+    def begin(self):
+        # Starts a tick; returns its deadline
+        now = self.clock()
+        if self.deadline is None:
+            self.started_at = now
+            self.deadline = now + self.period_s
+        self.tick_started = now
+        return self.deadline
+
+    def remaining(self):
+        return self.deadline - self.clock()
+
+    def end(self, shed=0):
+        # Ends the tick: records its timing, then sleeps until the deadline (or skips missed ticks)
+        now = self.clock()
+        self.ticks += 1
+        self.shed += shed
+        self.work_s.append(now - self.tick_started)
+        overrun = now - self.deadline
+        if overrun > 0:
+            self.late += 1
+            self.overruns.append(overrun)
+            missed = int(overrun // self.period_s)
+            self.skipped += missed
+            self.deadline += (missed + 1) * self.period_s
+        else:
+            self.overruns.append(0.0)
+            self.sleep(-overrun)
+            self.deadline += self.period_s
+        self.ended_at = self.clock()
+
+    def metrics(self):
+        # Rate over completed ticks, including their sleep
+        elapsed = (self.ended_at - self.started_at) if self.ended_at is not None else 0.0
+        overruns = np.asarray(self.overruns) if self.overruns else np.zeros(1)
+        work = np.asarray(self.work_s) if self.work_s else np.zeros(1)
+        return {
+            'ticks': self.ticks,
+            'target_hz': 1.0 / self.period_s,
+            'tick_hz': self.ticks / elapsed if elapsed > 0 else 0.0,
+            'late': self.late,
+            'skipped': self.skipped,
+            'shed': self.shed,
+            'overrun_p50_ms': float(np.percentile(overruns, 50)) * 1000,
+            'overrun_p99_ms': float(np.percentile(overruns, 99)) * 1000,
+            'overrun_max_ms': float(overruns.max()) * 1000,
+            'work_p50_ms': float(np.percentile(work, 50)) * 1000,
+            'work_p99_ms': float(np.percentile(work, 99)) * 1000,
+        }
+
+    def summary(self):
+        m = self.metrics()
+        return (f"{m['tick_hz']:.2f}/{m['target_hz']:.2f} Hz, work p50 {m['work_p50_ms']:.1f} ms / "
+                f"p99 {m['work_p99_ms']:.1f} ms, overrun p99 {m['overrun_p99_ms']:.1f} ms, "
+                f"{m['late']} late, {m['skipped']} skipped, {m['shed']} shed")
+
+    def write_metrics(self, path):
+        # Replaces path with the current metrics as JSON, so readers never see a partial file
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.metrics(), file)
+        os.replace(path + ".tmp", path)
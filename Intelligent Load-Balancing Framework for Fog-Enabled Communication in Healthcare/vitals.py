@@ -0,0 +1,113 @@
+import time
+import argparse
+import numpy as np
+
+# Define normal heart rate range
+NORMAL_HEART_RATE_RANGE = (60, 100)
+
+# Define normal blood glucose range
+NORMAL_GLUCOSE_RANGE = (70, 120)
+
+# Anomaly odds (1 in N readings) and abnormal value ranges, as in the original per-patient simulator
+HEART_RATE_ANOMALY_ODDS = 500
+HEART_RATE_ABNORMAL_RANGES = ((40, 59), (101, 120))
+GLUCOSE_ANOMALY_ODDS = 1000
+GLUCOSE_ABNORMAL_RANGES = ((40, 69), (121, 150))
+
+# Status codes stored in the reading arrays
+NORMAL, LOW, HIGH = 0, 1, 2
+STATUS_LABELS = np.array(['Normal', 'Low', 'High'], dtype=object)
+
+# One patient per row; names are kept alongside as an object array
+# Mobile numbers are stored as digits; MOBILE_PREFIX is added when they are displayed or texted.
+PATIENT_DTYPE = np.dtype([('id', np.int32), ('age', np.int16), ('mobile', np.int64)])
+MOBILE_PREFIX = '+91'
+
+# One reading per patient per tick
+READING_DTYPE = np.dtype([
+    ('heart_rate', np.int16),
+    ('heart_status', np.int8),
+    ('glucose', np.int16),
+    ('glucose_status', np.int8),
+])
+
+# Define class holding the patient roster as columns (load it with roster.load_roster)
+class PatientStore:
+    def __init__(self, names, ages, mobiles):
+        self.patients = np.zeros(len(names), dtype=PATIENT_DTYPE)
+        self.patients['id'] = np.arange(len(names), dtype=np.int32)
+        self.patients['age'] = ages
+        self.patients['mobile'] = mobiles
+        self.names = np.asarray(names, dtype=object)
+
+    def __len__(self):
+        return len(self.patients)
+
+    def mobile(self, p):
+        return MOBILE_PREFIX + str(self.patients['mobile'][p])
+
+    def mobile_numbers(self, positions):
+        return np.array([MOBILE_PREFIX + str(m) for m in self.patients['mobile'][positions]], dtype=object)
+
+# Define function to classify a batch of readings against a normal range
+def classify(values, normal_range):
+    status = (values < normal_range[0]).astype(np.int8)
+    status += (values > normal_range[1]).astype(np.int8) * HIGH
+    return status
+
+# Define class to simulate one tick of vitals for many patients at once
+class VitalsSimulator:
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def _channel(self, out, normal_range, abnormal_ranges, odds):
+        rng = self.rng
+        out[:] = rng.integers(normal_range[0], normal_range[1] + 1, size=len(out), dtype=np.int16)
+        # Each reading is anomalous with probability 1/odds, then low or high with equal chance
+        anomalous = np.flatnonzero(rng.random(len(out)) < 1.0 / odds)
+        if anomalous.size:
+            (low_lo, low_hi), (high_lo, high_hi) = abnormal_ranges
+            low = rng.integers(low_lo, low_hi + 1, size=anomalous.size)
+            high = rng.integers(high_lo, high_hi + 1, size=anomalous.size)
+            out[anomalous] = np.where(rng.random(anomalous.size) < 0.5, low, high)
+
+    def tick(self, n, out=None):
+        # Returns a READING_DTYPE array of n readings; pass out= to reuse a buffer
+        readings = np.empty(n, dtype=READING_DTYPE) if out is None else out[:n]
+        heart = readings['heart_rate']  # field views, written in place
+        glucose = readings['glucose']
+        self._channel(heart, NORMAL_HEART_RATE_RANGE, HEART_RATE_ABNORMAL_RANGES, HEART_RATE_ANOMALY_ODDS)
+        self._channel(glucose, NORMAL_GLUCOSE_RANGE, GLUCOSE_ABNORMAL_RANGES, GLUCOSE_ANOMALY_ODDS)
+        readings['heart_status'] = classify(heart, NORMAL_HEART_RATE_RANGE)
+        readings['glucose_status'] = classify(glucose, NORMAL_GLUCOSE_RANGE)
+        return readings
+
+# Define function returning positions of readings with any abnormal vital
+def abnormal_positions(readings):
+    return np.flatnonzero((readings['heart_status'] != NORMAL) | (readings['glucose_status'] != NORMAL))
+
+# Benchmark: simulate and classify whole ticks for a synthetic roster
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched vitals simulator.")
+    parser.add_argument("--patients", type=int, default=1_000_000, help="Patients per tick.")
+    parser.add_argument("--ticks", type=int, default=20, help="Number of ticks to simulate.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = parser.parse_args()
+
+    simulator = VitalsSimulator(args.seed)
+    buffer = np.empty(args.patients, dtype=READING_DTYPE)
+    heart_abnormal = glucose_abnormal = 0
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        readings = simulator.tick(args.patients, out=buffer)
+        heart_abnormal += int(np.count_nonzero(readings['heart_status']))
+        glucose_abnormal += int(np.count_nonzero(readings['glucose_status']))
+    elapsed = time.perf_counter() - start
+
+    total = args.patients * args.ticks
+    print(f"Simulated {total} patient readings in {elapsed:.2f}s ({total / elapsed:,.0f} patients/sec)")
+    print(f"Abnormal heart rate: 1 in {total / max(heart_abnormal, 1):.0f} (expected 1 in {HEART_RATE_ANOMALY_ODDS})")
+    print(f"Abnormal glucose: 1 in {total / max(glucose_abnormal, 1):.0f} (expected 1 in {GLUCOSE_ANOMALY_ODDS})")
+
+if __name__ == "__main__":
+    main()
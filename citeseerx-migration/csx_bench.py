@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+csx_bench.py
+
+Benchmark the leaf walkers in csx_sitemap_generator.py against a sharded tree
+(a real repo, or a synthetic one built with csx_fixture.py).
+
+Modes: each walker (scandir, oswalk) plus "manifest", a warm --incremental refresh.
+Every mode runs in a fresh process and reports leaves/sec (best of --repeat timed runs),
+peak RSS of that process, and filesystem calls per leaf from one extra counted run.
+Calls are counted in-process by wrapping the os / builtins entry points the generator uses:
+- stat    : os.stat / os.lstat (this is what os.path.exists/getmtime/isdir call)
+- listing : os.scandir / os.listdir
+- open    : builtins.open
+- entry   : first DirEntry.stat() per entry (a stat syscall on POSIX, free on Windows)
+
+On NFS-backed storage each of these is (at least) one round trip. For kernel-level numbers,
+run the same command under `strace -c -f`.
+
+--save-baseline writes the results as JSON; --baseline compares against such a file and
+exits 1 when a mode got slower, bigger or chattier than --tolerance allows.
+
+Example:
+  python csx_fixture.py --out /dev/shm/csx_fixture --branches 4 --leaves-per-branch 5000
+  python csx_bench.py --root /dev/shm/csx_fixture --save-baseline bench_baseline.json
+  python csx_bench.py --root /dev/shm/csx_fixture --baseline bench_baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import builtins
+import argparse
+import tempfile
+import multiprocessing
+from contextlib import nullcontext
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+import csx_sitemap_generator as gen
+
+class _CountingEntry:
+    """
+    DirEntry proxy that counts the first stat() call (DirEntry caches the result).
+    """
+    __slots__ = ("_entry", "_counter", "_stated")
+
+    def __init__(self, entry, counter: Counter):
+        self._entry = entry
+        self._counter = counter
+        self._stated = False
+
+    def stat(self, *args, **kwargs):
+        if not self._stated:
+            self._stated = True
+            self._counter["entry"] += 1
+        return self._entry.stat(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def __fspath__(self):
+        return self._entry.path
+
+class _CountingScandir:
+    def __init__(self, it, counter: Counter):
+        self._it = it
+        self._counter = counter
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _CountingEntry(next(self._it), self._counter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+    def close(self):
+        self._it.close()
+
+class FsCallCounter:
+    """
+    Context manager that counts filesystem calls issued from Python while active.
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def __enter__(self):
+        c = self.counts
+        self._saved = (os.stat, os.lstat, os.scandir, os.listdir, builtins.open)
+        real_stat, real_lstat, real_scandir, real_listdir, real_open = self._saved
+
+        def stat(*a, **kw):
+            c["stat"] += 1
+            return real_stat(*a, **kw)
+
+        def lstat(*a, **kw):
+            c["stat"] += 1
+            return real_lstat(*a, **kw)
+
+        def scandir(*a, **kw):
+            c["listing"] += 1
+            return _CountingScandir(real_scandir(*a, **kw), c)
+
+        def listdir(*a, **kw):
+            c["listing"] += 1
+            return real_listdir(*a, **kw)
+
+        def open_(*a, **kw):
+            c["open"] += 1
+            return real_open(*a, **kw)
+
+        os.stat, os.lstat, os.scandir, os.listdir, builtins.open = stat, lstat, scandir, listdir, open_
+        return self
+
+    def __exit__(self, *exc):
+        os.stat, os.lstat, os.scandir, os.listdir, builtins.open = self._saved
+
+def effective_shard_depth(branch: str, shard_depth: int) -> int:
+    # Same convention as write_sitemap_and_doi_for_branch.
+    if branch and shard_depth == gen.DEFAULT_SHARD_DEPTH:
+        return gen.DEFAULT_SHARD_DEPTH - 1
+    return shard_depth
+
+def branch_shard_depth(shard_depth: Optional[int], fixture: Optional[dict]) -> int:
+    """
+    Shard levels below a branch directory. csx_fixture.py counts the branch level in its
+    shard_depth, so without --shard-depth the fixture's own depth minus one is used.
+    """
+    if shard_depth is None and fixture is not None:
+        return fixture["shard_depth"] - 1
+    return effective_shard_depth("branch", gen.DEFAULT_SHARD_DEPTH if shard_depth is None else shard_depth)
+
+MODES = gen.WALKERS + ("manifest",)
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB elsewhere
+
+def run_walker(repo_root: str, branch: str, depth: int, walker: str, meta_fast: bool = False,
+               count_calls: bool = True, work_dir: Optional[str] = None) -> dict:
+    """
+    Drains one mode over one branch (no output files) and returns its counters.
+    depth is the number of shard levels below the branch (see branch_shard_depth).
+    The "manifest" mode seeds a manifest in work_dir first and measures the warm refresh.
+    """
+    effective_root = os.path.join(repo_root, branch) if branch else repo_root
+
+    stats = {"leaf_checked": 0}
+    urls = 0
+    # Fresh reader per run so one walker's cached meta.json records don't flatter the next.
+    meta_reader = gen.LeafMetaReader(fast=meta_fast)
+    metrics = gen.RunMetrics(branch or "root")
+    conn = None
+    if walker == "manifest":
+        conn = gen.open_manifest(os.path.join(work_dir, f"manifest_{branch or 'root'}.sqlite"))
+        gen.refresh_manifest(conn, effective_root, depth, meta_reader=meta_reader)
+        meta_reader = gen.LeafMetaReader(fast=meta_fast)
+
+    with FsCallCounter() if count_calls else nullcontext() as fc:
+        t0 = time.perf_counter()
+        if conn is not None:
+            stats["leaf_checked"], _ = gen.refresh_manifest(conn, effective_root, depth,
+                                                            meta_reader=meta_reader, metrics=metrics)
+            records = gen.iter_leaf_records_manifest(conn)
+        else:
+            iter_records = gen.iter_leaf_records_walk if walker == "oswalk" else gen.iter_leaf_records_scandir
+            records = iter_records(effective_root, depth, stats, meta_reader=meta_reader, metrics=metrics)
+        for _ in records:
+            urls += 1
+        elapsed = time.perf_counter() - t0
+    if conn is not None:
+        conn.close()
+
+    return {
+        "walker": walker,
+        "leaves": stats["leaf_checked"],
+        "urls": urls,
+        "seconds": elapsed,
+        "calls": dict(fc.counts) if count_calls else {},
+        "phase_s": metrics.phase_s,
+    }
+
+def run_mode(repo_root: str, branches: List[str], depth: int, mode: str,
+             meta_fast: bool, count_calls: bool) -> dict:
+    """
+    One pass of `mode` over all branches; meant to run in its own process so peak RSS is per mode.
+    """
+    total = {"walker": mode, "leaves": 0, "urls": 0, "seconds": 0.0, "calls": Counter(),
+             "phase_s": Counter()}
+    work_dir = tempfile.mkdtemp(prefix="csx_bench_") if mode == "manifest" else None
+    try:
+        for b in branches:
+            r = run_walker(repo_root, b, depth, mode, meta_fast=meta_fast,
+                           count_calls=count_calls, work_dir=work_dir)
+            total["leaves"] += r["leaves"]
+            total["urls"] += r["urls"]
+            total["seconds"] += r["seconds"]
+            total["calls"].update(r["calls"])
+            total["phase_s"].update(r["phase_s"])
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    total["calls"] = dict(total["calls"])
+    total["phase_s"] = dict(total["phase_s"])
+    total["peak_rss_mb"] = peak_rss_mb()
+    return total
+
+def bench_mode(repo_root: str, branches: List[str], depth: int, mode: str,
+               meta_fast: bool = False, repeat: int = 3) -> dict:
+    """
+    One counted run (also warms the page cache) and `repeat` timed runs, each in a fresh process.
+    Keeps the fastest timed run and the largest peak RSS. Exits when the mode finds no leaves,
+    which almost always means the shard depth does not match the tree.
+    """
+    ctx = multiprocessing.get_context("spawn")
+
+    def once(count_calls: bool) -> dict:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            return pool.submit(run_mode, repo_root, branches, depth, mode, meta_fast, count_calls).result()
+
+    counted = once(True)
+    if counted["leaves"] == 0:
+        raise SystemExit(f"{mode}: no leaves found {depth} shard levels below the branches of {repo_root}; "
+                         "check --shard-depth")
+    timed = [once(False) for _ in range(repeat)]
+    best = min(timed, key=lambda r: r["seconds"])
+    rss = [r["peak_rss_mb"] for r in timed + [counted] if r["peak_rss_mb"] is not None]
+    best["calls"] = counted["calls"]
+    best["leaves_per_s"] = best["leaves"] / best["seconds"] if best["seconds"] > 0 else 0.0
+    best["calls_per_leaf"] = sum(counted["calls"].values()) / counted["leaves"]
+    best["peak_rss_mb"] = max(rss) if rss else None
+    return best
+
+def print_report(rows: List[dict]) -> None:
+    kinds = ("listing", "stat", "entry", "open")
+    print(f"{'mode':<9} {'leaves':>8} {'urls':>8} {'secs':>8} {'leaves/s':>10} {'rss MB':>7} " +
+          " ".join(f"{k + '/leaf':>13}" for k in kinds) + f" {'total/leaf':>11}")
+    for r in rows:
+        per = [r["calls"].get(k, 0) / r["leaves"] for k in kinds]
+        rss = f"{r['peak_rss_mb']:>7.1f}" if r.get("peak_rss_mb") is not None else f"{'n/a':>7}"
+        print(f"{r['walker']:<9} {r['leaves']:>8} {r['urls']:>8} {r['seconds']:>8.2f} "
+              f"{r.get('leaves_per_s', 0.0):>10.0f} {rss} " +
+              " ".join(f"{v:>13.2f}" for v in per) + f" {sum(per):>11.2f}")
+    for r in rows:
+        ph = r.get("phase_s") or {}
+        if ph:
+            print(f"  {r['walker']}: " + " | ".join(f"{k} {v:.2f}s" for k, v in ph.items() if k != "throttle"))
+
+def check_regressions(rows: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compares rows against a --save-baseline file; returns one message per regression.
+    """
+    base = {r["walker"]: r for r in baseline.get("results", [])}
+    problems = []
+    for r in rows:
+        b = base.get(r["walker"])
+        if b is None:
+            continue
+        if r["leaves_per_s"] < b["leaves_per_s"] * (1 - tolerance):
+            problems.append(f"{r['walker']}: {r['leaves_per_s']:.0f} leaves/s vs baseline {b['leaves_per_s']:.0f}")
+        if r["calls_per_leaf"] > b["calls_per_leaf"] * (1 + tolerance):
+            problems.append(f"{r['walker']}: {r['calls_per_leaf']:.2f} fs calls/leaf vs baseline {b['calls_per_leaf']:.2f}")
+        if r.get("peak_rss_mb") and b.get("peak_rss_mb") and r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{r['walker']}: peak RSS {r['peak_rss_mb']:.1f} MB vs baseline {b['peak_rss_mb']:.1f} MB")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark csx_sitemap_generator leaf walkers (leaves/sec, fs calls, peak RSS).")
+    ap.add_argument("--root", required=True, help="Repo root directory (contains 00..ff branches).")
+    ap.add_argument("--branches", default="all", help="Comma list like '02,0a' OR 'all'.")
+    ap.add_argument("--shard-depth", type=int, default=None,
+                    help="Shard depth (same convention as the generator); by default read from the "
+                         f"fixture's csx_fixture.json, else {gen.DEFAULT_SHARD_DEPTH}.")
+    ap.add_argument("--meta-fast", action="store_true", help="Use the fast meta.json field scanner.")
+    ap.add_argument("--walkers", default=",".join(MODES), help="Comma list of modes to run.")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per mode (the fastest is reported).")
+    ap.add_argument("--json-out", default="", help="Also write the results to this JSON file.")
+    ap.add_argument("--save-baseline", default="", help="Write the results as a regression baseline.")
+    ap.add_argument("--baseline", default="", help="Compare against a baseline file; exit 1 on regression.")
+    ap.add_argument("--tolerance", type=float, default=0.15,
+                    help="Allowed relative slowdown / growth against --baseline (default 0.15).")
+    args = ap.parse_args()
+
+    repo_root = os.path.abspath(args.root)
+    branches = gen.parse_branches_arg(args.branches)
+    if branches == ["__ALL__"]:
+        branches = gen.detect_branches(repo_root)
+    if not branches:
+        raise SystemExit("No branches to benchmark.")
+    if args.repeat < 1:
+        raise SystemExit("--repeat must be >= 1")
+
+    fixture = None
+    fixture_info = os.path.join(repo_root, "csx_fixture.json")
+    if os.path.isfile(fixture_info):
+        with open(fixture_info, encoding="utf-8") as f:
+            fixture = json.load(f)
+    depth = branch_shard_depth(args.shard_depth, fixture)
+
+    rows = []
+    for mode in [w.strip() for w in args.walkers.split(",") if w.strip()]:
+        if mode not in MODES:
+            raise SystemExit(f"Unknown walker: {mode}")
+        rows.append(bench_mode(repo_root, branches, depth, mode,
+                               meta_fast=args.meta_fast, repeat=args.repeat))
+
+    print_report(rows)
+
+    doc = {"root": repo_root, "branches": branches, "meta_fast": args.meta_fast,
+           "fixture": fixture, "results": rows}
+    for path in (args.json_out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = check_regressions(rows, json.load(f), args.tolerance)
+        if problems:
+            print(f"REGRESSIONS ({len(problems)}):")
+            for p in problems:
+                print(f"  {p}")
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+csx_doi_index.py
+
+Sorted, memory-mapped lookup index over the per-branch DOI maps (doi_map_<branch>.csv[.gz])
+written by csx_sitemap_generator.py: DOI -> document URL(s) and 40-hex leaf id -> (URL, DOI).
+
+File layout (little-endian; one file, read through mmap, nothing loaded up front):
+- header    : magic, record counts, section offsets
+- strings   : u16 length + UTF-8 bytes for every URL and DOI
+- leaf table: sorted fixed-width records (20-byte leaf id, url offset, doi offset)
+- doi table : sorted fixed-width records (8-byte hash of the normalised DOI, url offset, doi offset)
+- two 256-entry fan-out tables (cumulative record counts by first key byte, as in a git pack
+  index) that narrow each binary search to one key-prefix bucket.
+
+Building is an external merge sort: each DOI map becomes one sorted run, and the runs are
+merged into the final tables, so memory stays at about one branch's worth of records.
+
+Example:
+  python csx_doi_index.py build --out-dir C:\\csxrepo01_repo\\out
+  python csx_doi_index.py doi 10.1145/1234567.890123 --out-dir C:\\csxrepo01_repo\\out
+  python csx_doi_index.py leaf 00e291cbc8578ffc4e7c365f0ff2594435a8981d --out-dir C:\\csxrepo01_repo\\out
+"""
+
+import os
+import re
+import csv
+import gzip
+import mmap
+import heapq
+import struct
+import hashlib
+import argparse
+import tempfile
+from typing import Optional, List, Tuple, Iterator, BinaryIO
+
+HEX40 = re.compile(r"^[0-9a-f]{40}$", re.I)
+DOI_MAP_FILE = re.compile(r"^doi_map_([0-9a-f]{2})\.csv(\.gz)?$", re.I)
+
+DOI_INDEX_NAME = "doi_index.bin"
+INDEX_MAGIC = b"CSXDOI\x00\x01"
+_HEADER = struct.Struct("<8sQQQQQQ")  # magic, n_leaf, n_doi, leaf_tab, leaf_fan, doi_tab, doi_fan
+_LEAF_REC = struct.Struct(">20sQQ")   # big-endian so byte order == key order
+_DOI_REC = struct.Struct(">8sQQ")
+_FANOUT = struct.Struct("<256Q")
+_STR_LEN = struct.Struct("<H")
+NO_STRING = 0  # string offset meaning "absent"; the header occupies offset 0
+
+def normalize_doi(doi: str) -> str:
+    """
+    DOIs are case-insensitive; also drops the common resolver/URI prefixes.
+    """
+    d = doi.strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if d.startswith(prefix):
+            return d[len(prefix):]
+    return d
+
+def doi_key(doi: str) -> bytes:
+    return hashlib.blake2b(normalize_doi(doi).encode("utf-8"), digest_size=8).digest()
+
+def leaf_id_from_url(url: str) -> Optional[str]:
+    """
+    The 40-hex leaf id from a .../<leaf>/document.pdf URL (None if the URL has another shape).
+    """
+    parts = url.rsplit("/", 2)
+    if len(parts) == 3 and HEX40.match(parts[1]):
+        return parts[1].lower()
+    return None
+
+def find_doi_maps(out_dir: str) -> List[str]:
+    """
+    One DOI map per branch in out_dir; when both .csv and .csv.gz exist the newer one wins.
+    """
+    latest = {}
+    for name in os.listdir(out_dir):
+        m = DOI_MAP_FILE.match(name)
+        if not m:
+            continue
+        path = os.path.join(out_dir, name)
+        branch = m.group(1).lower()
+        if branch not in latest or os.path.getmtime(path) > os.path.getmtime(latest[branch]):
+            latest[branch] = path
+    return [latest[b] for b in sorted(latest)]
+
+def iter_doi_map(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (url, doi) rows of one DOI map (plain or gzip).
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def _write_string(out: BinaryIO, pos: int, s: str) -> Tuple[int, int]:
+    """
+    Appends one length-prefixed string; returns (its offset, the new end position).
+    """
+    b = s.encode("utf-8")[:0xFFFF]
+    out.write(_STR_LEN.pack(len(b)))
+    out.write(b)
+    return pos, pos + _STR_LEN.size + len(b)
+
+def _iter_run(path: str, size: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            rec = f.read(size)
+            if len(rec) < size:
+                return
+            yield rec
+
+def _merge_runs(out: BinaryIO, runs: List[str], size: int) -> Tuple[int, List[int]]:
+    """
+    Writes the merged records of all runs; returns (record count, cumulative fan-out).
+    """
+    counts = [0] * 256
+    n = 0
+    for rec in heapq.merge(*(_iter_run(p, size) for p in runs)):
+        out.write(rec)
+        counts[rec[0]] += 1
+        n += 1
+    total = 0
+    for i in range(256):
+        total += counts[i]
+        counts[i] = total
+    return n, counts
+
+def build_doi_index(out_dir: str, index_path: Optional[str] = None,
+                    doi_maps: Optional[List[str]] = None) -> Tuple[str, int, int]:
+    """
+    Builds the index from the DOI maps in out_dir (or the given list).
+
+    Written as <index>.part and renamed into place, like the other outputs.
+
+    Returns:
+      (index_path, leaf_records, doi_records)
+    """
+    index_path = index_path or os.path.join(out_dir, DOI_INDEX_NAME)
+    doi_maps = find_doi_maps(out_dir) if doi_maps is None else doi_maps
+    part = index_path + ".part"
+
+    with tempfile.TemporaryDirectory(prefix="doi_index_", dir=os.path.dirname(os.path.abspath(index_path))) as tmp, \
+            open(part, "wb") as out:
+        out.write(b"\0" * _HEADER.size)
+        pos = _HEADER.size
+        leaf_runs: List[str] = []
+        doi_runs: List[str] = []
+
+        # Pass 1: strings go straight to the index; each DOI map becomes one sorted run per table.
+        for i, path in enumerate(doi_maps):
+            leaf_recs: List[bytes] = []
+            doi_recs: List[bytes] = []
+            for url, doi in iter_doi_map(path):
+                lid = leaf_id_from_url(url)
+                if lid is None:
+                    continue
+                url_off, pos = _write_string(out, pos, url)
+                doi_off = NO_STRING
+                if doi:
+                    doi_off, pos = _write_string(out, pos, doi)
+                    doi_recs.append(_DOI_REC.pack(doi_key(doi), url_off, doi_off))
+                leaf_recs.append(_LEAF_REC.pack(bytes.fromhex(lid), url_off, doi_off))
+            for recs, runs, tag in ((leaf_recs, leaf_runs, "leaf"), (doi_recs, doi_runs, "doi")):
+                recs.sort()
+                run_path = os.path.join(tmp, f"{tag}_{i}.run")
+                with open(run_path, "wb") as f:
+                    f.write(b"".join(recs))
+                runs.append(run_path)
+
+        # Pass 2: merge the runs into the final tables, each followed by its fan-out.
+        leaf_tab = pos
+        n_leaf, leaf_fanout = _merge_runs(out, leaf_runs, _LEAF_REC.size)
+        leaf_fan = leaf_tab + n_leaf * _LEAF_REC.size
+        out.write(_FANOUT.pack(*leaf_fanout))
+        doi_tab = leaf_fan + _FANOUT.size
+        n_doi, doi_fanout = _merge_runs(out, doi_runs, _DOI_REC.size)
+        doi_fan = doi_tab + n_doi * _DOI_REC.size
+        out.write(_FANOUT.pack(*doi_fanout))
+
+        out.seek(0)
+        out.write(_HEADER.pack(INDEX_MAGIC, n_leaf, n_doi, leaf_tab, leaf_fan, doi_tab, doi_fan))
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(part, index_path)
+    return index_path, n_leaf, n_doi
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+class DoiIndex:
+    """
+    Read-only view of a doi_index.bin. Each lookup is a binary search inside one fan-out
+    bucket of the memory-mapped tables; only the touched pages are read from disk.
+
+    with DoiIndex(path) as idx:
+        idx.lookup_doi("10.1145/...")   -> [(url, doi), ...]
+        idx.lookup_leaf("00e291cb...")  -> (url, doi) or None
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_leaf, self.n_doi, self._leaf_tab, leaf_fan, self._doi_tab, doi_fan = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Not a DOI index: {path}")
+        self._leaf_fan = _FANOUT.unpack_from(self._mm, leaf_fan)
+        self._doi_fan = _FANOUT.unpack_from(self._mm, doi_fan)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _string(self, off: int) -> str:
+        if off == NO_STRING:
+            return ""
+        (n,) = _STR_LEN.unpack_from(self._mm, off)
+        start = off + _STR_LEN.size
+        return self._mm[start:start + n].decode("utf-8")
+
+    def _search(self, key: bytes, table: int, fanout: Tuple[int, ...], rec: struct.Struct) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (url_off, doi_off) of every record whose key equals `key`.
+        """
+        mm = self._mm
+        size = rec.size
+        klen = len(key)
+        lo = fanout[key[0] - 1] if key[0] else 0
+        hi = fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            p = table + mid * size
+            if mm[p:p + klen] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = fanout[key[0]]
+        while lo < end:
+            k, url_off, doi_off = rec.unpack_from(mm, table + lo * size)
+            if k != key:
+                return
+            yield url_off, doi_off
+            lo += 1
+
+    def lookup_leaf(self, leaf_id: str) -> Optional[Tuple[str, str]]:
+        """
+        (url, doi) for a 40-hex leaf id; doi is "" when the leaf has none. None if unknown.
+        """
+        if not HEX40.match(leaf_id):
+            return None
+        for url_off, doi_off in self._search(bytes.fromhex(leaf_id), self._leaf_tab, self._leaf_fan, _LEAF_REC):
+            return self._string(url_off), self._string(doi_off)
+        return None
+
+    def lookup_doi(self, doi: str) -> List[Tuple[str, str]]:
+        """
+        Every (url, doi) whose DOI matches (case-insensitive; doi.org / doi: prefixes ignored).
+        """
+        want = normalize_doi(doi)
+        hits = []
+        for url_off, doi_off in self._search(doi_key(doi), self._doi_tab, self._doi_fan, _DOI_REC):
+            d = self._string(doi_off)
+            if normalize_doi(d) == want:  # 64-bit hash: confirm against the stored DOI
+                hits.append((self._string(url_off), d))
+        return hits
+
+def main():
+    ap = argparse.ArgumentParser(description="Build or query the DOI / leaf-id lookup index.")
+    ap.add_argument("--out-dir", default=".", help="Directory holding doi_map_*.csv[.gz] and the index.")
+    ap.add_argument("--index", default="", help=f"Index path (default <out-dir>/{DOI_INDEX_NAME}).")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="(Re)build the index from the DOI maps in --out-dir.")
+    p_doi = sub.add_parser("doi", help="Resolve DOIs to document URLs.")
+    p_doi.add_argument("keys", nargs="+", metavar="DOI")
+    p_leaf = sub.add_parser("leaf", help="Resolve 40-hex leaf ids to URL and DOI.")
+    p_leaf.add_argument("keys", nargs="+", metavar="LEAF_ID")
+    args = ap.parse_args()
+
+    index_path = args.index or os.path.join(args.out_dir, DOI_INDEX_NAME)
+    if args.command == "build":
+        path, n_leaf, n_doi = build_doi_index(args.out_dir, index_path)
+        print(f"DOI index written: {path} ({n_leaf} leaves, {n_doi} DOIs)")
+        return
+
+    if not os.path.isfile(index_path):
+        raise SystemExit(f"Index not found: {index_path} (run the build command first)")
+    missing = 0
+    with DoiIndex(index_path) as idx:
+        for key in args.keys:
+            if args.command == "doi":
+                hits = idx.lookup_doi(key)
+            else:
+                hit = idx.lookup_leaf(key.strip().lower())
+                hits = [hit] if hit else []
+            if not hits:
+                missing += 1
+                print(f"{key}\t(not found)")
+            for url, doi in hits:
+                print(f"{key}\t{url}\t{doi}")
+    if missing:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
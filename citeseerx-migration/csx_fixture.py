@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+csx_fixture.py
+
+Build a synthetic CiteseerX-shaped repository for benchmarking csx_sitemap_generator.py.
+
+Layout matches the generator's model: a leaf with 40-hex id H lives at
+  <out>/H[0:2]/H[2:4]/.../H[2*(shard_depth-1):2*shard_depth]/H/
+so the top-level branch is H[0:2] and --shard-depth counts the 2-hex levels from the repo root
+(same convention as the generator without --branches).
+
+Everything is derived from --seed, so the same arguments always build the same tree.
+Point --out at tmpfs (e.g. /dev/shm/csx_fixture) to take the disk out of the measurement.
+
+Example:
+  python csx_fixture.py --out /dev/shm/csx_fixture --branches 4 --leaves-per-branch 5000 --fanout 16
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+from typing import List
+
+import csx_sitemap_generator as gen
+
+FIXTURE_INFO = "csx_fixture.json"  # written at the fixture root; ignored by the walkers
+
+def fixture_branches(count: int) -> List[str]:
+    """
+    `count` 2-hex branch names spread evenly over 00..ff.
+    """
+    return [f"{i * 256 // count:02x}" for i in range(count)]
+
+def leaf_id(rng: random.Random, branch: str, shard_depth: int, fanout: int) -> str:
+    """
+    Random 40-hex leaf id under `branch`; each shard level below the branch uses one of
+    `fanout` values, which controls how many leaves share a directory.
+    """
+    h = hashlib.sha1(rng.getrandbits(64).to_bytes(8, "big")).hexdigest()
+    levels = [f"{rng.randrange(fanout):02x}" for _ in range(shard_depth - 1)]
+    head = branch + "".join(levels)
+    return head + h[len(head):]
+
+def meta_record(rng: random.Random, lid: str, meta_bytes: int, doi_ratio: float) -> dict:
+    """
+    meta.json shaped like the production records: a padded abstract first, then doi and
+    record.lastModified (so --meta-fast has to skip the bulk to find them).
+    """
+    rec = {
+        "id": lid,
+        "title": f"Synthetic document {lid[:8]}",
+        "abstract": "",
+    }
+    if rng.random() < doi_ratio:
+        rec["doi"] = f"10.{1000 + rng.randrange(9000)}/{lid[:12]}"
+    day = 1 + rng.randrange(28)
+    rec["record"] = {"lastModified": f"2024-{1 + rng.randrange(12):02d}-{day:02d}T00:00:00Z"}
+    pad = meta_bytes - len(json.dumps(rec))
+    if pad > 0:
+        rec["abstract"] = ("lorem ipsum " * (pad // 12 + 1))[:pad]
+    return rec
+
+def build_fixture(
+    out: str,
+    shard_depth: int = gen.DEFAULT_SHARD_DEPTH,
+    branches: int = 4,
+    leaves_per_branch: int = 1000,
+    fanout: int = 16,
+    meta_ratio: float = 0.9,
+    meta_bytes: int = 2048,
+    doi_ratio: float = 0.8,
+    missing_pdf: float = 0.05,
+    pdf_bytes: int = 1024,
+    seed: int = 1,
+) -> dict:
+    """
+    Writes the tree and FIXTURE_INFO under `out`; returns the recorded parameters and counts.
+    """
+    rng = random.Random(seed)
+    pdf_body = b"%PDF-1.4\n".ljust(pdf_bytes, b"0")
+    counts = {"leaves": 0, "pdfs": 0, "metas": 0}
+
+    for branch in fixture_branches(branches):
+        for _ in range(leaves_per_branch):
+            lid = leaf_id(rng, branch, shard_depth, fanout)
+            leaf_dir = os.path.join(out, *[lid[2 * i:2 * i + 2] for i in range(shard_depth)], lid)
+            os.makedirs(leaf_dir, exist_ok=True)
+            counts["leaves"] += 1
+            if rng.random() >= missing_pdf:
+                with open(os.path.join(leaf_dir, "document.pdf"), "wb") as f:
+                    f.write(pdf_body)
+                counts["pdfs"] += 1
+            if rng.random() < meta_ratio:
+                with open(os.path.join(leaf_dir, "meta.json"), "w", encoding="utf-8") as f:
+                    json.dump(meta_record(rng, lid, meta_bytes, doi_ratio), f)
+                counts["metas"] += 1
+
+    info = {
+        "shard_depth": shard_depth, "branches": branches, "leaves_per_branch": leaves_per_branch,
+        "fanout": fanout, "meta_ratio": meta_ratio, "meta_bytes": meta_bytes, "doi_ratio": doi_ratio,
+        "missing_pdf": missing_pdf, "pdf_bytes": pdf_bytes, "seed": seed, "counts": counts,
+    }
+    with open(os.path.join(out, FIXTURE_INFO), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+def main():
+    ap = argparse.ArgumentParser(description="Build a synthetic CiteseerX-style sharded repository.")
+    ap.add_argument("--out", required=True, help="Fixture root to create (must be empty or missing).")
+    ap.add_argument("--shard-depth", type=int, default=gen.DEFAULT_SHARD_DEPTH,
+                    help="2-hex levels from the root to the 40-hex leaf, including the branch (default 7).")
+    ap.add_argument("--branches", type=int, default=4, help="Number of top-level branches (1..256).")
+    ap.add_argument("--leaves-per-branch", type=int, default=1000, help="Leaf directories per branch.")
+    ap.add_argument("--fanout", type=int, default=16,
+                    help="Distinct 2-hex names per shard level below a branch (1..256); lower = denser dirs.")
+    ap.add_argument("--meta-ratio", type=float, default=0.9, help="Fraction of leaves with meta.json.")
+    ap.add_argument("--meta-bytes", type=int, default=2048, help="Approximate meta.json size in bytes.")
+    ap.add_argument("--doi-ratio", type=float, default=0.8, help="Fraction of meta.json records with a doi.")
+    ap.add_argument("--missing-pdf", type=float, default=0.05, help="Fraction of leaves without document.pdf.")
+    ap.add_argument("--pdf-bytes", type=int, default=1024, help="Size of each document.pdf.")
+    ap.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = ap.parse_args()
+
+    if not 1 <= args.branches <= 256:
+        raise SystemExit("--branches must be between 1 and 256")
+    if not 1 <= args.fanout <= 256:
+        raise SystemExit("--fanout must be between 1 and 256")
+    if args.shard_depth < 1:
+        raise SystemExit("--shard-depth must be >= 1")
+    for name in ("meta_ratio", "doi_ratio", "missing_pdf"):
+        if not 0.0 <= getattr(args, name) <= 1.0:
+            raise SystemExit(f"--{name.replace('_', '-')} must be between 0 and 1")
+    if os.path.isdir(args.out) and os.listdir(args.out):
+        raise SystemExit(f"Refusing to build into non-empty directory: {args.out}")
+    os.makedirs(args.out, exist_ok=True)
+
+    info = build_fixture(
+        args.out, shard_depth=args.shard_depth, branches=args.branches,
+        leaves_per_branch=args.leaves_per_branch, fanout=args.fanout, meta_ratio=args.meta_ratio,
+        meta_bytes=args.meta_bytes, doi_ratio=args.doi_ratio, missing_pdf=args.missing_pdf,
+        pdf_bytes=args.pdf_bytes, seed=args.seed,
+    )
+    c = info["counts"]
+    print(f"Fixture written: {args.out}")
+    print(f"  Leaves: {c['leaves']} | document.pdf: {c['pdfs']} | meta.json: {c['metas']}")
+
+if __name__ == "__main__":
+    main()
@@ -12,18 +12,31 @@ Directory model (your established model):
 - Leaf dirs: 40-hex (SHA1-like) containing document.pdf (+ optional meta.json)
 
 Key idea:
-- Use os.walk(topdown=True) + prune dirs[] to avoid scanning irrelevant directories.
+- Walk top-down with os.scandir, pruning to the expected 2-hex / 40-hex names at each depth,
+  so irrelevant directories are never scanned (legacy os.walk walker kept as --walker oswalk).
 """
 
 import os
 import re
+import io
 import csv
+import codecs
+import gzip
+import sys
 import json
 import time
+import heapq
+import sqlite3
 import argparse
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
-from xml.sax.saxutils import escape as xml_escape
-from typing import Optional, List, Tuple
+from xml.sax.saxutils import escape as xml_escape, unescape as xml_unescape
+from collections import OrderedDict
+from typing import Optional, List, Tuple, Dict, Iterator, NamedTuple, Union
+
+from csx_doi_index import build_doi_index
 
 HEX2  = re.compile(r"^[0-9a-f]{2}$", re.I)
 HEX40 = re.compile(r"^[0-9a-f]{40}$", re.I)
@@ -41,40 +54,203 @@ def rel_depth(root: str, path: str) -> int:
     rel = os.path.relpath(path, root)
     return 0 if rel == "." else len(rel.split(os.sep))
 
+def iso8601_from_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
 def lastmod_iso8601(path: str) -> str:
-    ts = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
-    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return iso8601_from_ts(os.path.getmtime(path))
 
-def get_lastmod_pref_meta(leaf_dir: str, pdf_path: str) -> str:
-    meta_path = os.path.join(leaf_dir, "meta.json")
+# ---------------------------------------------------------------------------
+# Leaf metadata: meta.json is parsed once per leaf into (lastmod, doi)
+# ---------------------------------------------------------------------------
+
+class LeafMeta(NamedTuple):
+    lastmod: str  # record.lastModified, "" when absent
+    doi: str      # doi or metadata.doi, "" when absent
+
+EMPTY_LEAF_META = LeafMeta("", "")
+
+def leaf_meta_from_data(data) -> LeafMeta:
+    """
+    Extracts (lastmod, doi) from a decoded meta.json with the historical rules:
+    - lastmod: record.lastModified (non-empty string)
+    - doi: doi, falling back to metadata.doi (non-empty string)
+    """
+    lastmod = ""
     try:
-        if os.path.exists(meta_path):
-            with open(meta_path, "r", encoding="utf-8-sig") as f:
-                data = json.load(f)
-            rec = data.get("record")
-            if isinstance(rec, dict):
-                lm = rec.get("lastModified")
-                if isinstance(lm, str) and lm.strip():
-                    return lm.strip()
+        rec = data.get("record")
+        if isinstance(rec, dict):
+            lm = rec.get("lastModified")
+            if isinstance(lm, str) and lm.strip():
+                lastmod = lm.strip()
     except Exception:
         pass
-    return lastmod_iso8601(pdf_path)
 
-def get_meta_doi(leaf_dir: str) -> str:
-    meta_path = os.path.join(leaf_dir, "meta.json")
-    if not os.path.exists(meta_path):
-        return ""
+    doi = ""
+    try:
+        if isinstance(data, dict):
+            d = data.get("doi") or (data.get("metadata", {}) or {}).get("doi")
+            if isinstance(d, str) and d.strip():
+                doi = d.strip()
+    except Exception:
+        pass
+
+    return LeafMeta(lastmod, doi)
+
+# Only these paths matter; everything else in meta.json is skipped by the fast scanner.
+_META_WANTED = {"doi": None, "metadata": {"doi": None}, "record": {"lastModified": None}}
+
+# The fast scanner reads this much first; most meta.json files carry doi/record up front.
+META_FAST_HEAD_CHARS = 64 * 1024
+
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+_json_decoder = json.JSONDecoder()
+
+def _meta_scan_done(found: dict) -> bool:
+    # lastmod comes from record; doi from a non-empty top-level doi, else from metadata.
+    # metadata.doi is only a fallback, so a top-level doi may still follow it: keep scanning.
+    doi = found.get("doi")
+    return "record" in found and isinstance(doi, str) and bool(doi.strip())
+
+def _json_scan_object(text: str, i: int, wanted: dict, top: bool = False) -> Tuple[dict, int]:
+    """
+    Scans the object at text[i] == "{" and returns ({key: value} for wanted keys, end index).
+    Nested wanted dicts are applied to object values. Unwanted values are skipped one at a
+    time by the C decoder and dropped immediately, so the full tree is never held in memory.
+    The top-level scan stops as soon as every field meta.json can contribute has been seen.
+    """
+    found = {}
+    i = _JSON_WS.match(text, i + 1).end()
+    if text[i] == "}":
+        return found, i + 1
+    while True:
+        if text[i] != '"':
+            raise ValueError(f"expected key at {i}")
+        key, i = json.decoder.scanstring(text, i + 1)
+        i = _JSON_WS.match(text, i).end()
+        if text[i] != ":":
+            raise ValueError(f"expected ':' at {i}")
+        i = _JSON_WS.match(text, i + 1).end()
+
+        if key not in wanted:
+            i = _json_decoder.raw_decode(text, i)[1]
+        elif wanted[key] is not None and text[i] == "{":
+            found[key], i = _json_scan_object(text, i, wanted[key])
+        else:
+            found[key], i = _json_decoder.raw_decode(text, i)
+
+        if top and _meta_scan_done(found):
+            return found, i
+
+        i = _JSON_WS.match(text, i).end()
+        if text[i] == ",":
+            i = _JSON_WS.match(text, i + 1).end()
+        elif text[i] == "}":
+            return found, i + 1
+        else:
+            raise ValueError(f"expected ',' or '}}' at {i}")
+
+def _meta_scan(text: str) -> Optional[LeafMeta]:
+    try:
+        i = _JSON_WS.match(text).end()
+        if text[i] == "{":
+            return leaf_meta_from_data(_json_scan_object(text, i, _META_WANTED, top=True)[0])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+def parse_leaf_meta(meta_path: str, fast: bool = False) -> LeafMeta:
+    """
+    Reads meta.json once.
+
+    With fast=True only the lastmod/doi paths are materialised and reading stops once they
+    have been seen (only the first META_FAST_HEAD_CHARS are read when they come early).
+    Anything the scanner cannot handle falls back to a full json.loads.
+    Unlike json.load, a duplicate key after the early stop is not seen.
+    """
     try:
         with open(meta_path, "r", encoding="utf-8-sig") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            return ""
-        d = data.get("doi") or (data.get("metadata", {}) or {}).get("doi")
-        if isinstance(d, str) and d.strip():
-            return d.strip()
+            if fast:
+                head = f.read(META_FAST_HEAD_CHARS)
+                meta = _meta_scan(head)
+                if meta is not None:
+                    return meta
+                text = head + f.read()
+            else:
+                text = f.read()
+    except Exception:
+        return EMPTY_LEAF_META
+
+    if fast:
+        meta = _meta_scan(text)
+        if meta is not None:
+            return meta
+
+    try:
+        return leaf_meta_from_data(json.loads(text))
     except Exception:
+        return EMPTY_LEAF_META
+
+class LeafMetaReader:
+    """
+    parse_leaf_meta behind a bounded LRU cache.
+
+    Entries are keyed by (meta_path, sig); pass sig=(mtime_ns, size) when the caller already
+    has it so edits invalidate the entry. With sig=None the entry is keyed by path alone.
+    """
+
+    def __init__(self, cache_size: int = 4096, fast: bool = False):
+        self.cache_size = cache_size
+        self.fast = fast
+        self._cache: "OrderedDict[Tuple[str, Optional[tuple]], LeafMeta]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, meta_path: str, sig: Optional[tuple] = None) -> LeafMeta:
+        if self.cache_size <= 0:
+            self.misses += 1
+            return parse_leaf_meta(meta_path, fast=self.fast)
+
+        key = (meta_path, sig)
+        meta = self._cache.get(key)
+        if meta is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return meta
+
+        self.misses += 1
+        meta = parse_leaf_meta(meta_path, fast=self.fast)
+        self._cache[key] = meta
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return meta
+
+DEFAULT_META_CACHE = 4096
+_meta_readers: Dict[Tuple[int, bool], LeafMetaReader] = {}
+
+def get_meta_reader(cache_size: int = DEFAULT_META_CACHE, fast: bool = False) -> LeafMetaReader:
+    """
+    Process-wide reader per configuration, so the cache survives across branches/runs.
+    """
+    key = (cache_size, fast)
+    if key not in _meta_readers:
+        _meta_readers[key] = LeafMetaReader(cache_size=cache_size, fast=fast)
+    return _meta_readers[key]
+
+def get_meta_lastmod(leaf_dir: str) -> str:
+    meta_path = os.path.join(leaf_dir, "meta.json")
+    if not os.path.exists(meta_path):
         return ""
-    return ""
+    return parse_leaf_meta(meta_path).lastmod
+
+def get_lastmod_pref_meta(leaf_dir: str, pdf_path: str) -> str:
+    return get_meta_lastmod(leaf_dir) or lastmod_iso8601(pdf_path)
+
+def get_meta_doi(leaf_dir: str) -> str:
+    meta_path = os.path.join(leaf_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return ""
+    return parse_leaf_meta(meta_path).doi
 
 def is_leaf_dir(effective_root: str, current_dir: str, shard_depth: int) -> bool:
     # leaf dir = depth == shard_depth + 1 and basename is 40-hex
@@ -102,6 +278,972 @@ def prune_dirs(depth_here: int, dirs: List[str], shard_depth: int) -> None:
     else:
         dirs[:] = []
 
+def leaf_url(base_url: str, branch: str, rel_leaf: str) -> str:
+    # URL should include branch prefix when effective_root is branch-scoped
+    if branch:
+        return f"{base_url}/{branch}/{rel_leaf}/document.pdf"
+    return f"{base_url}/{rel_leaf}/document.pdf"
+
+# ---------------------------------------------------------------------------
+# I/O throttling: fixed --sleep, or adaptive pacing of directory operations
+# ---------------------------------------------------------------------------
+
+class FixedDelay:
+    """
+    The historical --sleep behaviour: a fixed pause before every directory operation.
+    """
+
+    def __init__(self, sleep_s: float):
+        self.sleep_s = sleep_s
+        self.waited_s = 0.0
+
+    def pace(self) -> None:
+        time.sleep(self.sleep_s)
+        self.waited_s += self.sleep_s
+
+    def observe(self, latency: float) -> None:
+        pass
+
+# Slots of the (optionally process-shared) throttle state.
+_T_NEXT, _T_RATE, _T_EWMA, _T_ADJUSTED = range(4)
+THROTTLE_MIN_OPS = 5.0
+THROTTLE_OPS_CAP = 100_000.0  # rate ceiling when only --latency-target is given
+THROTTLE_START_OPS = 50.0  # adaptive starting rate when only --latency-target is given
+
+def _throttle_initial_state(max_ops: float, latency_target: float) -> List[float]:
+    # Adaptive mode starts cautiously and ramps up: at a quarter of --max-ops, or without one at
+    # THROTTLE_START_OPS (not a fraction of THROTTLE_OPS_CAP, which would flood a slow filesystem
+    # before the first cut). A plain rate cap starts at the cap.
+    if not latency_target:
+        return [0.0, max_ops, 0.0, 0.0]
+    rate = max(min(max_ops, THROTTLE_MIN_OPS), max_ops / 4) if max_ops else THROTTLE_START_OPS
+    return [0.0, rate, 0.0, 0.0]
+
+def make_shared_throttle_state(max_ops: float, latency_target: float):
+    """
+    Throttle state in shared memory for the worker pool, or None when no throttle is configured.
+    """
+    if not (max_ops or latency_target):
+        return None
+    return multiprocessing.Array("d", _throttle_initial_state(max_ops, latency_target))
+
+class AdaptiveThrottle:
+    """
+    Paces directory operations (listings and stats) to a target rate. With a latency_target
+    the rate adapts to the measured time per operation (AIMD): it is cut when the latency EWMA
+    goes over the target and grown while it stays comfortably below.
+
+    With shared state (make_shared_throttle_state) every worker process draws from the same
+    schedule and adapts the same rate, so max_ops bounds the total load on the storage backend.
+    """
+
+    EWMA_ALPHA = 0.2
+    ADJUST_EVERY_S = 0.5
+    DECREASE = 0.7
+    INCREASE = 1.1
+    HEADROOM = 0.8  # only speed up while latency is below this fraction of the target
+
+    def __init__(self, max_ops: float = 0.0, latency_target: float = 0.0, shared=None):
+        self.max_ops = max_ops or THROTTLE_OPS_CAP
+        self.min_ops = min(THROTTLE_MIN_OPS, self.max_ops)
+        self.latency_target = latency_target
+        if shared is None:
+            self._s = _throttle_initial_state(max_ops, latency_target)
+            self._lock = nullcontext()
+        else:
+            self._s = shared
+            self._lock = shared.get_lock()
+        self.ops = 0
+        self.waited_s = 0.0
+
+    def pace(self) -> None:
+        """
+        Waits for this operation's slot.
+        """
+        s = self._s
+        with self._lock:
+            now = time.monotonic()
+            slot = max(s[_T_NEXT], now)  # idle time is not banked, so there are no bursts
+            s[_T_NEXT] = slot + 1.0 / s[_T_RATE]
+        if slot > now:
+            time.sleep(slot - now)
+            self.waited_s += slot - now
+
+    def observe(self, latency: float) -> None:
+        """
+        Reports how long the operation took (seconds).
+        """
+        self.ops += 1
+        if not self.latency_target:
+            return
+        s = self._s
+        with self._lock:
+            s[_T_EWMA] = latency if not s[_T_EWMA] else (
+                self.EWMA_ALPHA * latency + (1 - self.EWMA_ALPHA) * s[_T_EWMA])
+            now = time.monotonic()
+            if now - s[_T_ADJUSTED] < self.ADJUST_EVERY_S:
+                return
+            s[_T_ADJUSTED] = now
+            if s[_T_EWMA] > self.latency_target:
+                s[_T_RATE] = max(self.min_ops, s[_T_RATE] * self.DECREASE)
+            elif s[_T_EWMA] < self.latency_target * self.HEADROOM:
+                s[_T_RATE] = min(self.max_ops, s[_T_RATE] * self.INCREASE + 1)
+
+    def summary(self) -> str:
+        with self._lock:
+            rate, ewma = self._s[_T_RATE], self._s[_T_EWMA]
+        return f"{self.ops} dir ops, rate {rate:.0f}/s, latency EWMA {ewma * 1000:.1f} ms"
+
+Throttle = Union[FixedDelay, AdaptiveThrottle]
+
+# Set in pool workers by _init_worker so every branch shares one throttle budget.
+_shared_throttle_state = None
+
+def _init_worker(throttle_state) -> None:
+    global _shared_throttle_state
+    _shared_throttle_state = throttle_state
+
+def make_throttle(sleep_s: float = 0.0, max_ops: float = 0.0, latency_target: float = 0.0,
+                  shared=None) -> Optional[Throttle]:
+    if max_ops or latency_target:
+        return AdaptiveThrottle(max_ops=max_ops, latency_target=latency_target, shared=shared)
+    if sleep_s > 0:
+        return FixedDelay(sleep_s)
+    return None
+
+# ---------------------------------------------------------------------------
+# Run metrics: phase timings, slowest directories, progress/ETA
+# ---------------------------------------------------------------------------
+
+PHASES = ("listing", "stat", "meta", "write", "throttle")
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+class RunMetrics:
+    """
+    Hot-path counters for one branch run: leaves/sec, time per phase (directory listing, stat,
+    meta.json parsing, output writing, throttle waits), the slowest directory listings, and an
+    ETA from the fraction of the shard tree covered so far. Each directory's share of the tree
+    is split evenly among the children it lists, so the estimate sharpens as fan-out is seen.
+
+    With progress_path ("-" for stdout) a JSON line is appended every interval seconds;
+    emit("done") writes the final one.
+    """
+
+    def __init__(self, branch: str, progress_path: Optional[str] = None,
+                 interval: float = DEFAULT_PROGRESS_INTERVAL, top_n: int = 5,
+                 throttle: Optional[Throttle] = None):
+        self.branch = branch
+        self.progress_path = progress_path
+        self.interval = interval
+        self.top_n = top_n
+        self.throttle = throttle
+        self.phase_s = dict.fromkeys(PHASES, 0.0)
+        self.dirs = 0
+        self.leaves = 0
+        self.urls = 0
+        self.progress: Optional[float] = None
+        self._slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, path)
+        self._t0 = time.perf_counter()
+        self._next_emit = time.monotonic() + interval
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phase_s[phase] += seconds
+
+    def listed(self, path: str, seconds: float) -> None:
+        self.phase_s["listing"] += seconds
+        self.dirs += 1
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, (seconds, path))
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, path))
+
+    def leaf(self, progress: Optional[float] = None) -> None:
+        self.leaves += 1
+        if progress is not None:
+            self.progress = progress
+        if self.progress_path and time.monotonic() >= self._next_emit:
+            self.emit("progress")
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self._t0
+        if self.throttle is not None:
+            self.phase_s["throttle"] = self.throttle.waited_s
+        p = self.progress
+        eta = elapsed * (1 - p) / p if p else None
+        return {
+            "branch": self.branch,
+            "elapsed_s": round(elapsed, 3),
+            "dirs": self.dirs,
+            "leaves": self.leaves,
+            "urls": self.urls,
+            "leaves_per_s": round(self.leaves / elapsed, 1) if elapsed > 0 else 0.0,
+            "progress": round(p, 4) if p is not None else None,
+            "eta_s": round(max(eta, 0.0), 1) if eta is not None else None,
+            "phase_s": {k: round(v, 3) for k, v in self.phase_s.items()},
+            "slowest_dirs": [[path, round(sec, 4)] for sec, path in sorted(self._slowest, reverse=True)],
+        }
+
+    def emit(self, event: str) -> None:
+        rec = {"event": event, "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        rec.update(self.snapshot())
+        line = json.dumps(rec) + "\n"
+        if self.progress_path == "-":
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        else:
+            # One write per line in append mode, so parallel workers can share the file.
+            with open(self.progress_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        self._next_emit = time.monotonic() + self.interval
+
+    def report(self) -> List[str]:
+        snap = self.snapshot()
+        total = snap["elapsed_s"] or 1e-9
+        phases = " | ".join(f"{k} {v:.2f}s ({100 * v / total:.0f}%)" for k, v in self.phase_s.items())
+        other = max(total - sum(self.phase_s.values()), 0.0)
+        lines = [f"Timing [{self.branch}]: {total:.2f}s, {self.leaves} leaves ({snap['leaves_per_s']:.0f}/s) | "
+                 f"{phases} | other {other:.2f}s"]
+        if snap["slowest_dirs"]:
+            lines.append(f"Slowest dirs [{self.branch}]: " +
+                         ", ".join(f"{path} ({sec * 1000:.1f} ms)" for path, sec in snap["slowest_dirs"]))
+        return lines
+
+def iter_leaf_records_walk(
+    effective_root: str,
+    shard_depth: int,
+    stats: dict,
+    throttle: Optional[Throttle] = None,
+    ls_depth: int = 0,
+    meta_reader: Optional["LeafMetaReader"] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Legacy full crawl with os.walk. Yields (rel_leaf, lastmod, doi) for every leaf holding document.pdf
+    and counts visited leaves in stats["leaf_checked"]. No ETA: os.walk hides the fan-out.
+    """
+    meta_reader = meta_reader or get_meta_reader()
+    walk = os.walk(effective_root, topdown=True)
+    while True:
+        # Each os.walk step is one directory listing.
+        if throttle is not None:
+            throttle.pace()
+        t0 = time.perf_counter()
+        step = next(walk, None)
+        elapsed = time.perf_counter() - t0
+        if throttle is not None:
+            throttle.observe(elapsed)
+        if step is None:
+            break
+        cur_root, dirs, files = step
+        if metrics is not None:
+            metrics.listed(cur_root, elapsed)
+
+        depth_here = rel_depth(effective_root, cur_root)
+        prune_dirs(depth_here, dirs, shard_depth)
+
+        if ls_depth and depth_here <= ls_depth:
+            print(f"== Depth {depth_here}: {cur_root} ==")
+            for d in dirs:
+                print("DIR ", os.path.join(cur_root, d))
+
+        if is_leaf_dir(effective_root, cur_root, shard_depth):
+            stats["leaf_checked"] += 1
+            if metrics is not None:
+                metrics.leaf()
+
+            t0 = time.perf_counter()
+            pdf_path = os.path.join(cur_root, "document.pdf")
+            meta_path = os.path.join(cur_root, "meta.json")
+            has_pdf = os.path.exists(pdf_path)
+            has_meta = has_pdf and os.path.exists(meta_path)
+            if metrics is not None:
+                metrics.add("stat", time.perf_counter() - t0)
+            if has_pdf:
+                rel_leaf = os.path.relpath(cur_root, effective_root).replace(os.sep, "/")
+                t0 = time.perf_counter()
+                meta = meta_reader.read(meta_path) if has_meta else EMPTY_LEAF_META
+                if metrics is not None:
+                    metrics.add("meta", time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                lm = meta.lastmod or lastmod_iso8601(pdf_path)
+                if metrics is not None and not meta.lastmod:
+                    metrics.add("stat", time.perf_counter() - t0)
+                yield rel_leaf, lm, meta.doi
+
+WALKERS = ("scandir", "oswalk")
+
+def iter_leaves_scandir(
+    effective_root: str,
+    shard_depth: int,
+    throttle: Optional[Throttle] = None,
+    ls_depth: int = 0,
+    resume_prefix: Optional[str] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> Iterator[Tuple[str, str, Optional[os.DirEntry], Optional[os.DirEntry]]]:
+    """
+    Purpose-built shard walker on os.scandir.
+
+    - Depth is tracked by counting levels on the stack (no relpath/split per directory).
+    - Child directories are recognised from DirEntry.is_dir() (d_type on Linux, no stat).
+    - Each leaf is listed exactly once; document.pdf / meta.json come back as DirEntry objects,
+      so callers need no exists() probes and can reuse DirEntry.stat() (free on Windows,
+      one cached stat on POSIX).
+
+    Yields (leaf_dir, rel_leaf, pdf_entry, meta_entry) in sorted order; entries are None when absent.
+    With resume_prefix, first-level shard dirs sorting before it are skipped.
+    """
+    leaf_depth = shard_depth + 1
+    # (path, rel, depth, share_start, share_width); children pushed in reverse so pops come
+    # out sorted. The share is the directory's slice of the whole walk, for the ETA.
+    stack: List[Tuple[str, str, int, float, float]] = [(effective_root, "", 0, 0.0, 1.0)]
+
+    while stack:
+        path, rel, depth_here, share_start, share_width = stack.pop()
+        if throttle is not None:
+            throttle.pace()
+        t0 = time.perf_counter()
+
+        if depth_here == leaf_depth:
+            pdf_entry = meta_entry = None
+            listed = True
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.name == "document.pdf":
+                            pdf_entry = entry
+                        elif entry.name == "meta.json":
+                            meta_entry = entry
+            except OSError:
+                listed = False
+            elapsed = time.perf_counter() - t0
+            if throttle is not None:
+                throttle.observe(elapsed)
+            if metrics is not None:
+                metrics.listed(path, elapsed)
+                metrics.leaf(share_start + share_width)
+            if listed:
+                yield path, rel, pdf_entry, meta_entry
+            continue
+
+        name_re = HEX40 if depth_here == shard_depth else HEX2
+        try:
+            with os.scandir(path) as it:
+                children = sorted(e.name for e in it if name_re.match(e.name) and e.is_dir())
+        except OSError:
+            children = None
+        elapsed = time.perf_counter() - t0
+        if throttle is not None:
+            throttle.observe(elapsed)
+        if metrics is not None:
+            metrics.listed(path, elapsed)
+        if children is None:
+            continue
+        if depth_here == 0 and resume_prefix:
+            children = [d for d in children if d >= resume_prefix]
+
+        if ls_depth and depth_here <= ls_depth:
+            print(f"== Depth {depth_here}: {path} ==")
+            for d in children:
+                print("DIR ", os.path.join(path, d))
+
+        if not children:
+            continue
+        child_width = share_width / len(children)
+        for i in range(len(children) - 1, -1, -1):
+            d = children[i]
+            stack.append((os.path.join(path, d), f"{rel}/{d}" if rel else d, depth_here + 1,
+                          share_start + i * child_width, child_width))
+
+def iter_leaf_records_scandir(
+    effective_root: str,
+    shard_depth: int,
+    stats: dict,
+    throttle: Optional[Throttle] = None,
+    ls_depth: int = 0,
+    meta_reader: Optional["LeafMetaReader"] = None,
+    resume_prefix: Optional[str] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Same contract as iter_leaf_records_walk, driven by iter_leaves_scandir.
+
+    Also tracks the first-level shard prefix being walked in stats["prefix"] and the
+    leaf count reached before that prefix started in stats["prefix_leaf_checked"],
+    which is what a checkpoint needs to resume from that prefix.
+    """
+    meta_reader = meta_reader or get_meta_reader()
+    for _leaf_dir, rel_leaf, pdf_entry, meta_entry in iter_leaves_scandir(
+        effective_root, shard_depth, throttle=throttle, ls_depth=ls_depth, resume_prefix=resume_prefix,
+        metrics=metrics,
+    ):
+        prefix = rel_leaf.partition("/")[0]
+        if prefix != stats.get("prefix"):
+            stats["prefix"] = prefix
+            stats["prefix_leaf_checked"] = stats["leaf_checked"]
+        stats["leaf_checked"] += 1
+        if pdf_entry is None:
+            continue
+        t0 = time.perf_counter()
+        meta = meta_reader.read(meta_entry.path) if meta_entry is not None else EMPTY_LEAF_META
+        if metrics is not None:
+            metrics.add("meta", time.perf_counter() - t0)
+        if meta.lastmod:
+            lm = meta.lastmod
+        else:
+            t0 = time.perf_counter()
+            lm = iso8601_from_ts(pdf_entry.stat().st_mtime)
+            if metrics is not None:
+                metrics.add("stat", time.perf_counter() - t0)
+        yield rel_leaf, lm, meta.doi
+
+# ---------------------------------------------------------------------------
+# Incremental mode: persistent per-branch leaf manifest (SQLite, stdlib only)
+# ---------------------------------------------------------------------------
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    rel      TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    children TEXT NOT NULL,
+    gen      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaves (
+    rel           TEXT PRIMARY KEY,
+    pdf_mtime_ns  INTEGER,
+    pdf_size      INTEGER,
+    meta_mtime_ns INTEGER,
+    meta_size     INTEGER,
+    lastmod       TEXT NOT NULL,
+    doi           TEXT NOT NULL,
+    gen           INTEGER NOT NULL,
+    dir_mtime_ns  INTEGER
+);
+CREATE TABLE IF NOT EXISTS runs (
+    gen        INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL
+);
+"""
+
+# A directory modified this recently may still be changing under us (and coarse mtime
+# granularity can hide a second change), so its listing is never trusted on the next run.
+MTIME_RACE_WINDOW_NS = 2_000_000_000
+
+def open_manifest(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(MANIFEST_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(leaves)")}
+    if "dir_mtime_ns" not in columns:
+        # Manifest from before leaf directory mtimes were kept: its first refresh stats every leaf.
+        conn.execute("ALTER TABLE leaves ADD COLUMN dir_mtime_ns INTEGER")
+    return conn
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+def refresh_manifest(
+    conn: sqlite3.Connection,
+    effective_root: str,
+    shard_depth: int,
+    throttle: Optional[Throttle] = None,
+    ls_depth: int = 0,
+    meta_reader: Optional[LeafMetaReader] = None,
+    metrics: Optional[RunMetrics] = None,
+    verify_files: bool = False,
+) -> Tuple[int, int]:
+    """
+    Brings the manifest up to date with the tree under effective_root.
+
+    - Shard directories whose mtime is unchanged reuse the stored child list (no listing).
+      POSIX directory mtimes only reflect direct entries, so children are still visited.
+    - A leaf directory whose mtime is unchanged is taken as is (one stat per leaf). Otherwise
+      its document.pdf and meta.json are stat'ed, and meta.json is re-parsed only when
+      either changed mtime/size since the last run.
+    - A file rewritten in place (not replaced) leaves its directory's mtime alone, so such
+      edits are only picked up with verify_files=True, which stats the files of every leaf.
+    - Leaves and directories not seen in this run are dropped.
+
+    Returns:
+      (leaf_checked, leaf_reparsed)
+    """
+    meta_reader = meta_reader or get_meta_reader()
+    gen = (conn.execute("SELECT COALESCE(MAX(gen), 0) FROM runs").fetchone()[0] or 0) + 1
+    conn.execute("INSERT INTO runs (gen, started_at) VALUES (?, ?)",
+                 (gen, datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")))
+
+    known_dirs = {rel: (mtime_ns, children) for rel, mtime_ns, children
+                  in conn.execute("SELECT rel, mtime_ns, children FROM dirs")}
+    counts = {"leaf_checked": 0, "leaf_reparsed": 0}
+
+    def visit_leaf(rel: str, leaf_dir: str, progress: float) -> None:
+        counts["leaf_checked"] += 1
+        if throttle is not None:
+            throttle.pace()
+        row = conn.execute(
+            "SELECT pdf_mtime_ns, pdf_size, meta_mtime_ns, meta_size, dir_mtime_ns FROM leaves WHERE rel = ?",
+            (rel,),
+        ).fetchone()
+        t0 = time.perf_counter()
+        dir_st = _stat_or_none(leaf_dir)
+        unchanged = (not verify_files and dir_st is not None and row is not None
+                     and row[4] == dir_st.st_mtime_ns)
+        if not unchanged and dir_st is not None:
+            pdf_st = _stat_or_none(os.path.join(leaf_dir, "document.pdf"))
+            meta_st = _stat_or_none(os.path.join(leaf_dir, "meta.json"))
+        elapsed = time.perf_counter() - t0
+        if throttle is not None:
+            throttle.observe(elapsed)
+        if metrics is not None:
+            metrics.add("stat", elapsed)
+            metrics.leaf(progress)
+        if dir_st is None:
+            return  # removed after its parent was listed
+        if unchanged:
+            conn.execute("UPDATE leaves SET gen = ? WHERE rel = ?", (gen, rel))
+            return
+        trusted_mtime = dir_st.st_mtime_ns if time.time_ns() - dir_st.st_mtime_ns > MTIME_RACE_WINDOW_NS else -1
+        pdf_sig = (pdf_st.st_mtime_ns, pdf_st.st_size) if pdf_st else (None, None)
+        meta_sig = (meta_st.st_mtime_ns, meta_st.st_size) if meta_st else (None, None)
+
+        if row is not None and tuple(row[:4]) == pdf_sig + meta_sig:
+            conn.execute("UPDATE leaves SET gen = ?, dir_mtime_ns = ? WHERE rel = ?", (gen, trusted_mtime, rel))
+            return
+
+        counts["leaf_reparsed"] += 1
+        lastmod, doi = "", ""
+        if meta_st is not None:
+            t0 = time.perf_counter()
+            lastmod, doi = meta_reader.read(os.path.join(leaf_dir, "meta.json"), sig=meta_sig)
+            if metrics is not None:
+                metrics.add("meta", time.perf_counter() - t0)
+        if not lastmod and pdf_st is not None:
+            lastmod = iso8601_from_ts(pdf_st.st_mtime)
+        conn.execute(
+            "INSERT OR REPLACE INTO leaves VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel,) + pdf_sig + meta_sig + (lastmod, doi, gen, trusted_mtime),
+        )
+
+    def visit_dir(rel: str, path: str, depth_here: int, share_start: float, share_width: float) -> None:
+        # share_start/share_width: this directory's slice of the whole walk, for the ETA.
+        if throttle is not None:
+            throttle.pace()
+        t0 = time.perf_counter()
+        st = _stat_or_none(path)
+        if st is None:
+            # Removed after its parent was listed: its leaves drop out with this generation.
+            return
+        known = known_dirs.get(rel)
+        if known is not None and known[0] == st.st_mtime_ns:
+            children = known[1].split("/") if known[1] else []
+        else:
+            try:
+                with os.scandir(path) as it:
+                    children = [e.name for e in it if e.is_dir()]
+            except OSError:
+                children = []
+            prune_dirs(depth_here, children, shard_depth)
+            children.sort()
+        elapsed = time.perf_counter() - t0
+        if throttle is not None:
+            throttle.observe(elapsed)
+        if metrics is not None:
+            metrics.listed(path, elapsed)
+        trusted_mtime = st.st_mtime_ns if time.time_ns() - st.st_mtime_ns > MTIME_RACE_WINDOW_NS else -1
+        conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                     (rel, trusted_mtime, "/".join(children), gen))
+
+        if ls_depth and depth_here <= ls_depth:
+            print(f"== Depth {depth_here}: {path} ==")
+            for d in children:
+                print("DIR ", os.path.join(path, d))
+
+        child_width = share_width / len(children) if children else 0.0
+        for i, d in enumerate(children):
+            child_rel = f"{rel}/{d}" if rel else d
+            child_path = os.path.join(path, d)
+            child_start = share_start + i * child_width
+            if depth_here + 1 == shard_depth + 1:
+                visit_leaf(child_rel, child_path, child_start + child_width)
+            else:
+                visit_dir(child_rel, child_path, depth_here + 1, child_start, child_width)
+
+    with conn:
+        visit_dir("", effective_root, 0, 0.0, 1.0)
+        conn.execute("DELETE FROM leaves WHERE gen <> ?", (gen,))
+        conn.execute("DELETE FROM dirs WHERE gen <> ?", (gen,))
+        conn.execute("DELETE FROM runs WHERE gen <> ?", (gen,))
+
+    return counts["leaf_checked"], counts["leaf_reparsed"]
+
+def iter_leaf_records_manifest(conn: sqlite3.Connection) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yields (rel_leaf, lastmod, doi) for every manifest leaf holding document.pdf, in leaf order.
+    """
+    yield from conn.execute(
+        "SELECT rel, lastmod, doi FROM leaves WHERE pdf_mtime_ns IS NOT NULL ORDER BY rel"
+    )
+
+# ---------------------------------------------------------------------------
+# Sitemap output: streaming rollover at the sitemaps.org limits
+# ---------------------------------------------------------------------------
+
+COMPRESSIONS = ("none", "gzip")
+OUTPUT_BUFFER_BYTES = 1024 * 1024
+GZIP_LEVEL = 6
+
+def output_suffix(compress: str) -> str:
+    return ".gz" if compress == "gzip" else ""
+
+class OutputFile:
+    """
+    Binary output written to <path>.part and only moved into place by commit(), so a crash
+    never leaves a truncated file under the final name. Writes go through a large buffer.
+
+    sync() makes everything written so far durable and returns the .part offset to resume
+    from; reopening with resume_offset drops whatever was written after that sync.
+    With compress="gzip", sync() ends the current gzip member and starts a new one, so a
+    synced prefix is always a complete (multi-member) gzip stream.
+    """
+
+    def __init__(self, path: str, compress: str = "none", resume_offset: Optional[int] = None):
+        self.path = path
+        self.part_path = path + ".part"
+        self.compress = compress
+        if resume_offset is None:
+            self._raw = open(self.part_path, "wb", buffering=OUTPUT_BUFFER_BYTES)
+        else:
+            self._raw = open(self.part_path, "r+b", buffering=OUTPUT_BUFFER_BYTES)
+            self._raw.truncate(resume_offset)
+            self._raw.seek(resume_offset)
+        self._gz: Optional[gzip.GzipFile] = None
+        self._out: io.BufferedIOBase = self._raw
+        self._start_member()
+
+    def _start_member(self) -> None:
+        if self.compress == "gzip":
+            # The buffer sits in front of the compressor, so zlib sees large writes.
+            self._gz = gzip.GzipFile(filename=self.path, mode="wb", compresslevel=GZIP_LEVEL, fileobj=self._raw)
+            self._out = io.BufferedWriter(self._gz, OUTPUT_BUFFER_BYTES)
+
+    def _end_member(self) -> None:
+        if self._gz is not None:
+            self._out.detach()  # flushes into the compressor
+            self._gz.close()    # writes the member trailer; leaves the .part file open
+            self._gz = None
+            self._out = self._raw
+
+    def write(self, data: bytes) -> None:
+        self._out.write(data)
+
+    def sync(self) -> int:
+        self._end_member()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        offset = self._raw.tell()
+        self._start_member()
+        return offset
+
+    def close(self) -> None:
+        self._end_member()
+        self._raw.close()
+
+    def commit(self, final_path: Optional[str] = None) -> str:
+        final_path = final_path or self.path
+        os.replace(self.part_path, final_path)
+        return final_path
+
+SITEMAP_MAX_URLS = 50_000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # uncompressed
+SITEMAP_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+).encode("utf-8")
+SITEMAP_FOOTER = b"</urlset>\n"
+# Room kept in every chunk for the closing tag plus the trailing summary comment.
+SITEMAP_FOOTER_RESERVE = 256
+
+class SitemapWriter:
+    """
+    Writes <url> entries for one branch, rolling over to a new chunk before either limit
+    would be exceeded. Bytes are counted as they are written, so this stays single-pass
+    with constant memory.
+
+    Chunks are written as .part files and renamed by close(). A branch that fits in one file
+    keeps the historical name sitemap_<tag>.xml; otherwise chunks are sitemap_<tag>_<n>.xml.
+    With compress="gzip" every name gets a .gz suffix; the limits still apply to the
+    uncompressed bytes, as the protocol requires.
+
+    checkpoint() returns a JSON-able state; passing it back as state= resumes the last chunk.
+    """
+
+    def __init__(self, out_dir: str, tag: str,
+                 max_urls: int = SITEMAP_MAX_URLS, max_bytes: int = SITEMAP_MAX_BYTES,
+                 compress: str = "none", state: Optional[dict] = None):
+        self.out_dir = out_dir
+        self.tag = tag
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.ext = ".xml" + output_suffix(compress)
+        self._f: Optional[OutputFile] = None
+        self._chunks = 0
+        self._chunk_urls = 0
+        self._chunk_bytes = 0
+        if state and state["chunks"]:
+            self._chunks = state["chunks"]
+            self._chunk_urls = state["chunk_urls"]
+            self._chunk_bytes = state["chunk_bytes"]
+            self._f = OutputFile(self._chunk_path(self._chunks), self.compress, resume_offset=state["offset"])
+
+    def _chunk_path(self, n: int) -> str:
+        return os.path.join(self.out_dir, f"sitemap_{self.tag}_{n}{self.ext}")
+
+    def _single_path(self) -> str:
+        return os.path.join(self.out_dir, f"sitemap_{self.tag}{self.ext}")
+
+    def _open_next(self) -> None:
+        self._chunks += 1
+        self._f = OutputFile(self._chunk_path(self._chunks), self.compress)
+        self._f.write(SITEMAP_HEADER)
+        self._chunk_urls = 0
+        self._chunk_bytes = len(SITEMAP_HEADER)
+
+    def _close_chunk(self, trailer: str) -> None:
+        self._f.write(SITEMAP_FOOTER)
+        self._f.write(trailer.encode("utf-8"))
+        self._f.close()
+        self._f = None
+
+    def add(self, url: str, lastmod: str) -> None:
+        entry = (
+            "  <url>\n"
+            f"    <loc>{xml_escape(url)}</loc>\n"
+            f"    <lastmod>{xml_escape(lastmod)}</lastmod>\n"
+            "  </url>\n"
+        ).encode("utf-8")
+
+        if self._f is None:
+            self._open_next()
+        elif (self._chunk_urls >= self.max_urls
+              or self._chunk_bytes + len(entry) + SITEMAP_FOOTER_RESERVE > self.max_bytes):
+            self._close_chunk(f"<!-- chunk_url_count: {self._chunk_urls} -->\n")
+            self._open_next()
+
+        self._f.write(entry)
+        self._chunk_urls += 1
+        self._chunk_bytes += len(entry)
+
+    def checkpoint(self) -> dict:
+        offset = self._f.sync() if self._f is not None else 0
+        return {
+            "chunks": self._chunks,
+            "chunk_urls": self._chunk_urls,
+            "chunk_bytes": self._chunk_bytes,
+            "offset": offset,
+        }
+
+    def close(self, trailer: str) -> List[str]:
+        """
+        Finishes the last chunk (trailer is the branch summary comment), moves every chunk into
+        place and removes chunk files left over from an earlier, larger run.
+        Returns every chunk path in order.
+        """
+        if self._chunks == 0:
+            self._open_next()  # an empty branch still gets a valid, empty urlset
+        if self._f is not None:
+            self._close_chunk(trailer)
+
+        if self._chunks == 1:
+            paths = [self._single_path()]
+            os.replace(self._chunk_path(1) + ".part", paths[0])
+        else:
+            paths = [self._chunk_path(n) for n in range(1, self._chunks + 1)]
+            for path in paths:
+                os.replace(path + ".part", path)
+
+        keep = set(paths)
+        stale = [self._single_path()]
+        n = 1
+        while True:
+            found = [p for p in (self._chunk_path(n), self._chunk_path(n) + ".part") if os.path.exists(p)]
+            if not found and n > self._chunks:
+                break
+            stale.extend(found)
+            n += 1
+        for path in stale:
+            if path not in keep and os.path.exists(path):
+                os.remove(path)
+        return paths
+
+# ---------------------------------------------------------------------------
+# Checkpoints: resumable full crawls
+# ---------------------------------------------------------------------------
+
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+def checkpoint_path(out_dir: str, tag: str) -> str:
+    return os.path.join(out_dir, f"checkpoint_{tag}.json")
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(path: str, data: dict) -> None:
+    # temp file + rename, so the checkpoint itself is never half-written
+    data = dict(data, updated_at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ---------------------------------------------------------------------------
+# Change feed: delta against the previous run's outputs
+# ---------------------------------------------------------------------------
+
+DELTA_HEADER = ["change", "url", "lastmod", "doi", "old_lastmod", "old_doi"]
+_LOC_RE = re.compile(r"<loc>(.*?)</loc>")
+_LASTMOD_RE = re.compile(r"<lastmod>(.*?)</lastmod>")
+
+def _newest_existing(paths: List[str]) -> Optional[str]:
+    found = [p for p in paths if os.path.exists(p)]
+    return max(found, key=os.path.getmtime) if found else None
+
+def find_previous_outputs(out_dir: str, tag: str) -> Optional[Tuple[List[str], str]]:
+    """
+    The committed sitemap chunks and DOI map of the previous run of this branch (plain or gzip,
+    whichever was written last), or None if there is no complete previous output.
+    """
+    doi_path = _newest_existing([os.path.join(out_dir, f"doi_map_{tag}.csv{output_suffix(c)}") for c in COMPRESSIONS])
+    if doi_path is None:
+        return None
+    ext = ".xml" + (".gz" if doi_path.endswith(".gz") else "")
+    single = os.path.join(out_dir, f"sitemap_{tag}{ext}")
+    if os.path.exists(single):
+        return [single], doi_path
+    chunks = []
+    n = 1
+    while os.path.exists(os.path.join(out_dir, f"sitemap_{tag}_{n}{ext}")):
+        chunks.append(os.path.join(out_dir, f"sitemap_{tag}_{n}{ext}"))
+        n += 1
+    return (chunks, doi_path) if chunks else None
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def iter_previous_records(sitemap_paths: List[str], doi_path: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    Streams (url, lastmod, doi) from a previous run's sitemap chunks and DOI map, which were
+    written in the same order. Only the format SitemapWriter produces is understood.
+    """
+    with _open_text(doi_path) as doi_f:
+        doi_rows = csv.reader(doi_f)
+        next(doi_rows, None)  # header
+        for path in sitemap_paths:
+            with _open_text(path) as sm_f:
+                url = None
+                for line in sm_f:
+                    m = _LOC_RE.search(line)
+                    if m:
+                        url = xml_unescape(m.group(1))
+                        continue
+                    m = _LASTMOD_RE.search(line)
+                    if m and url is not None:
+                        row = next(doi_rows, None)
+                        if row is None or row[0] != url:
+                            raise ValueError(f"{doi_path} is out of step with {path}")
+                        yield url, xml_unescape(m.group(1)), row[1] if len(row) > 1 else ""
+                        url = None
+
+class ChangeFeed:
+    """
+    Streaming merge of this run's records against the previous run's, both in URL order
+    (leaf path order within a branch), so memory stays constant at any branch size.
+
+    Writes delta_<tag>.csv[.gz] with DELTA_HEADER rows; change is added, removed, lastmod,
+    doi or lastmod+doi. If either side turns out not to be sorted (e.g. an old --walker oswalk
+    run), the feed gives up: `error` is set and finish() writes nothing.
+    """
+
+    def __init__(self, path: str, previous: Iterator[Tuple[str, str, str]], compress: str = "none"):
+        self.path = path
+        self.error: Optional[str] = None
+        self.counts = {"added": 0, "removed": 0, "modified": 0}
+        self._prev_iter = previous
+        self._prev: Optional[Tuple[str, str, str]] = None
+        self._last_url = ""
+        self._out = OutputFile(path, compress)
+        self._w = csv.writer(codecs.getwriter("utf-8")(self._out))
+        self._w.writerow(DELTA_HEADER)
+        try:
+            self._advance()
+        except (ValueError, OSError, EOFError) as e:
+            self.error = str(e)
+
+    def _advance(self) -> None:
+        rec = next(self._prev_iter, None)
+        if rec is not None and self._prev is not None and rec[0] <= self._prev[0]:
+            raise ValueError("previous outputs are not in URL order")
+        self._prev = rec
+
+    def _removed(self) -> None:
+        url, lastmod, doi = self._prev
+        self._w.writerow(["removed", url, "", "", lastmod, doi])
+        self.counts["removed"] += 1
+        self._advance()
+
+    def add(self, url: str, lastmod: str, doi: str) -> None:
+        if self.error is not None:
+            return
+        try:
+            if url <= self._last_url:
+                raise ValueError("this run's records are not in URL order")
+            self._last_url = url
+            while self._prev is not None and self._prev[0] < url:
+                self._removed()
+            if self._prev is not None and self._prev[0] == url:
+                _, old_lastmod, old_doi = self._prev
+                change = "+".join(name for name, changed in
+                                  (("lastmod", lastmod != old_lastmod), ("doi", doi != old_doi)) if changed)
+                if change:
+                    self._w.writerow([change, url, lastmod, doi, old_lastmod, old_doi])
+                    self.counts["modified"] += 1
+                self._advance()
+            else:
+                self._w.writerow(["added", url, lastmod, doi, "", ""])
+                self.counts["added"] += 1
+        except (ValueError, OSError, EOFError) as e:
+            self.error = str(e)
+
+    def finish(self, drain: bool = True) -> Optional[str]:
+        """
+        drain=False (run stopped early by max_urls) leaves unvisited previous URLs unreported.
+        Returns the delta path, or None if the feed gave up.
+        """
+        if self.error is None and drain:
+            try:
+                while self._prev is not None:
+                    self._removed()
+            except (ValueError, OSError, EOFError) as e:
+                self.error = str(e)
+        self._prev_iter.close()
+        self._out.close()
+        if self.error is not None:
+            os.remove(self._out.part_path)
+            return None
+        self._out.commit()
+        return self.path
+
 def write_sitemap_and_doi_for_branch(
     repo_root: str,
     branch: str,
@@ -111,10 +1253,50 @@ def write_sitemap_and_doi_for_branch(
     sleep_s: float = 0.0,
     ls_depth: int = 0,
     max_urls: Optional[int] = None,
-) -> Tuple[str, str, int, int]:
+    incremental: bool = False,
+    verify_leaves: bool = False,
+    walker: str = "scandir",
+    meta_fast: bool = False,
+    meta_cache: int = DEFAULT_META_CACHE,
+    sitemap_max_urls: int = SITEMAP_MAX_URLS,
+    sitemap_max_bytes: int = SITEMAP_MAX_BYTES,
+    compress: str = "none",
+    resume: bool = False,
+    checkpoint_interval: Optional[float] = None,
+    max_ops: float = 0.0,
+    latency_target: float = 0.0,
+    progress_path: Optional[str] = None,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    diff: bool = False,
+) -> Tuple[List[str], str, int, int]:
     """
+    With incremental=True, the branch manifest (manifest_<tag>.sqlite in out_dir) is refreshed
+    first and the XML/CSV are rebuilt from it; only changed leaves are re-parsed. Leaves whose
+    directory mtime is unchanged are not looked into, unless verify_leaves=True
+    (see refresh_manifest).
+
+    The sitemap is split into chunks at sitemap_max_urls / sitemap_max_bytes (see SitemapWriter).
+    With compress="gzip" the chunks and the DOI map are streamed as .xml.gz / .csv.gz.
+
+    Directory operations are paced by a fixed sleep_s, or adaptively with max_ops (ops/sec) and/or
+    latency_target (seconds per op); inside a run_branches_parallel worker the adaptive budget is
+    shared by all workers.
+
+    Outputs are written as .part files and renamed into place when the branch completes.
+    With resume=True or a checkpoint_interval, progress goes to checkpoint_<tag>.json: a full
+    scandir crawl saves it at first-level shard boundaries (at most every checkpoint_interval
+    seconds, DEFAULT_CHECKPOINT_INTERVAL if None), and every mode marks the branch done at the
+    end. With resume=True a done branch is skipped and an unfinished scandir crawl continues
+    from its last checkpoint, appending to the .part outputs.
+
+    A per-phase timing report is printed at the end; with progress_path, RunMetrics progress
+    records (JSON lines) are appended every progress_interval seconds.
+
+    With diff=True, delta_<tag>.csv is written as well: the URLs added, removed or changed
+    since the previous run's committed outputs (see ChangeFeed). Resumed crawls get no delta.
+
     Returns:
-      (sitemap_path, doi_csv_path, url_count, leaf_checked)
+      (sitemap_paths, doi_csv_path, url_count, leaf_checked)
     """
     effective_root = os.path.join(repo_root, branch) if branch else repo_root
     if not os.path.isdir(effective_root):
@@ -132,72 +1314,168 @@ def write_sitemap_and_doi_for_branch(
     os.makedirs(out_dir, exist_ok=True)
     tag = branch if branch else "ALL"
 
-    sitemap_path = os.path.join(out_dir, f"sitemap_{tag}.xml")
-    doi_csv_path = os.path.join(out_dir, f"doi_map_{tag}.csv")
-
-    url_count = 0
-    leaf_checked = 0
+    doi_csv_path = os.path.join(out_dir, f"doi_map_{tag}.csv{output_suffix(compress)}")
 
-    with open(sitemap_path, "w", encoding="utf-8") as sm, open(doi_csv_path, "w", encoding="utf-8", newline="") as doi_f:
-        sm.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        sm.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    ckpt_path = checkpoint_path(out_dir, tag)
+    # Anything that changes the bytes written makes an old checkpoint unusable.
+    settings = {
+        "base_url": base_url, "shard_depth": effective_shard_depth, "max_urls": max_urls,
+        "incremental": incremental, "walker": walker, "compress": compress,
+        "sitemap_max_urls": sitemap_max_urls, "sitemap_max_bytes": sitemap_max_bytes,
+    }
+    ckpt = load_checkpoint(ckpt_path) if resume else None
+    if ckpt is not None and ckpt.get("settings") != settings:
+        print(f"  [{tag}] checkpoint was written with different settings; starting the branch over")
+        ckpt = None
+    if ckpt is not None and ckpt.get("status") == "done":
+        print(f"  [{tag}] already finished per {ckpt_path}; skipping")
+        return ckpt["sitemap_paths"], ckpt["doi_csv_path"], ckpt["url_count"], ckpt["leaf_checked"]
 
-        writer = csv.writer(doi_f)
-        writer.writerow(["url", "doi"])
+    # Checkpoints cost a sync of every output, so they are only taken when asked for.
+    checkpointing = resume or checkpoint_interval is not None
+    if checkpoint_interval is None:
+        checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+    # Only the sorted scandir crawl can skip finished shard subtrees.
+    resumable = checkpointing and not incremental and walker != "oswalk"
+    if ckpt is not None and not resumable:
+        ckpt = None
+    if ckpt is not None:
+        parts = [doi_csv_path] + [
+            os.path.join(out_dir, f"sitemap_{tag}_{n}.xml{output_suffix(compress)}")
+            for n in range(1, ckpt["sitemap"]["chunks"] + 1)
+        ]
+        if not all(os.path.exists(p + ".part") for p in parts):
+            print(f"  [{tag}] partial outputs are missing; starting the branch over")
+            ckpt = None
+    if ckpt is None and os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+    elif ckpt is not None:
+        print(f"  [{tag}] resuming at shard {ckpt['resume_prefix']} "
+              f"({ckpt['url_count']} URLs / {ckpt['leaf_checked']} leaves already written)")
 
-        for cur_root, dirs, files in os.walk(effective_root, topdown=True):
-            if sleep_s > 0:
-                time.sleep(sleep_s)
+    url_count = ckpt["url_count"] if ckpt else 0
+    stats = {"leaf_checked": ckpt["leaf_checked"] if ckpt else 0}
 
-            depth_here = rel_depth(effective_root, cur_root)
-            prune_dirs(depth_here, dirs, effective_shard_depth)
+    meta_reader = get_meta_reader(cache_size=meta_cache, fast=meta_fast)
+    throttle = make_throttle(sleep_s, max_ops, latency_target, shared=_shared_throttle_state)
+    metrics = RunMetrics(tag, progress_path=progress_path, interval=progress_interval, throttle=throttle)
+    conn: Optional[sqlite3.Connection] = None
+    if incremental:
+        conn = open_manifest(os.path.join(out_dir, f"manifest_{tag}.sqlite"))
+        stats["leaf_checked"], reparsed = refresh_manifest(
+            conn, effective_root, effective_shard_depth, throttle=throttle, ls_depth=ls_depth,
+            meta_reader=meta_reader, metrics=metrics, verify_files=verify_leaves,
+        )
+        print(f"  Manifest [{tag}]: {stats['leaf_checked']} leaves, {reparsed} re-parsed")
+        records = iter_leaf_records_manifest(conn)
+    elif walker == "oswalk":
+        records = iter_leaf_records_walk(
+            effective_root, effective_shard_depth, stats, throttle=throttle, ls_depth=ls_depth,
+            meta_reader=meta_reader, metrics=metrics,
+        )
+    else:
+        records = iter_leaf_records_scandir(
+            effective_root, effective_shard_depth, stats, throttle=throttle, ls_depth=ls_depth,
+            meta_reader=meta_reader, resume_prefix=ckpt["resume_prefix"] if ckpt else None,
+            metrics=metrics,
+        )
 
-            if ls_depth and depth_here <= ls_depth:
-                print(f"== Depth {depth_here}: {cur_root} ==")
-                for d in dirs:
-                    print("DIR ", os.path.join(cur_root, d))
+    sm = SitemapWriter(out_dir, tag, max_urls=sitemap_max_urls, max_bytes=sitemap_max_bytes,
+                       compress=compress, state=ckpt["sitemap"] if ckpt else None)
+    doi_out = OutputFile(doi_csv_path, compress, resume_offset=ckpt["doi_offset"] if ckpt else None)
+    writer = csv.writer(codecs.getwriter("utf-8")(doi_out))
+    if ckpt is None:
+        writer.writerow(["url", "doi"])
 
-            if is_leaf_dir(effective_root, cur_root, effective_shard_depth):
-                leaf_checked += 1
+    feed: Optional[ChangeFeed] = None
+    if diff:
+        delta_path = os.path.join(out_dir, f"delta_{tag}.csv{output_suffix(compress)}")
+        previous = find_previous_outputs(out_dir, tag)
+        for stale in [os.path.join(out_dir, f"delta_{tag}.csv{output_suffix(c)}") for c in COMPRESSIONS]:
+            if os.path.exists(stale):
+                os.remove(stale)
+        if ckpt is not None:
+            print(f"  Delta [{tag}]: skipped for a resumed crawl")
+        elif previous is None:
+            print(f"  Delta [{tag}]: no previous outputs to compare with")
+        else:
+            feed = ChangeFeed(delta_path, iter_previous_records(*previous), compress)
 
-                pdf_path = os.path.join(cur_root, "document.pdf")
-                if os.path.exists(pdf_path):
-                    rel_leaf = os.path.relpath(cur_root, effective_root).replace(os.sep, "/")
-                    # URL should include branch prefix when effective_root is branch-scoped
-                    if branch:
-                        url = f"{base_url}/{branch}/{rel_leaf}/document.pdf"
-                    else:
-                        url = f"{base_url}/{rel_leaf}/document.pdf"
+    def save_progress() -> None:
+        # Called before the first record of stats["prefix"] is written: the outputs hold
+        # exactly the shards sorting before it.
+        save_checkpoint(ckpt_path, {
+            "branch": tag, "status": "running", "settings": settings,
+            "resume_prefix": stats["prefix"],
+            "url_count": url_count, "leaf_checked": stats["prefix_leaf_checked"],
+            "sitemap": sm.checkpoint(), "doi_offset": doi_out.sync(),
+        })
 
-                    lm = get_lastmod_pref_meta(cur_root, pdf_path)
+    try:
+        cur_prefix = None
+        last_saved = time.monotonic()
+        for rel_leaf, lm, doi in records:
+            if resumable and stats["prefix"] != cur_prefix:
+                if cur_prefix is not None and time.monotonic() - last_saved >= checkpoint_interval:
+                    save_progress()
+                    last_saved = time.monotonic()
+                cur_prefix = stats["prefix"]
 
-                    sm.write("  <url>\n")
-                    sm.write(f"    <loc>{xml_escape(url)}</loc>\n")
-                    sm.write(f"    <lastmod>{xml_escape(lm)}</lastmod>\n")
-                    sm.write("  </url>\n")
+            t0 = time.perf_counter()
+            url = leaf_url(base_url, branch, rel_leaf)
+            sm.add(url, lm)
+            writer.writerow([url, doi])
+            if feed is not None:
+                feed.add(url, lm, doi)
+            metrics.add("write", time.perf_counter() - t0)
 
-                    doi = get_meta_doi(cur_root)
-                    writer.writerow([url, doi])
+            url_count += 1
+            metrics.urls = url_count
+            if max_urls is not None and url_count >= max_urls:
+                break
 
-                    url_count += 1
-                    if max_urls is not None and url_count >= max_urls:
-                        break
+        # The feed reads the previous outputs, so it has to finish before they are replaced.
+        if feed is not None:
+            if feed.finish(drain=max_urls is None or url_count < max_urls):
+                c = feed.counts
+                print(f"  Delta [{tag}]: +{c['added']} -{c['removed']} ~{c['modified']} -> {feed.path}")
+            else:
+                print(f"  Delta [{tag}]: skipped ({feed.error})")
+        doi_out.close()
+        sitemap_paths = sm.close(f"<!-- url_count: {url_count} | leaf_checked: {stats['leaf_checked']} -->\n")
+        # Only once the sitemap is in place, so a failed close never leaves a new DOI map
+        # next to the old sitemap.
+        doi_out.commit()
+    finally:
+        if conn is not None:
+            conn.close()
 
-        sm.write("</urlset>\n")
-        sm.write(f"<!-- url_count: {url_count} | leaf_checked: {leaf_checked} -->\n")
+    if isinstance(throttle, AdaptiveThrottle):
+        print(f"  Throttle [{tag}]: {throttle.summary()}")
+    for line in metrics.report():
+        print(f"  {line}")
+    if progress_path:
+        metrics.emit("done")
 
-    return sitemap_path, doi_csv_path, url_count, leaf_checked
+    if checkpointing:
+        save_checkpoint(ckpt_path, {
+            "branch": tag, "status": "done", "settings": settings,
+            "sitemap_paths": sitemap_paths, "doi_csv_path": doi_csv_path,
+            "url_count": url_count, "leaf_checked": stats["leaf_checked"],
+        })
+    return sitemap_paths, doi_csv_path, url_count, stats["leaf_checked"]
 
 def write_sitemap_index(out_dir: str, sitemap_files: List[str], base_url_for_sitemaps: Optional[str] = None) -> str:
     """
-    Creates sitemap_index.xml referencing sitemap files.
+    Creates sitemap_index.xml referencing sitemap files (every chunk of every branch,
+    .xml or .xml.gz; crawlers accept gzip-compressed sitemaps behind an index).
     If base_url_for_sitemaps is provided, it will build <loc> with that URL + filename.
     Otherwise, it writes file names as-is (still valid for local use).
     """
     index_path = os.path.join(out_dir, "sitemap_index.xml")
     now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    with open(index_path, "w", encoding="utf-8") as f:
+    with open(index_path + ".part", "w", encoding="utf-8") as f:
         f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         f.write('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
         for p in sitemap_files:
@@ -208,9 +1486,52 @@ def write_sitemap_index(out_dir: str, sitemap_files: List[str], base_url_for_sit
             f.write(f"    <lastmod>{xml_escape(now)}</lastmod>\n")
             f.write("  </sitemap>\n")
         f.write("</sitemapindex>\n")
+    os.replace(index_path + ".part", index_path)
 
     return index_path
 
+def run_branches_parallel(
+    branches: List[str],
+    branch_kwargs: dict,
+    workers: int,
+) -> Tuple[Dict[str, Tuple[List[str], str, int, int]], Dict[str, str]]:
+    """
+    Fans write_sitemap_and_doi_for_branch out across a process pool, one branch per task.
+    A failing branch is recorded and reported; the remaining branches keep running.
+
+    Returns:
+      (results_by_branch, errors_by_branch)
+    """
+    results: Dict[str, Tuple[List[str], str, int, int]] = {}
+    failed: Dict[str, str] = {}
+
+    throttle_state = make_shared_throttle_state(
+        branch_kwargs.get("max_ops", 0.0), branch_kwargs.get("latency_target", 0.0)
+    )
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(throttle_state,)) as pool:
+        futures = {
+            pool.submit(write_sitemap_and_doi_for_branch, branch=b, **branch_kwargs): b
+            for b in branches
+        }
+        for fut in as_completed(futures):
+            b = futures[fut]
+            try:
+                results[b] = fut.result()
+            except (Exception, SystemExit) as e:
+                # SystemExit is how write_sitemap_and_doi_for_branch reports a missing root.
+                failed[b] = f"{type(e).__name__}: {e}"
+                print(f"[fail] branch {b}: {failed[b]}")
+                continue
+
+            sm_paths, doi_path, url_count, leaf_checked = results[b]
+            print(f"\n=== Finished branch: {b} ===")
+            for sm_path in sm_paths:
+                print(f"  Sitemap: {sm_path}")
+            print(f"  DOI map: {doi_path}")
+            print(f"  URLs: {url_count} | Leaf dirs checked: {leaf_checked}")
+
+    return results, failed
+
 def parse_branches_arg(branches_arg: str) -> List[str]:
     # accepts "02,0a,FF" or "all"
     if not branches_arg:
@@ -228,14 +1549,59 @@ def main():
     ap.add_argument("--branches", default="", help="Comma list like '02,0a,ff' OR 'all' to auto-detect all 2-hex branches.")
     ap.add_argument("--shard-depth", type=int, default=DEFAULT_SHARD_DEPTH,
                     help="Shard depth (your convention). Default 7; when branch is set, auto-adjusts 7->6.")
-    ap.add_argument("--sleep", type=float, default=0.0, help="Sleep seconds per os.walk step (throttle).")
+    ap.add_argument("--sleep", type=float, default=0.0,
+                    help="Fixed sleep seconds per directory visited (ignored with --max-ops/--latency-target).")
+    ap.add_argument("--max-ops", type=float, default=0.0,
+                    help="Cap on directory listings/stats per second, shared by all workers (0 = no cap).")
+    ap.add_argument("--latency-target", type=float, default=0.0,
+                    help="Per-op latency budget in seconds; the op rate backs off above it and speeds up below (0 = off).")
     ap.add_argument("--ls-depth", type=int, default=0, help="Print directory listings up to this depth (0=off).")
     ap.add_argument("--max-urls", type=int, default=0, help="Stop after N URLs (0 = no limit).")
+    ap.add_argument("--sitemap-max-urls", type=int, default=SITEMAP_MAX_URLS,
+                    help="Roll over to a new sitemap chunk after N URLs (protocol limit 50000).")
+    ap.add_argument("--sitemap-max-bytes", type=int, default=SITEMAP_MAX_BYTES,
+                    help="Roll over before a chunk exceeds N uncompressed bytes (protocol limit 50 MiB).")
+    ap.add_argument("--compress", choices=COMPRESSIONS, default="none",
+                    help="Stream sitemaps and DOI maps as .xml.gz / .csv.gz (gzip) or plain files (none).")
+    ap.add_argument("--resume", action="store_true",
+                    help="Skip branches finished per checkpoint_<branch>.json and continue unfinished scandir crawls.")
+    ap.add_argument("--checkpoint-interval", type=float, default=None,
+                    help="Min seconds between crawl checkpoints (taken at first-level shard boundaries); "
+                         f"checkpoints are only written with --resume or this option (default {DEFAULT_CHECKPOINT_INTERVAL:g}).")
+    ap.add_argument("--progress-jsonl", default="",
+                    help="Append periodic progress records (JSON lines) to this file; '-' = stdout.")
+    ap.add_argument("--progress-interval", type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                    help="Seconds between progress records.")
     ap.add_argument("--write-index", action="store_true", help="Write sitemap_index.xml referencing branch sitemaps.")
+    ap.add_argument("--walker", choices=WALKERS, default="scandir",
+                    help="Directory walker for full crawls: scandir (default) or the legacy oswalk.")
+    ap.add_argument("--meta-fast", action="store_true",
+                    help="Scan meta.json for lastModified/doi only instead of building the full JSON tree.")
+    ap.add_argument("--meta-cache", type=int, default=DEFAULT_META_CACHE,
+                    help="Max parsed meta.json records kept in memory (0 = no cache).")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Keep a per-branch leaf manifest in --out-dir and only re-parse changed leaves.")
+    ap.add_argument("--verify-leaves", action="store_true",
+                    help="With --incremental, stat the files of every leaf, to catch files rewritten in place "
+                         "(which leave the leaf directory's mtime unchanged).")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Process branches in parallel across N worker processes (1 = sequential).")
+    ap.add_argument("--diff", action="store_true",
+                    help="Also write delta_<branch>.csv: URLs added, removed or changed since the previous run's outputs.")
+    ap.add_argument("--doi-index", action="store_true",
+                    help="Also build doi_index.bin (DOI / leaf-id lookup, see csx_doi_index.py) from the DOI maps in --out-dir.")
     ap.add_argument("--index-base-url", default="", help="Optional base URL where sitemap files will be hosted.")
     args = ap.parse_args()
 
     repo_root = args.root
+    if args.workers < 1:
+        raise SystemExit("--workers must be >= 1")
+    if not 1 <= args.sitemap_max_urls <= SITEMAP_MAX_URLS:
+        raise SystemExit(f"--sitemap-max-urls must be between 1 and {SITEMAP_MAX_URLS}")
+    if not 4 * 1024 <= args.sitemap_max_bytes <= SITEMAP_MAX_BYTES:
+        raise SystemExit(f"--sitemap-max-bytes must be between 4096 and {SITEMAP_MAX_BYTES}")
+    if args.diff and args.walker == "oswalk" and not args.incremental:
+        raise SystemExit("--diff needs sorted output: use the scandir walker or --incremental")
     if not os.path.isdir(repo_root):
         raise SystemExit(f"Root not found: {repo_root}")
 
@@ -250,43 +1616,83 @@ def main():
 
     max_urls = args.max_urls if args.max_urls > 0 else None
 
-    sitemap_files: List[str] = []
-    total_urls = 0
-    total_leaf = 0
-
+    valid_branches: List[str] = []
     for b in branches:
         b_norm = b.strip()
         if not HEX2.match(b_norm):
             print(f"[skip] invalid branch name: {b_norm}")
             continue
+        valid_branches.append(b_norm)
 
-        print(f"\n=== Processing branch: {b_norm} ===")
-        sm_path, doi_path, url_count, leaf_checked = write_sitemap_and_doi_for_branch(
-            repo_root=repo_root,
-            branch=b_norm,
-            base_url=args.base_url.rstrip("/"),
-            out_dir=args.out_dir,
-            shard_depth=args.shard_depth,
-            sleep_s=args.sleep,
-            ls_depth=args.ls_depth,
-            max_urls=max_urls,
-        )
+    branch_kwargs = dict(
+        repo_root=repo_root,
+        base_url=args.base_url.rstrip("/"),
+        out_dir=args.out_dir,
+        shard_depth=args.shard_depth,
+        sleep_s=args.sleep,
+        ls_depth=args.ls_depth,
+        max_urls=max_urls,
+        incremental=args.incremental,
+        verify_leaves=args.verify_leaves,
+        walker=args.walker,
+        meta_fast=args.meta_fast,
+        meta_cache=args.meta_cache,
+        sitemap_max_urls=args.sitemap_max_urls,
+        sitemap_max_bytes=args.sitemap_max_bytes,
+        compress=args.compress,
+        resume=args.resume,
+        checkpoint_interval=args.checkpoint_interval,
+        max_ops=args.max_ops,
+        latency_target=args.latency_target,
+        progress_path=args.progress_jsonl or None,
+        progress_interval=args.progress_interval,
+        diff=args.diff,
+    )
 
-        print(f"  Sitemap: {sm_path}")
-        print(f"  DOI map: {doi_path}")
-        print(f"  URLs: {url_count} | Leaf dirs checked: {leaf_checked}")
+    sitemap_files: List[str] = []
+    total_urls = 0
+    total_leaf = 0
+    failed: Dict[str, str] = {}
 
-        sitemap_files.append(sm_path)
-        total_urls += url_count
-        total_leaf += leaf_checked
+    if args.workers > 1:
+        results, failed = run_branches_parallel(valid_branches, branch_kwargs, args.workers)
+        # Keep the index in branch order regardless of completion order.
+        for b_norm in valid_branches:
+            if b_norm in results:
+                sm_paths, _, url_count, leaf_checked = results[b_norm]
+                sitemap_files.extend(sm_paths)
+                total_urls += url_count
+                total_leaf += leaf_checked
+    else:
+        for b_norm in valid_branches:
+            print(f"\n=== Processing branch: {b_norm} ===")
+            sm_paths, doi_path, url_count, leaf_checked = write_sitemap_and_doi_for_branch(branch=b_norm, **branch_kwargs)
+
+            for sm_path in sm_paths:
+                print(f"  Sitemap: {sm_path}")
+            print(f"  DOI map: {doi_path}")
+            print(f"  URLs: {url_count} | Leaf dirs checked: {leaf_checked}")
+
+            sitemap_files.extend(sm_paths)
+            total_urls += url_count
+            total_leaf += leaf_checked
 
     if args.write_index and sitemap_files:
         index_url_base = args.index_base_url.strip() or None
         idx_path = write_sitemap_index(args.out_dir, sitemap_files, index_url_base)
         print(f"\nSitemap index written: {idx_path}")
 
+    if args.doi_index:
+        idx_path, n_leaf, n_doi = build_doi_index(args.out_dir)
+        print(f"DOI index written: {idx_path} ({n_leaf} leaves, {n_doi} DOIs)")
+
     print(f"\nDONE. Total URLs: {total_urls} | Total leaf dirs checked: {total_leaf}")
     print(f"Outputs in: {args.out_dir}")
+    if failed:
+        print(f"FAILED branches ({len(failed)}):")
+        for b_norm, err in sorted(failed.items()):
+            print(f"  {b_norm}: {err}")
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
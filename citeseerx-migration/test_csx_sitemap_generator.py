@@ -0,0 +1,150 @@
+import os
+import json
+
+import pytest
+
+import csx_sitemap_generator as gen
+
+
+def write_meta(tmp_path, text):
+    path = tmp_path / "meta.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_fast_scan_prefers_top_level_doi_after_metadata(tmp_path):
+    # record and metadata come first; the top-level doi must still win over metadata.doi
+    path = write_meta(tmp_path, json.dumps({
+        "record": {"lastModified": "2020-01-02T03:04:05Z"},
+        "metadata": {"doi": "10.1.1.999.1"},
+        "title": "x" * 100,
+        "doi": "10.1.1.1.1",
+    }))
+    expected = gen.parse_leaf_meta(path, fast=False)
+    assert expected == gen.LeafMeta("2020-01-02T03:04:05Z", "10.1.1.1.1")
+    assert gen.parse_leaf_meta(path, fast=True) == expected
+
+
+def test_fast_scan_top_level_doi_after_metadata_without_doi(tmp_path):
+    path = write_meta(tmp_path, json.dumps({
+        "record": {"lastModified": "2020-01-02T03:04:05Z"},
+        "metadata": {"title": "t"},
+        "doi": "10.1.1.1.1",
+    }))
+    assert gen.parse_leaf_meta(path, fast=True) == gen.parse_leaf_meta(path, fast=False)
+
+
+def test_fast_scan_falls_back_to_metadata_doi(tmp_path):
+    path = write_meta(tmp_path, json.dumps({
+        "doi": "",
+        "record": {"lastModified": "2020-01-02T03:04:05Z"},
+        "metadata": {"doi": "10.1.1.999.1"},
+    }))
+    assert gen.parse_leaf_meta(path, fast=True) == gen.LeafMeta("2020-01-02T03:04:05Z", "10.1.1.999.1")
+
+
+def build_branch(tmp_path):
+    from csx_fixture import build_fixture, fixture_branches
+    repo = tmp_path / "repo"
+    build_fixture(str(repo), shard_depth=3, branches=1, leaves_per_branch=20)
+    return str(repo), fixture_branches(1)[0], str(tmp_path / "out")
+
+
+def test_checkpoint_only_written_when_resume_requested(tmp_path):
+    repo, branch, out = build_branch(tmp_path)
+    gen.write_sitemap_and_doi_for_branch(repo, branch, "https://example.org/", out, 2)
+    assert not (tmp_path / "out" / f"checkpoint_{branch}.json").exists()
+
+    gen.write_sitemap_and_doi_for_branch(repo, branch, "https://example.org/", out, 2, resume=True)
+    ckpt = gen.load_checkpoint(gen.checkpoint_path(out, branch))
+    assert ckpt is not None and ckpt["status"] == "done"
+
+
+def test_doi_map_not_committed_when_sitemap_close_fails(tmp_path, monkeypatch):
+    repo, branch, out = build_branch(tmp_path)
+
+    def fail_close(self, trailer):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(gen.SitemapWriter, "close", fail_close)
+    with pytest.raises(OSError):
+        gen.write_sitemap_and_doi_for_branch(repo, branch, "https://example.org/", out, 2)
+    assert not (tmp_path / "out" / f"doi_map_{branch}.csv").exists()
+
+
+def test_refresh_manifest_skips_directory_removed_during_walk(tmp_path, monkeypatch):
+    repo, branch, out = build_branch(tmp_path)
+    root = os.path.join(repo, branch)
+    gone = os.path.join(root, sorted(os.listdir(root))[0])
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        if path == gone:
+            raise FileNotFoundError(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(gen.os, "stat", stat)
+    conn = gen.open_manifest(str(tmp_path / "manifest.sqlite"))
+    leaves, _ = gen.refresh_manifest(conn, root, 2)
+    conn.close()
+    assert 0 < leaves < 20
+
+
+def test_latency_target_alone_starts_throttle_low():
+    throttle = gen.AdaptiveThrottle(latency_target=0.02)
+    assert throttle._s[gen._T_RATE] == gen.THROTTLE_START_OPS
+    assert gen.AdaptiveThrottle(max_ops=2000, latency_target=0.02)._s[gen._T_RATE] == 500
+    assert gen.AdaptiveThrottle(max_ops=2000)._s[gen._T_RATE] == 2000
+
+
+def age_tree(root, seconds=3600):
+    # Backdates every directory past MTIME_RACE_WINDOW_NS so the manifest trusts their mtimes
+    old = os.stat(root).st_mtime - seconds
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (old, old))
+
+
+def test_warm_refresh_skips_unchanged_leaves_and_sees_replaced_meta(tmp_path, monkeypatch):
+    repo, branch, _ = build_branch(tmp_path)
+    root = os.path.join(repo, branch)
+    age_tree(root)
+    conn = gen.open_manifest(str(tmp_path / "manifest.sqlite"))
+    gen.refresh_manifest(conn, root, 2)
+
+    leaf = next(dirpath for dirpath, _, files in os.walk(root) if "meta.json" in files)
+    tmp = os.path.join(leaf, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"record": {"lastModified": "2030-01-01T00:00:00Z"}, "doi": "10.1.1.2.2"}, f)
+    os.replace(tmp, os.path.join(leaf, "meta.json"))
+
+    stats = []
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        stats.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(gen.os, "stat", stat)
+    leaves, reparsed = gen.refresh_manifest(conn, root, 2)
+    monkeypatch.undo()
+    file_stats = [p for p in stats if p.endswith(("document.pdf", "meta.json"))]
+    assert reparsed == 1 and len(file_stats) == 2
+    rel = os.path.relpath(leaf, root).replace(os.sep, "/")
+    assert conn.execute("SELECT doi FROM leaves WHERE rel = ?", (rel,)).fetchone()[0] == "10.1.1.2.2"
+    conn.close()
+
+
+def test_verify_files_sees_in_place_edit(tmp_path):
+    repo, branch, _ = build_branch(tmp_path)
+    root = os.path.join(repo, branch)
+    age_tree(root)
+    conn = gen.open_manifest(str(tmp_path / "manifest.sqlite"))
+    gen.refresh_manifest(conn, root, 2)
+
+    leaf = next(dirpath for dirpath, _, files in os.walk(root) if "meta.json" in files)
+    with open(os.path.join(leaf, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"record": {"lastModified": "2030-01-01T00:00:00Z"}, "doi": "10.1.1.3.3"}, f)
+
+    assert gen.refresh_manifest(conn, root, 2)[1] == 0
+    assert gen.refresh_manifest(conn, root, 2, verify_files=True)[1] == 1
+    conn.close()